@@ -7,6 +7,8 @@ urlpatterns = [
     path('dashboard/', views.dashboard_stats, name='dashboard-stats'),
     path('statistics/', views.statistics_data, name='statistics-data'),
     path('quick-stats/', views.quick_stats, name='quick-stats'),
+    path('metrics/', views.api_metrics, name='api-metrics'),
+    path('item-statistics/', views.item_statistics, name='item-statistics'),
     
     # Access codes
     path('generate-codes/', views.generate_access_codes, name='generate-access-codes'),
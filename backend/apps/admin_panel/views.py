@@ -2,12 +2,19 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.http import HttpResponse
 from django.db.models import Count, Q, Avg
 from django.utils import timezone
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, date
 from apps.authentication.models import User, AccessCode
-from apps.questions.models import Question, QuestionReport
+from apps.questions.models import Question, QuestionReport, QuestionStatistics, ItemStatisticsRun
+from apps.questions.utils import module_catalog
 from apps.users.models import QuizAttempt
+from apps.students.utils import time_series
+from apps.core.cache import get_or_set_cached
+from apps.core.counters import get_counters
+from apps.core.activity import track_activity
+from apps.core.metrics import request_metrics
 import random
 import string
 
@@ -100,41 +107,40 @@ def statistics_data(request):
     if not request.user.is_admin:
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
+    # Served from cache, pass ?refresh=1 to force a recomputation
+    data = get_or_set_cached(
+        'dashboard_stats',
+        build_statistics_data,
+        refresh=bool(request.query_params.get('refresh')),
+        variant='statistics_data'
+    )
+    
+    return Response(data)
+
+def build_statistics_data():
+    """Compute the admin statistics charts and platform stats"""
     # Generate realistic revenue data based on user registrations and subscription plans
     current_year = timezone.now().year
-    monthly_revenue = []
-    monthly_users = []
-    monthly_quiz_attempts = []
-    
     months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    year_end = date(current_year, 12, 31)
+    
+    # One GROUP BY per series instead of a COUNT per month
+    monthly_users = [
+        row['count'] for row in time_series(
+            User.objects.filter(role='student'), 'created_at', 'month', 12,
+            end=year_end, count=Count('id')
+        )
+    ]
+    monthly_quiz_attempts = [
+        row['count'] for row in time_series(
+            QuizAttempt.objects.all(), 'created_at', 'month', 12,
+            end=year_end, count=Count('id')
+        )
+    ]
     
-    for i, month in enumerate(months):
-        # Calculate users registered in this month
-        start_date = datetime(current_year, i + 1, 1)
-        if i == 11:  # December
-            end_date = datetime(current_year + 1, 1, 1)
-        else:
-            end_date = datetime(current_year, i + 2, 1)
-        
-        users_this_month = User.objects.filter(
-            role='student',
-            created_at__gte=start_date,
-            created_at__lt=end_date
-        ).count()
-        
-        # Estimate revenue based on users (assuming average plan cost)
-        avg_plan_cost = 2000  # Average cost in DA
-        estimated_revenue = users_this_month * avg_plan_cost
-        
-        # Quiz attempts this month
-        quiz_attempts = QuizAttempt.objects.filter(
-            created_at__gte=start_date,
-            created_at__lt=end_date
-        ).count()
-        
-        monthly_revenue.append(estimated_revenue)
-        monthly_users.append(users_this_month)
-        monthly_quiz_attempts.append(quiz_attempts)
+    # Estimate revenue based on users (assuming average plan cost)
+    avg_plan_cost = 2000  # Average cost in DA
+    monthly_revenue = [users * avg_plan_cost for users in monthly_users]
     
     # Revenue data
     revenue_data = {
@@ -179,14 +185,23 @@ def statistics_data(request):
         }]
     }
     
-    # Calculate platform stats
-    total_users = User.objects.filter(role='student').count()
-    active_users = User.objects.filter(role='student', status='active').count()
+    # Calculate platform stats, one conditional aggregate per table
+    user_counts = User.objects.filter(role='student').aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active'))
+    )
+    total_users = user_counts['total']
+    active_users = user_counts['active']
     total_questions = Question.objects.filter(is_active=True).count()
-    total_quiz_attempts = QuizAttempt.objects.count()
+    
+    attempt_counts = QuizAttempt.objects.aggregate(
+        total=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True))
+    )
+    total_quiz_attempts = attempt_counts['total']
     
     # Calculate average score
-    correct_attempts = QuizAttempt.objects.filter(is_correct=True).count()
+    correct_attempts = attempt_counts['correct']
     avg_user_score = (correct_attempts / total_quiz_attempts * 100) if total_quiz_attempts > 0 else 0
     
     # Calculate total revenue (estimated)
@@ -205,13 +220,13 @@ def statistics_data(request):
         'subscription_renewal_rate': subscription_renewal_rate,
     }
     
-    return Response({
+    return {
         'revenue_data': revenue_data,
         'user_registrations_data': user_registrations_data,
         'quiz_attempts_data': quiz_attempts_data,
         'year_distribution_data': year_data,
         'platform_stats': platform_stats,
-    })
+    }
 
 def generate_unique_code(prefix, length=6):
     """Generate a unique access code with given prefix"""
@@ -222,6 +237,7 @@ def generate_unique_code(prefix, length=6):
         if not AccessCode.objects.filter(code=code).exists():
             return code
 
+@track_activity('Access Code Generated')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def generate_access_codes(request):
@@ -327,24 +343,69 @@ def quick_stats(request):
     if not request.user.is_admin:
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get today's stats
-    today = timezone.now().date()
-    
-    stats = {
-        'users_today': User.objects.filter(
-            role='student',
-            created_at__date=today
-        ).count(),
-        'quiz_attempts_today': QuizAttempt.objects.filter(
-            created_at__date=today
-        ).count(),
-        'pending_reports': QuestionReport.objects.filter(
-            status='pending'
-        ).count(),
-        'pending_accounts': User.objects.filter(
-            role='student',
-            status='pending'
-        ).count(),
-    }
+    # Cached counters maintained by signals, see apps.core.counters
+    stats = get_counters('users_today', 'quiz_attempts_today', 'pending_reports', 'pending_accounts')
     
-    return Response(stats)
\ No newline at end of file
+    return Response(stats)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def api_metrics(request):
+    """Per-route API latency, status and query metrics of this worker, in Prometheus text format"""
+    if not request.user.is_admin:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return HttpResponse(
+        request_metrics.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def item_statistics(request):
+    """
+    Questions whose item statistics look miscalibrated or broken, most answered first.
+    ?flag= narrows to one flag, ?all=1 lists every analysed question.
+    """
+    if not request.user.is_admin:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        limit = min(int(request.query_params.get('limit', 100)), 500)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = QuestionStatistics.objects.select_related('question').order_by('-responses', 'question_id')
+    if not request.query_params.get('all'):
+        rows = rows.filter(is_flagged=True)
+    
+    flag = request.query_params.get('flag')
+    if flag:
+        if flag not in QuestionStatistics.FLAGS:
+            return Response({'error': f'Unknown flag {flag}'}, status=status.HTTP_400_BAD_REQUEST)
+        # Matches the quoted name inside the stored JSON list
+        rows = rows.filter(flags__icontains=f'"{flag}"')
+    
+    results = []
+    for row in rows[:limit]:
+        module_name, course_name = module_catalog.names_of(row.question)
+        results.append({
+            'question_id': row.question_id,
+            'question_text': row.question.question_text[:120],
+            'module_name': module_name,
+            'course_name': course_name,
+            'difficulty': row.question.difficulty,
+            'responses': row.responses,
+            'p_value': row.p_value,
+            'discrimination': row.discrimination,
+            'median_time_seconds': row.median_time_seconds,
+            'option_counts': row.option_counts,
+            'flags': row.flags,
+        })
+    
+    last_run = ItemStatisticsRun.objects.exclude(through=ItemStatisticsRun.START).first()
+    return Response({
+        'computed_through': last_run.through if last_run else None,
+        'count': len(results),
+        'results': results,
+    })
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accesscode',
+            index=models.Index(fields=['created_at', 'id'], name='auth_accesscode_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accesscode',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='auth_accesscode_status_idx'),
+        ),
+    ]
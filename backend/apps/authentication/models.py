@@ -77,5 +77,12 @@ class AccessCode(TimeStampedModel):
     used_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     used_date = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # Keyset pagination order of the access code list
+            models.Index(fields=['created_at', 'id'], name='auth_accesscode_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='auth_accesscode_status_idx'),
+        ]
+    
     def __str__(self):
         return self.code
\ No newline at end of file
@@ -16,6 +16,8 @@ from .serializers import (
 )
 from apps.core.permissions import IsSuperAdminUser, IsAdminUser
 from apps.core.constants import ADMIN_PERMISSIONS
+from apps.core.activity import track_activity
+from apps.core.pagination import KeysetPagination
 
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
@@ -44,6 +46,7 @@ def login_view(request):
         })
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@track_activity('User Logout')
 @api_view(['POST'])
 def logout_view(request):
     try:
@@ -59,6 +62,7 @@ def profile_view(request):
 
 # Admin Account Management Views
 class AdminAccountListCreateView(generics.ListCreateAPIView):
+    activity_action = {'POST': 'User Created'}
     queryset = AdminAccount.objects.select_related('user', 'created_by').order_by('-created_at')
     permission_classes = [IsSuperAdminUser]
     
@@ -72,6 +76,7 @@ class AdminAccountListCreateView(generics.ListCreateAPIView):
         serializer.save()
 
 class AdminAccountDetailView(generics.RetrieveUpdateDestroyAPIView):
+    activity_action = {'PUT': 'User Updated', 'DELETE': 'User Deleted'}
     queryset = AdminAccount.objects.select_related('user', 'created_by')
     permission_classes = [IsSuperAdminUser]
 
@@ -92,6 +97,7 @@ class AdminAccountDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
         user.delete()
 
+@track_activity('User Updated')
 @api_view(['POST'])
 @permission_classes([IsSuperAdminUser])
 def update_admin_status(request, pk):
@@ -136,6 +142,7 @@ def get_permissions_list(request):
 
 # Access Code Management
 class AccessCodeListCreateView(generics.ListCreateAPIView):
+    activity_action = {'POST': 'Access Code Generated'}
     queryset = AccessCode.objects.select_related('used_by').order_by('-created_at')
     serializer_class = AccessCodeSerializer
     permission_classes = [IsAdminUser]
@@ -144,6 +151,7 @@ class AccessCodeListCreateView(generics.ListCreateAPIView):
     search_fields = ['code', 'package', 'used_by__full_name', 'used_by__email']
     ordering_fields = ['created_at', 'package', 'status']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
     
     def perform_create(self, serializer):
         # Generate unique code
@@ -367,6 +375,7 @@ def register_user(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # Add this to your existing login_view to handle the subscription package info
+@track_activity('User Login')
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def enhanced_login_view(request):
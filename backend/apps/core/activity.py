@@ -0,0 +1,287 @@
+# apps/core/activity.py
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop', 'block', 'spill')
+
+# Request methods that can produce a UserActivity row
+TRACKED_METHODS = ('POST', 'PUT', 'DELETE')
+
+def write_activities(events):
+    """
+    Insert a list of activity events (dicts of UserActivity fields) in one bulk_create
+    """
+    from apps.users.models import UserActivity
+
+    UserActivity.objects.bulk_create([UserActivity(**event) for event in events])
+
+class ActivityWriter:
+    """
+    Buffers UserActivity rows in a bounded in-process queue. A background thread writes
+    them with bulk_create every `batch_size` events or `flush_interval` seconds, batches
+    the database rejects are handed to the write_user_activities Celery task instead.
+
+    When the queue is full `overflow` decides what happens to new events: 'drop' discards
+    them, 'block' waits up to `block_timeout` seconds for room and 'spill' appends them to
+    `spill_path` (JSON lines) to be written by a later flush.
+    """
+
+    def __init__(self, queue_size=10000, batch_size=200, flush_interval=2.0, overflow='drop',
+                 block_timeout=0.5, spill_path=None, background=True):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+        if overflow == 'spill' and not spill_path:
+            raise ValueError("overflow='spill' requires a spill_path")
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.spill_path = str(spill_path) if spill_path else None
+        self.background = background
+        self.dropped = 0
+
+        self._thread = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._exit_hook_registered = False
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            queue_size=getattr(settings, 'ACTIVITY_QUEUE_SIZE', 10000),
+            batch_size=getattr(settings, 'ACTIVITY_BATCH_SIZE', 200),
+            flush_interval=getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 2.0),
+            overflow=getattr(settings, 'ACTIVITY_OVERFLOW', 'drop'),
+            block_timeout=getattr(settings, 'ACTIVITY_BLOCK_TIMEOUT', 0.5),
+            spill_path=getattr(settings, 'ACTIVITY_SPILL_PATH', None),
+        )
+
+    def record(self, event):
+        """
+        Queue one event without touching the database
+        """
+        if self.background:
+            self._ensure_started()
+
+        try:
+            self.queue.put_nowait(event)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == 'block':
+            try:
+                self.queue.put(event, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        elif self.overflow == 'spill':
+            self._spill([event])
+            return
+
+        self.dropped += 1
+        if self.dropped % 1000 == 1:
+            logger.warning(f"Activity queue full, {self.dropped} events dropped so far")
+
+    def flush(self):
+        """
+        Write everything queued or spilled so far, returns the number of events handled
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        events.extend(self._load_spill())
+        self._write(events)
+        return len(events)
+
+    def close(self):
+        """
+        Stop the flusher thread and write whatever is left, called on interpreter exit
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a dead thread is restarted in the child
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-writer', daemon=True)
+            self._thread.start()
+
+            if not self._exit_hook_registered:
+                atexit.register(self.close)
+                self._exit_hook_registered = True
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self.queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                if len(batch) < self.batch_size:
+                    batch.extend(self._load_spill())
+                self._write(batch)
+        finally:
+            # The thread owns its own database connection
+            connection.close()
+
+    def _write(self, events):
+        for start in range(0, len(events), self.batch_size):
+            chunk = events[start:start + self.batch_size]
+            try:
+                write_activities(chunk)
+            except Exception as e:
+                logger.error(f"Failed to write {len(chunk)} user activities, deferring to Celery: {e}")
+                self._defer(chunk)
+
+    def _defer(self, events):
+        from .tasks import write_user_activities
+
+        try:
+            write_user_activities.delay(events)
+        except Exception as e:
+            logger.error(f"Failed to queue user activities: {e}")
+            if self.spill_path:
+                self._spill(events)
+            else:
+                self.dropped += len(events)
+
+    def _spill(self, events):
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as spill_file:
+                for event in events:
+                    spill_file.write(json.dumps(event) + '\n')
+
+    def _load_spill(self):
+        if not self.spill_path:
+            return []
+
+        with self._spill_lock:
+            # Take the file over first so other workers keep appending to a fresh one
+            replay_path = f'{self.spill_path}.{os.getpid()}.replay'
+            try:
+                os.replace(self.spill_path, replay_path)
+            except FileNotFoundError:
+                return []
+
+            with open(replay_path, encoding='utf-8') as replay_file:
+                events = [json.loads(line) for line in replay_file if line.strip()]
+            os.remove(replay_path)
+
+        return events
+
+activity_writer = ActivityWriter.from_settings()
+
+def record_activity(user_id, action, details='', ip_address=None):
+    """
+    Record a UserActivity row, queued for the background writer unless
+    ACTIVITY_TRACKING_ASYNC is off
+    """
+    event = {
+        'user_id': user_id,
+        'action': action,
+        'details': details,
+        'ip_address': ip_address,
+    }
+
+    if getattr(settings, 'ACTIVITY_TRACKING_ASYNC', True):
+        activity_writer.record(event)
+    else:
+        write_activities([event])
+
+def track_activity(action, methods=None):
+    """
+    Declare the UserActivity action a view records, e.g. @track_activity('Report Resolved').
+    Place it above @api_view; `methods` limits it to some HTTP methods.
+    Class-based views set an `activity_action` attribute instead, either a string or
+    a {method: action} dict.
+    """
+    def decorator(view):
+        view.activity_action = {method: action for method in methods} if methods else action
+        return view
+    return decorator
+
+def _normalize_actions(declared):
+    if not declared:
+        return {}
+    if isinstance(declared, str):
+        return {method: declared for method in TRACKED_METHODS}
+    return {method.upper(): action for method, action in declared.items()}
+
+def declared_actions(view):
+    """
+    {method: action} declared on a resolved view callback
+    """
+    actions = _normalize_actions(getattr(view, 'activity_action', None))
+
+    # as_view() callbacks: class attribute first, then per-handler declarations
+    view_class = getattr(view, 'view_class', None) or getattr(view, 'cls', None)
+    if view_class is not None:
+        actions.update(_normalize_actions(getattr(view_class, 'activity_action', None)))
+        for method in TRACKED_METHODS:
+            handler = getattr(view_class, method.lower(), None)
+            handler_actions = _normalize_actions(getattr(handler, 'activity_action', None))
+            if method in handler_actions:
+                actions[method] = handler_actions[method]
+
+        allowed = {method.upper() for method in view_class.http_method_names}
+        actions = {method: action for method, action in actions.items() if method in allowed}
+
+    return actions
+
+def build_route_actions(urlconf=None):
+    """
+    Map every named URL pattern to the actions its view declares:
+    {view_name: {method: action}}
+    """
+    from django.urls import URLPattern, URLResolver, get_resolver
+
+    table = {}
+
+    def walk(patterns, namespace):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                child_namespace = namespace
+                if pattern.namespace:
+                    child_namespace = f'{namespace}{pattern.namespace}:'
+                walk(pattern.url_patterns, child_namespace)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                actions = declared_actions(pattern.callback)
+                if actions:
+                    table[f'{namespace}{pattern.name}'] = actions
+
+    walk(get_resolver(urlconf).url_patterns, '')
+    return table
@@ -3,4 +3,13 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.core'
\ No newline at end of file
+    name = 'apps.core'
+
+    def ready(self):
+        # Cache invalidation hooks
+        import apps.core.signals
+
+        # Slow query / N+1 detection on every database connection
+        from django.db.backends.signals import connection_created
+        from apps.core.querylog import install_query_inspector
+        connection_created.connect(install_query_inspector, dispatch_uid='core_query_inspector')
@@ -0,0 +1,163 @@
+# apps/core/cache.py
+import functools
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+from .constants import CACHE_KEYS, CACHE_TIMEOUTS
+
+DEFAULT_CACHE_TIMEOUT = 300
+
+def build_cache_key(name, **params):
+    """
+    Build a cache key from the CACHE_KEYS template, e.g. ('user_stats', user_id=3) -> 'user_stats_3'
+    """
+    return CACHE_KEYS[name].format(**params)
+
+def get_cache_timeout(name):
+    """
+    Timeout for a cache entry, settings.CACHE_TIMEOUT_OVERRIDES wins over CACHE_TIMEOUTS
+    """
+    overrides = getattr(settings, 'CACHE_TIMEOUT_OVERRIDES', {})
+    return overrides.get(name, CACHE_TIMEOUTS.get(name, DEFAULT_CACHE_TIMEOUT))
+
+def _version_key(base_key):
+    return f'{base_key}:version'
+
+def _current_version(base_key):
+    version = cache.get(_version_key(base_key))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(base_key), version, None)
+        version = cache.get(_version_key(base_key), version)
+    return version
+
+def _versioned_key(base_key, variant=''):
+    """
+    Every entry under a base key embeds the base key's current version, so bumping the
+    version invalidates all variants (e.g. every query string of a list) at once.
+    """
+    return f'{base_key}:{_current_version(base_key)}:{variant}'
+
+def cache_version(name, **params):
+    """
+    Current version of a CACHE_KEYS entry, changes on every invalidate_cache() for it.
+    Lets process-local caches notice invalidations made by other workers.
+    """
+    return _current_version(build_cache_key(name, **params))
+
+def invalidate_cache(name, **params):
+    """
+    Drop every cached entry stored under a CACHE_KEYS name (and its parameters)
+    """
+    cache.set(_version_key(build_cache_key(name, **params)), time.time_ns(), None)
+
+def get_or_set_cached(name, builder, refresh=False, variant='', **params):
+    """
+    Return the cached value for a CACHE_KEYS entry, calling `builder()` on a miss
+    """
+    key = _versioned_key(build_cache_key(name, **params), variant)
+    value = None if refresh else cache.get(key)
+
+    if value is None:
+        value = builder()
+        cache.set(key, value, get_cache_timeout(name))
+
+    return value
+
+def _request_variant(request, prefix):
+    query = request.META.get('QUERY_STRING', '')
+    if not query:
+        return prefix
+    return f"{prefix}:{hashlib.md5(query.encode()).hexdigest()}"
+
+def cache_response(name, key_params=None):
+    """
+    Cache the data of successful GET responses of a DRF function view.
+
+    Apply it below @api_view/@permission_classes so permission checks still run:
+
+        @api_view(['GET'])
+        @permission_classes([permissions.IsAuthenticated])
+        @cache_response('user_stats', key_params=lambda request: {'user_id': request.user.id})
+        def student_statistics(request): ...
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view_func(request, *args, **kwargs)
+
+            params = key_params(request) if key_params else {}
+            key = _versioned_key(
+                build_cache_key(name, **params),
+                _request_variant(request, view_func.__name__)
+            )
+
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, get_cache_timeout(name))
+            return response
+        return wrapper
+    return decorator
+
+class CachedListMixin:
+    """
+    Cache list responses of a generic view under a CACHE_KEYS entry.
+    Set `cache_name` and optionally override get_cache_params().
+    """
+    cache_name = None
+
+    def get_cache_params(self):
+        return {}
+
+    def list(self, request, *args, **kwargs):
+        key = _versioned_key(
+            build_cache_key(self.cache_name, **self.get_cache_params()),
+            _request_variant(request, self.__class__.__name__)
+        )
+
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, get_cache_timeout(self.cache_name))
+        return response
+
+class IdempotentCreateMixin:
+    """
+    Replay the stored response of a create when a retried request carries the same
+    Idempotency-Key header (per user and view), without running the view again.
+    Only successful responses are stored, for CACHE_TIMEOUTS['idempotent_response'].
+    """
+
+    def post(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key or not request.user.is_authenticated:
+            return super().post(request, *args, **kwargs)
+
+        key = build_cache_key(
+            'idempotent_response',
+            user_id=request.user.pk,
+            view=self.__class__.__name__,
+            key=hashlib.sha256(idempotency_key.encode()).hexdigest()
+        )
+
+        stored = cache.get(key)
+        if stored is not None:
+            data, status_code = stored
+            response = Response(data, status=status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        response = super().post(request, *args, **kwargs)
+        if 200 <= response.status_code < 300:
+            cache.set(key, (response.data, response.status_code), get_cache_timeout('idempotent_response'))
+        return response
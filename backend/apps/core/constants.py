@@ -260,6 +260,9 @@ CACHE_KEYS = {
     'dashboard_stats': 'dashboard_stats',
     'question_count': 'question_count_{module_id}',
     'module_list': 'module_list',
+    'quiz_payload': 'quiz_payload_{quiz_id}',
+    'answer_keys': 'answer_keys',
+    'idempotent_response': 'idempotent_{user_id}_{view}_{key}',
     'popular_questions': 'popular_questions',
     'university_list': 'university_list',
     'subscription_plans': 'subscription_plans',
@@ -271,6 +274,8 @@ CACHE_TIMEOUTS = {
     'dashboard_stats': 300,      # 5 minutes
     'user_stats': 600,           # 10 minutes
     'module_list': 3600,         # 1 hour
+    'quiz_payload': 3600,        # 1 hour
+    'idempotent_response': 86400, # 24 hours, covers client retries
     'university_list': 86400,    # 24 hours
     'subscription_plans': 86400, # 24 hours
 }
@@ -320,6 +325,17 @@ QUIZ_SETTINGS = {
     'randomize_options': True,
 }
 
+# Item analysis (apps.questions.models.QuestionStatistics)
+ITEM_ANALYSIS = {
+    # Proportion correct expected for each difficulty label
+    'expected_p_values': {'easy': (0.7, 1.0), 'medium': (0.4, 0.85), 'hard': (0.0, 0.6)},
+    'too_easy_p_value': 0.95,
+    'too_hard_p_value': 0.2,
+    'min_discrimination': 0.15,
+    # Answer times are histogrammed per second up to this, longer ones share the last bucket
+    'max_time_seconds': 600,
+}
+
 # Notification Types
 NOTIFICATION_TYPES = {
     'info': {
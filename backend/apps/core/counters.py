@@ -0,0 +1,81 @@
+# apps/core/counters.py
+from django.core.cache import cache
+from django.utils import timezone
+
+# Daily counters live under a per-day key and simply expire, which gives the rollover
+DAILY_COUNTER_TIMEOUT = 2 * 24 * 60 * 60
+
+def _users_today(day):
+    from apps.authentication.models import User
+    return User.objects.filter(role='student', created_at__date=day).count()
+
+def _quiz_attempts_today(day):
+    from apps.users.models import QuizAttempt
+    return QuizAttempt.objects.filter(created_at__date=day).count()
+
+def _pending_reports(day=None):
+    from apps.questions.models import QuestionReport
+    return QuestionReport.objects.filter(status='pending').count()
+
+def _pending_accounts(day=None):
+    from apps.authentication.models import User
+    return User.objects.filter(role='student', status='pending').count()
+
+# name -> (is_daily, database count used to seed and reconcile)
+COUNTERS = {
+    'users_today': (True, _users_today),
+    'quiz_attempts_today': (True, _quiz_attempts_today),
+    'pending_reports': (False, _pending_reports),
+    'pending_accounts': (False, _pending_accounts),
+}
+
+def _counter_key(name, day=None):
+    is_daily = COUNTERS[name][0]
+    if is_daily:
+        return f'counter_{name}_{(day or timezone.localdate()).isoformat()}'
+    return f'counter_{name}'
+
+def _counter_timeout(name):
+    return DAILY_COUNTER_TIMEOUT if COUNTERS[name][0] else None
+
+def get_counter(name):
+    """
+    Current value of a counter, seeded from the database on a cache miss
+    """
+    key = _counter_key(name)
+    value = cache.get(key)
+    if value is None:
+        value = COUNTERS[name][1](timezone.localdate())
+        cache.add(key, value, _counter_timeout(name))
+    return value
+
+def get_counters(*names):
+    """
+    Values of several counters (all of them by default)
+    """
+    return {name: get_counter(name) for name in (names or COUNTERS)}
+
+def increment_counter(name, delta=1, day=None):
+    """
+    Apply a change to a counter. Counters that are not cached yet are left alone:
+    the next read seeds them from the database, which already includes the change.
+    """
+    if not delta:
+        return
+    try:
+        cache.incr(_counter_key(name, day), delta)
+    except ValueError:
+        pass
+
+def reconcile_counters(*names):
+    """
+    Recompute counters from the database and overwrite the cached values
+    """
+    today = timezone.localdate()
+    values = {}
+
+    for name in names or COUNTERS:
+        values[name] = COUNTERS[name][1](today)
+        cache.set(_counter_key(name, today), values[name], _counter_timeout(name))
+
+    return values
@@ -0,0 +1,43 @@
+import argparse
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from apps.core.querylog import query_stats
+
+class Command(BaseCommand):
+    help = (
+        'Run another management command with every SQL statement recorded and print the '
+        'top offenders, e.g. manage.py query_offenders --limit 20 test apps.students.tests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Number of statements to list')
+        parser.add_argument(
+            '--order-by',
+            choices=['total_time', 'count', 'max_time', 'slow_count', 'n_plus_one_count'],
+            default='total_time',
+            help='Ranking of the statements'
+        )
+        parser.add_argument('command_name', help='Management command to run')
+        parser.add_argument('command_args', nargs=argparse.REMAINDER, help='Arguments of that command')
+
+    def handle(self, *args, **options):
+        query_stats.reset()
+        query_stats.enabled = True
+
+        try:
+            call_command(options['command_name'], *options['command_args'])
+        finally:
+            query_stats.enabled = False
+
+        offenders = query_stats.top(options['limit'], options['order_by'])
+        if not offenders:
+            self.stdout.write(self.style.WARNING('No queries were executed'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Top {len(offenders)} statements by {options["order_by"]}:'))
+        for entry in offenders:
+            self.stdout.write(
+                f"{entry['total_time']:9.3f}s total  {entry['max_time']:7.3f}s max  "
+                f"{entry['count']:7d} runs  {entry['slow_count']:4d} slow  "
+                f"{entry['n_plus_one_count']:4d} N+1  {entry['sql'][:200]}"
+            )
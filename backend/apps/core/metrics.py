@@ -0,0 +1,159 @@
+# apps/core/metrics.py
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class QueryTimer:
+    """
+    connection.execute_wrapper() hook counting the queries of one request and their time
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ns = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration_ns += time.perf_counter_ns() - start
+            self.count += 1
+
+@contextmanager
+def execute_wrapper(connection, wrapper):
+    """
+    Like connection.execute_wrapper(), but removes `wrapper` itself on exit instead of
+    the last entry, so wrappers installed meanwhile (e.g. the QueryInspector added when
+    the connection opens) are left alone
+    """
+    connection.execute_wrappers.append(wrapper)
+    try:
+        yield
+    finally:
+        for index in range(len(connection.execute_wrappers) - 1, -1, -1):
+            if connection.execute_wrappers[index] is wrapper:
+                del connection.execute_wrappers[index]
+                break
+
+class RouteStats:
+    __slots__ = ('bucket_counts', 'count', 'duration_sum', 'query_count', 'db_duration_sum',
+                 'instrumented', 'statuses')
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.duration_sum = 0.0
+        self.query_count = 0
+        self.db_duration_sum = 0.0
+        self.instrumented = 0
+        self.statuses = {}
+
+class RequestMetrics:
+    """
+    In-process per-route request metrics: latency histograms for every request, query
+    counts and database time for the sampled ones. Counters are per worker process,
+    like a Prometheus client without multiprocess mode.
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status_code, duration, query_count=None, db_duration=None):
+        key = (route, method)
+        status_class = f'{status_code // 100}xx'
+
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+
+            stats.count += 1
+            stats.duration_sum += duration
+            for index, upper_bound in enumerate(LATENCY_BUCKETS):
+                if duration <= upper_bound:
+                    stats.bucket_counts[index] += 1
+                    break
+            stats.statuses[status_class] = stats.statuses.get(status_class, 0) + 1
+
+            if query_count is not None:
+                stats.instrumented += 1
+                stats.query_count += query_count
+                stats.db_duration_sum += db_duration
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    'bucket_counts': list(stats.bucket_counts),
+                    'count': stats.count,
+                    'duration_sum': stats.duration_sum,
+                    'query_count': stats.query_count,
+                    'db_duration_sum': stats.db_duration_sum,
+                    'instrumented': stats.instrumented,
+                    'statuses': dict(stats.statuses),
+                }
+                for key, stats in self._routes.items()
+            }
+
+    def render_prometheus(self):
+        """
+        Metrics in the Prometheus text exposition format
+        """
+        lines = [
+            '# HELP toothquest_http_request_duration_seconds API request latency by route.',
+            '# TYPE toothquest_http_request_duration_seconds histogram',
+        ]
+        snapshot = sorted(self.snapshot().items())
+
+        for (route, method), stats in snapshot:
+            labels = f'route="{_escape(route)}",method="{method}"'
+            cumulative = 0
+            for upper_bound, bucket_count in zip(LATENCY_BUCKETS, stats['bucket_counts']):
+                cumulative += bucket_count
+                lines.append(
+                    f'toothquest_http_request_duration_seconds_bucket{{{labels},le="{upper_bound}"}} {cumulative}'
+                )
+            lines.append(f'toothquest_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f'toothquest_http_request_duration_seconds_sum{{{labels}}} {stats["duration_sum"]:.6f}')
+            lines.append(f'toothquest_http_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+        lines += [
+            '# HELP toothquest_http_responses_total API responses by route and status class.',
+            '# TYPE toothquest_http_responses_total counter',
+        ]
+        for (route, method), stats in snapshot:
+            for status_class, count in sorted(stats['statuses'].items()):
+                lines.append(
+                    f'toothquest_http_responses_total{{route="{_escape(route)}",method="{method}",'
+                    f'status="{status_class}"}} {count}'
+                )
+
+        db_metrics = (
+            ('toothquest_http_db_queries_total', 'Database queries of sampled API requests.',
+             'query_count', '{}'),
+            ('toothquest_http_db_duration_seconds_total', 'Database time of sampled API requests.',
+             'db_duration_sum', '{:.6f}'),
+            ('toothquest_http_sampled_requests_total', 'API requests with database instrumentation.',
+             'instrumented', '{}'),
+        )
+        for name, help_text, field, value_format in db_metrics:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (route, method), stats in snapshot:
+                value = value_format.format(stats[field])
+                lines.append(f'{name}{{route="{_escape(route)}",method="{method}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+request_metrics = RequestMetrics()
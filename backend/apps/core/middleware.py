@@ -1,9 +1,19 @@
+import json
 import logging
-from django.utils import timezone
-from apps.users.models import UserActivity
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from apps.core.activity import TRACKED_METHODS, build_route_actions, record_activity
+from apps.core.constants import PERFORMANCE_METRICS
+from apps.core.metrics import QueryTimer, execute_wrapper, request_metrics
+from apps.core.querylog import begin_request, end_request
 from apps.core.utils import get_client_ip
 
 logger = logging.getLogger(__name__)
+# One JSON object per sampled API request when API_METRICS_JSON_LOG is on
+request_logger = logging.getLogger('apps.core.requests')
 
 class ActivityTrackingMiddleware:
     """
@@ -12,22 +22,25 @@ class ActivityTrackingMiddleware:
     
     def __init__(self, get_response):
         self.get_response = get_response
+        # {view_name: {method: action}}, declared on the views with @track_activity
+        self.route_actions = build_route_actions()
 
     def __call__(self, request):
         response = self.get_response(request)
         
+        # Requests to routes without a declared action are dropped before anything else
+        action = self.get_action_from_request(request)
+        
         # Track activity for authenticated users
-        if request.user.is_authenticated and request.method in ['POST', 'PUT', 'DELETE']:
+        if action and request.user.is_authenticated:
             try:
-                # Determine action based on URL and method
-                action = self.get_action_from_request(request)
-                if action:
-                    UserActivity.objects.create(
-                        user=request.user,
-                        action=action,
-                        details=f"{request.method} {request.path}",
-                        ip_address=get_client_ip(request)
-                    )
+                # Queued, written in batches by apps.core.activity.ActivityWriter
+                record_activity(
+                    user_id=request.user.id,
+                    action=action,
+                    details=f"{request.method} {request.path}",
+                    ip_address=get_client_ip(request)
+                )
             except Exception as e:
                 logger.error(f"Failed to track user activity: {e}")
         
@@ -35,35 +48,16 @@ class ActivityTrackingMiddleware:
     
     def get_action_from_request(self, request):
         """
-        Determine action type from request
+        Determine action type from the resolved URL name and method
         """
-        path = request.path.lower()
-        method = request.method
+        if request.method not in TRACKED_METHODS:
+            return None
         
-        if 'login' in path and method == 'POST':
-            return 'User Login'
-        elif 'logout' in path and method == 'POST':
-            return 'User Logout'
-        elif 'questions' in path and method == 'POST':
-            return 'Question Created'
-        elif 'questions' in path and method == 'PUT':
-            return 'Question Updated'
-        elif 'questions' in path and method == 'DELETE':
-            return 'Question Deleted'
-        elif 'users' in path and method == 'POST':
-            return 'User Created'
-        elif 'users' in path and method == 'PUT':
-            return 'User Updated'
-        elif 'users' in path and method == 'DELETE':
-            return 'User Deleted'
-        elif 'access-codes' in path and method == 'POST':
-            return 'Access Code Generated'
-        elif 'reports' in path and 'resolve' in path and method == 'POST':
-            return 'Report Resolved'
-        elif 'reports' in path and 'dismiss' in path and method == 'POST':
-            return 'Report Dismissed'
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
         
-        return None
+        return self.route_actions.get(match.view_name, {}).get(request.method)
 
 class CorsMiddleware:
     """
@@ -86,27 +80,74 @@ class CorsMiddleware:
 
 class APILoggingMiddleware:
     """
-    Middleware to log API requests
+    Middleware to time API requests. Every request feeds the per-route metrics in
+    apps.core.metrics; sampled requests (API_METRICS_SAMPLE_RATE) also count their queries
+    and database time and, with API_METRICS_JSON_LOG, are logged as one JSON line.
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.sample_rate = getattr(settings, 'API_METRICS_SAMPLE_RATE', 1.0)
+        self.json_lines = getattr(settings, 'API_METRICS_JSON_LOG', False)
+        self.slow_threshold = PERFORMANCE_METRICS['api_response_time_warning']
 
     def __call__(self, request):
-        start_time = timezone.now()
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
         
-        response = self.get_response(request)
+        timer = QueryTimer() if random.random() < self.sample_rate else None
+        start = time.perf_counter_ns()
+        
+        if timer is None:
+            response = self.get_response(request)
+        else:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(execute_wrapper(connection, timer))
+                response = self.get_response(request)
+        
+        duration = (time.perf_counter_ns() - start) / 1e9
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        query_count = timer.count if timer else None
+        db_duration = timer.duration_ns / 1e9 if timer else None
         
-        end_time = timezone.now()
-        duration = (end_time - start_time).total_seconds()
+        request_metrics.observe(route, request.method, response.status_code, duration, query_count, db_duration)
         
-        # Log API requests
-        if request.path.startswith('/api/'):
-            logger.info(
-                f"{request.method} {request.path} - "
-                f"Status: {response.status_code} - "
-                f"Duration: {duration:.3f}s - "
-                f"User: {request.user if request.user.is_authenticated else 'Anonymous'}"
+        if duration >= self.slow_threshold:
+            logger.warning(
+                f"Slow API request {request.method} {request.path} ({route}) - "
+                f"Status: {response.status_code} - Duration: {duration:.3f}s - "
+                f"Queries: {query_count if timer else 'not sampled'}"
             )
         
-        return response
\ No newline at end of file
+        if timer and self.json_lines:
+            user = getattr(request, 'user', None)
+            request_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 3),
+                'queries': query_count,
+                'db_ms': round(db_duration * 1000, 3),
+                'user_id': user.id if user is not None and user.is_authenticated else None,
+            }))
+        
+        return response
+
+class QueryInspectionMiddleware:
+    """
+    Gives apps.core.querylog the current request, so slow query logs name the view and
+    repeated statements can be counted per request
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = begin_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            end_request(token)
@@ -1,5 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 20
@@ -27,4 +33,147 @@ class LargeResultsSetPagination(PageNumberPagination):
 class SmallResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 50
\ No newline at end of file
+    max_page_size = 50
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (created_at, id) for append-heavy tables listed newest first.
+    Each page is fetched with a WHERE on the last key seen instead of an OFFSET, so deep
+    pages cost the same as the first one, and the total is only computed on ?count=1
+    (capped at max_count). Requests with ?page=N, or ordered by another field, fall back
+    to CustomPageNumberPagination so page-based clients keep working.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    max_count = 10000
+    ordering_field = 'created_at'
+    fallback_class = CustomPageNumberPagination
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        
+        descending = self.get_direction(request)
+        if descending is None or request.query_params.get('page'):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+        
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count, self.count_exact = self.get_count(queryset, request)
+        position, reverse = self.decode_cursor(request)
+        
+        # Scan direction of this query, previous pages are read backwards and flipped
+        scan_descending = descending != reverse
+        field = self.ordering_field
+        if scan_descending:
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            queryset = queryset.order_by(field, 'id')
+        
+        if position is not None:
+            lookup = 'lt' if scan_descending else 'gt'
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': created_at}) |
+                Q(**{field: created_at, f'id__{lookup}': pk})
+            )
+        
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        
+        self.page = results
+        return results
+    
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        
+        response = {
+            'links': {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link()
+            },
+            'count': self.count,
+            'page_size': self.page_size,
+            'results': data
+        }
+        if self.count is not None:
+            response['count_exact'] = self.count_exact
+        return Response(response)
+    
+    def get_direction(self, request):
+        """
+        True for newest first, False for oldest first, None for orderings keysets don't cover
+        """
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM)
+        if not ordering or ordering == f'-{self.ordering_field}':
+            return True
+        if ordering == self.ordering_field:
+            return False
+        return None
+    
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+    
+    def get_count(self, queryset, request):
+        """
+        Total rows (None unless requested) and whether it is exact or capped at max_count
+        """
+        if request.query_params.get(self.count_query_param) not in ('1', 'true'):
+            return None, False
+        
+        count = queryset.order_by()[:self.max_count + 1].count()
+        if count > self.max_count:
+            return self.max_count, False
+        return count, True
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+    
+    def encode_cursor(self, obj, reverse):
+        created_at = getattr(obj, self.ordering_field)
+        token = f'{created_at.isoformat()}|{obj.pk}|{int(reverse)}'
+        cursor = base64.urlsafe_b64encode(token.encode()).decode()
+        url = remove_query_param(self.base_url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+    
+    def decode_cursor(self, request):
+        """
+        ((created_at, id), reverse) of the cursor in the request, (None, False) without one
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        
+        try:
+            token = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, pk, reverse = token.split('|')
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError(cursor)
+            return (created_at, int(pk)), reverse == '1'
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,155 @@
+# apps/core/querylog.py
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+from django.conf import settings
+from .constants import PERFORMANCE_METRICS
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+# State of the request being served on this thread/task, set by QueryInspectionMiddleware
+_request_state = contextvars.ContextVar('query_request_state', default=None)
+
+def normalize_sql(sql):
+    """
+    SQL with literals and placeholders replaced by '?' and IN lists collapsed, so that
+    executions of the same statement share one shape
+    """
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql.replace('%s', '?'))
+    return _WHITESPACE.sub(' ', sql).strip()
+
+def fingerprint_params(params):
+    """
+    Short stable digest of query parameters, lets logs group identical executions
+    without printing the values
+    """
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+def trimmed_stack(limit=5):
+    """
+    The innermost project frames of the current stack, without Django/library frames
+    """
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(base_dir) and frame.filename != __file__
+        and f'{os.sep}site-packages{os.sep}' not in frame.filename
+    ]
+    return [f'{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} in {frame.name}'
+            for frame in frames[-limit:]]
+
+class QueryStats:
+    """
+    Aggregates per normalized statement: executions, total/max time, slow and N+1 hits.
+    Slow and repeated statements are always recorded, every statement when `enabled`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def record(self, normalized_sql, duration, slow=False, repeated=False):
+        with self._lock:
+            entry = self._statements.get(normalized_sql)
+            if entry is None:
+                entry = self._statements[normalized_sql] = {
+                    'sql': normalized_sql, 'count': 0, 'total_time': 0.0, 'max_time': 0.0,
+                    'slow_count': 0, 'n_plus_one_count': 0,
+                }
+            entry['count'] += 1
+            entry['total_time'] += duration
+            entry['max_time'] = max(entry['max_time'], duration)
+            entry['slow_count'] += int(slow)
+            entry['n_plus_one_count'] += int(repeated)
+
+    def top(self, limit=10, order_by='total_time'):
+        with self._lock:
+            entries = [dict(entry) for entry in self._statements.values()]
+        return sorted(entries, key=lambda entry: entry[order_by], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+query_stats = QueryStats()
+
+class QueryInspector:
+    """
+    Execute wrapper installed on every database connection: logs statements slower than
+    PERFORMANCE_METRICS['slow_query_threshold'] and, within a request, statements that run
+    more than QUERY_N_PLUS_ONE_THRESHOLD times (likely N+1 patterns).
+    """
+
+    def __init__(self, threshold=None, n_plus_one_threshold=None):
+        self.threshold = threshold if threshold is not None else PERFORMANCE_METRICS['slow_query_threshold']
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.inspect(sql, params, time.perf_counter() - start)
+
+    def inspect(self, sql, params, duration):
+        state = _request_state.get()
+        slow = duration >= self.threshold
+        repeated = False
+
+        if state is not None and self.n_plus_one_threshold:
+            # Raw SQL is already parameterized, normalizing is left for the rare hits
+            count = state['counts'][sql] = state['counts'].get(sql, 0) + 1
+            repeated = count == self.n_plus_one_threshold + 1
+
+        if not (slow or repeated or query_stats.enabled):
+            return
+
+        normalized = normalize_sql(sql)
+        query_stats.record(normalized, duration, slow, repeated)
+
+        if slow:
+            logger.warning(
+                f"Slow query ({duration:.3f}s) in {_current_view(state)}: {normalized} "
+                f"[params {fingerprint_params(params)}]\n  " + '\n  '.join(trimmed_stack())
+            )
+        if repeated:
+            logger.warning(
+                f"Possible N+1 in {_current_view(state)}: statement ran more than "
+                f"{self.n_plus_one_threshold} times: {normalized}\n  " + '\n  '.join(trimmed_stack())
+            )
+
+def _current_view(state):
+    if state is None:
+        return 'no request'
+    match = getattr(state['request'], 'resolver_match', None)
+    return match.view_name if match else state['request'].path
+
+def begin_request(request):
+    return _request_state.set({'request': request, 'counts': {}})
+
+def end_request(token):
+    _request_state.reset(token)
+
+def install_query_inspector(sender=None, connection=None, **kwargs):
+    """
+    connection_created receiver adding the QueryInspector to each new connection.
+    It goes first: connections often open inside a connection.execute_wrapper() block,
+    which pops the last wrapper on exit.
+    """
+    if not any(isinstance(wrapper, QueryInspector) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.insert(
+            0, QueryInspector(n_plus_one_threshold=getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 10))
+        )
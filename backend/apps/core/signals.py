@@ -0,0 +1,130 @@
+# apps/core/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from apps.questions.models import Question, QuestionOption, Module, QuestionReport
+from apps.students.models import QuizSession, QuizQuestion
+from apps.users.models import QuizAttempt
+from .cache import invalidate_cache
+from .counters import increment_counter
+
+User = get_user_model()
+
+@receiver([post_save, post_delete], sender=Module)
+def invalidate_module_cache(sender, instance, **kwargs):
+    """
+    Module list is served from cache
+    """
+    invalidate_cache('module_list')
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question_cache(sender, instance, **kwargs):
+    """
+    Question counts feed the admin dashboard
+    """
+    invalidate_cache('dashboard_stats')
+
+@receiver([post_save, post_delete], sender=QuizSession)
+def invalidate_quiz_session_cache(sender, instance, **kwargs):
+    """
+    Student statistics are derived from quiz sessions; they are recomputed from
+    committed rows, so the entry is dropped once the save commits
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_cache('user_stats', user_id=user_id))
+
+@receiver([post_save, post_delete], sender=QuizQuestion)
+def invalidate_quiz_payload(sender, instance, **kwargs):
+    """
+    Quiz delivery payloads are cached per quiz
+    """
+    invalidate_cache('quiz_payload', quiz_id=instance.quiz_id)
+
+def _invalidate_quizzes_of_question(question_id):
+    for quiz_id in QuizQuestion.objects.filter(question_id=question_id).values_list('quiz_id', flat=True):
+        invalidate_cache('quiz_payload', quiz_id=quiz_id)
+
+@receiver(post_save, sender=Question)
+def invalidate_question_quizzes(sender, instance, created, **kwargs):
+    # A new question is not on any quiz yet; deletes reach the quizzes via QuizQuestion
+    if not created:
+        _invalidate_quizzes_of_question(instance.pk)
+
+@receiver([post_save, post_delete], sender=QuestionOption)
+def invalidate_option_quizzes(sender, instance, **kwargs):
+    _invalidate_quizzes_of_question(instance.question_id)
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    User counts feed the admin dashboard; logins alone do not change them
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    
+    invalidate_cache('dashboard_stats')
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cache('user_stats', user_id=user_id))
+
+# Quick stats counters (apps.core.counters)
+
+def _is_pending_account(role, status):
+    return role == 'student' and status == 'pending'
+
+@receiver(pre_save, sender=User)
+def remember_user_state(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the stored role/status so post_save can tell whether the pending count changed
+    """
+    instance._counter_state = None
+    if instance.pk and (update_fields is None or {'role', 'status'} & set(update_fields)):
+        instance._counter_state = sender.objects.filter(pk=instance.pk).values_list(
+            'role', 'status'
+        ).first()
+
+@receiver(post_save, sender=User)
+def count_user(sender, instance, created, **kwargs):
+    is_pending = _is_pending_account(instance.role, instance.status)
+    
+    if created:
+        if instance.role == 'student':
+            increment_counter('users_today', day=timezone.localtime(instance.created_at).date())
+        increment_counter('pending_accounts', int(is_pending))
+    elif getattr(instance, '_counter_state', None):
+        was_pending = _is_pending_account(*instance._counter_state)
+        increment_counter('pending_accounts', int(is_pending) - int(was_pending))
+
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    if instance.role == 'student':
+        increment_counter('users_today', -1, day=timezone.localtime(instance.created_at).date())
+    increment_counter('pending_accounts', -int(_is_pending_account(instance.role, instance.status)))
+
+@receiver(post_save, sender=QuizAttempt)
+def count_quiz_attempt(sender, instance, created, **kwargs):
+    if created:
+        increment_counter('quiz_attempts_today', day=timezone.localtime(instance.created_at).date())
+
+@receiver(post_delete, sender=QuizAttempt)
+def uncount_quiz_attempt(sender, instance, **kwargs):
+    increment_counter('quiz_attempts_today', -1, day=timezone.localtime(instance.created_at).date())
+
+@receiver(pre_save, sender=QuestionReport)
+def remember_report_status(sender, instance, **kwargs):
+    instance._counter_status = None
+    if instance.pk:
+        instance._counter_status = sender.objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
+
+@receiver(post_save, sender=QuestionReport)
+def count_question_report(sender, instance, created, **kwargs):
+    was_pending = not created and getattr(instance, '_counter_status', None) == 'pending'
+    increment_counter('pending_reports', int(instance.status == 'pending') - int(was_pending))
+
+@receiver(post_delete, sender=QuestionReport)
+def uncount_question_report(sender, instance, **kwargs):
+    increment_counter('pending_reports', -int(instance.status == 'pending'))
@@ -175,4 +175,25 @@ def backup_database():
         
     except Exception as e:
         logger.error(f"Database backup failed: {str(e)}")
-        return f"Database backup failed: {str(e)}"
\ No newline at end of file
+        return f"Database backup failed: {str(e)}"
+
+@shared_task
+def reconcile_quick_stats_counters():
+    """
+    Recompute the admin quick stats counters from the database
+    """
+    from .counters import reconcile_counters
+    
+    values = reconcile_counters()
+    logger.info(f"Reconciled quick stats counters: {values}")
+    return values
+
+@shared_task
+def write_user_activities(events):
+    """
+    Insert user activities the in-process writer could not write itself
+    """
+    from .activity import write_activities
+    
+    write_activities(events)
+    return len(events)
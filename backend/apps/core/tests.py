@@ -0,0 +1,252 @@
+# apps/core/tests.py
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import HttpResponse
+from datetime import timedelta
+import os
+import tempfile
+import threading
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.questions.models import Question, QuestionReport
+from apps.questions.utils import module_catalog
+from apps.users.models import UserActivity
+from .activity import ActivityWriter
+from .cache import get_or_set_cached
+from .metrics import QueryTimer, execute_wrapper, request_metrics
+from .middleware import APILoggingMiddleware
+from .querylog import QueryInspector, begin_request, end_request, normalize_sql
+
+User = get_user_model()
+
+class CacheInvalidationTest(TestCase):
+    def test_user_stats_are_dropped_only_after_commit(self):
+        cache.clear()
+        user = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+        cached = lambda: get_or_set_cached('user_stats', lambda: 'fresh', user_id=user.id)
+        get_or_set_cached('user_stats', lambda: 'stale', user_id=user.id)
+        
+        # A request reading between the save and the commit must not cache pre-commit stats
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.first_name = 'Renamed'
+            user.save()
+            self.assertEqual(cached(), 'stale')
+        
+        self.assertTrue(callbacks)
+        self.assertEqual(cached(), 'fresh')
+
+class ActivityWriterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+    
+    def make_event(self, action):
+        return {'user_id': self.user.id, 'action': action, 'details': '', 'ip_address': '127.0.0.1'}
+    
+    def test_overflow_spills_and_flush_writes_batches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spill_path = os.path.join(tmp, 'spill.jsonl')
+            writer = ActivityWriter(queue_size=2, batch_size=2, overflow='spill',
+                                    spill_path=spill_path, background=False)
+            
+            for action in ['one', 'two', 'three']:
+                writer.record(self.make_event(action))
+            self.assertTrue(os.path.exists(spill_path))
+            self.assertEqual(UserActivity.objects.count(), 0)
+            
+            self.assertEqual(writer.flush(), 3)
+            self.assertFalse(os.path.exists(spill_path))
+            self.assertEqual(
+                sorted(UserActivity.objects.values_list('action', flat=True)),
+                ['one', 'three', 'two']
+            )
+    
+    def test_overflow_drop(self):
+        writer = ActivityWriter(queue_size=1, overflow='drop', background=False)
+        writer.record(self.make_event('kept'))
+        writer.record(self.make_event('dropped'))
+        
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(UserActivity.objects.get().action, 'kept')
+
+@override_settings(ACTIVITY_TRACKING_ASYNC=False)
+class ActivityTrackingTest(APITestCase):
+    def setUp(self):
+        module_catalog.clear()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_action_resolved_from_url_name(self):
+        question = Question.objects.create(
+            question_text='Test question?',
+            module_name='Test Module',
+            year=1,
+            difficulty='easy',
+            created_by=self.admin
+        )
+        report = QuestionReport.objects.create(question=question, reported_by=self.admin, reason='Typo')
+        
+        response = self.client.post(f'/api/questions/reports/{report.id}/resolve/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(UserActivity.objects.values_list('action', 'details')),
+            [('Report Resolved', f'POST /api/questions/reports/{report.id}/resolve/')]
+        )
+        
+        # Routes without a declared action, even under /api/questions/, are not tracked
+        self.client.post('/api/questions/modules/', {'name': 'Anatomy', 'year': 1})
+        self.assertEqual(UserActivity.objects.count(), 1)
+
+@override_settings(ACTIVITY_TRACKING_ASYNC=False)
+class RequestMetricsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_metrics_endpoint_reports_route_histograms(self):
+        request_metrics.reset()
+        self.client.get('/api/admin/quick-stats/')
+        self.client.get('/api/admin/quick-stats/')
+        
+        response = self.client.get('/api/admin/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        labels = 'route="quick-stats",method="GET"'
+        self.assertIn(f'toothquest_http_request_duration_seconds_count{{{labels}}} 2', body)
+        self.assertIn(f'toothquest_http_responses_total{{{labels},status="2xx"}} 2', body)
+        self.assertIn(f'toothquest_http_sampled_requests_total{{{labels}}} 2', body)
+    
+    def test_request_leaves_execute_wrappers_as_found(self):
+        wrappers = list(connection.execute_wrappers)
+        self.client.get('/api/admin/quick-stats/')
+        self.assertEqual(connection.execute_wrappers, wrappers)
+        
+        # Wrappers added while the timer is installed survive it
+        timer = QueryTimer()
+        added = QueryTimer()
+        with execute_wrapper(connection, timer):
+            connection.execute_wrappers.append(added)
+        self.assertEqual(connection.execute_wrappers, wrappers + [added])
+        connection.execute_wrappers.remove(added)
+
+class QueryInspectorTest(TestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT *  FROM t1 WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            'SELECT * FROM t1 WHERE id IN (...) AND name = ? LIMIT ?'
+        )
+    
+    def test_slow_and_repeated_statements_are_logged(self):
+        inspector = QueryInspector(threshold=1.0, n_plus_one_threshold=2)
+        sql = 'SELECT "name" FROM "questions_module" WHERE "id" = %s'
+        
+        with self.assertLogs('apps.core.querylog', level='WARNING') as logs:
+            inspector.inspect(sql, (1,), 1.5)
+            
+            token = begin_request(RequestFactory().get('/api/questions/'))
+            try:
+                for module_id in range(4):
+                    inspector.inspect(sql, (module_id,), 0.001)
+            finally:
+                end_request(token)
+        
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('Slow query (1.500s) in no request', logs.output[0])
+        self.assertIn('Possible N+1', logs.output[1])
+        self.assertIn('WHERE "id" = ?', logs.output[1])
+    
+    def test_inspector_survives_connections_opened_inside_the_request_timer(self):
+        def view(request):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return HttpResponse()
+        
+        middleware = APILoggingMiddleware(view)
+        middleware.sample_rate = 1.0
+        wrappers = []
+        
+        def serve():
+            # A fresh thread opens its connection within the first request's timer block
+            try:
+                for _ in range(3):
+                    middleware(RequestFactory().get('/api/unknown/'))
+                wrappers.extend(type(wrapper).__name__ for wrapper in connection.execute_wrappers)
+            finally:
+                connections.close_all()
+        
+        thread = threading.Thread(target=serve)
+        thread.start()
+        thread.join()
+        self.assertEqual(wrappers, ['QueryInspector'])
+
+@override_settings(ACTIVITY_TRACKING_ASYNC=False)
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        
+        # Two activities share a timestamp so ties are broken by id
+        now = timezone.now()
+        self.activities = [
+            UserActivity.objects.create(user=self.admin, action=f'Action {index}',
+                                        created_at=now - timedelta(minutes=index // 2))
+            for index in range(5)
+        ]
+    
+    def test_cursor_walks_every_row_once_in_both_directions(self):
+        expected = sorted(self.activities, key=lambda activity: (activity.created_at, activity.id), reverse=True)
+        
+        response = self.client.get('/api/users/activities/?page_size=2&count=1')
+        self.assertEqual(response.data['count'], 5)
+        self.assertIsNone(response.data['links']['previous'])
+        
+        pages = [response.data]
+        while pages[-1]['links']['next']:
+            pages.append(self.client.get(pages[-1]['links']['next']).data)
+        
+        self.assertEqual([len(page['results']) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [row['id'] for page in pages for row in page['results']],
+            [activity.id for activity in expected]
+        )
+        self.assertIsNone(pages[1]['count'])
+        
+        previous = self.client.get(pages[2]['links']['previous']).data
+        self.assertEqual(previous['results'], pages[1]['results'])
+    
+    def test_page_number_requests_fall_back(self):
+        response = self.client.get('/api/users/activities/?page=2&page_size=2')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['current_page'], 2)
+        
+        response = self.client.get('/api/users/activities/?cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
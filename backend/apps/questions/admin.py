@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Module, Course, Question, QuestionOption, QuestionReport
+from .models import Module, Course, Question, QuestionOption, QuestionReport, QuestionStatistics
 
 @admin.register(Module)
 class ModuleAdmin(admin.ModelAdmin):
@@ -41,4 +41,11 @@ class QuestionReportAdmin(admin.ModelAdmin):
     
     def question_short(self, obj):
         return obj.question.question_text[:30] + '...'
-    question_short.short_description = 'Question'
\ No newline at end of file
+    question_short.short_description = 'Question'
+
+@admin.register(QuestionStatistics)
+class QuestionStatisticsAdmin(admin.ModelAdmin):
+    list_display = ['question', 'responses', 'p_value', 'discrimination', 'median_time_seconds', 'is_flagged']
+    list_filter = ['is_flagged']
+    search_fields = ['question__question_text', 'question__module_name']
+    readonly_fields = ['option_counts', 'time_histogram', 'score_sums', 'flags']
\ No newline at end of file
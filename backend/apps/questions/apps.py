@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class QuestionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.questions'
\ No newline at end of file
+    name = 'apps.questions'
+
+    def ready(self):
+        import apps.questions.signals
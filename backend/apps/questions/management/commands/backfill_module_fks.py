@@ -0,0 +1,72 @@
+# apps/questions/management/commands/backfill_module_fks.py
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.questions.models import Question
+from apps.questions.utils import module_catalog
+from apps.students.models import Quiz
+
+class Command(BaseCommand):
+    help = (
+        'Fill the module/course foreign keys of questions and quizzes from their name columns. '
+        'Works in short primary-key ordered batches so it can run while the site is up.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows updated per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows left to fill')
+    
+    def handle(self, *args, **options):
+        for model in (Question, Quiz):
+            pending = model.objects.filter(module__isnull=True).exclude(module_name='')
+            
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(
+                    f'{pending.count()} {model.__name__} rows without module foreign key'
+                ))
+                continue
+            
+            updated = self.backfill(model, pending, options['batch_size'], options['sleep'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Filled module foreign keys of {updated} {model.__name__} rows'
+            ))
+    
+    def backfill(self, model, pending, batch_size, sleep):
+        # Create any missing Module/Course rows up front, one per distinct name pair
+        ids = {}
+        for module_name, course_name, year in pending.order_by().values_list(
+            'module_name', 'course_name', 'year'
+        ).distinct():
+            if (module_name, course_name) not in ids:
+                ids[(module_name, course_name)] = module_catalog.intern(module_name, course_name, year)
+        
+        updated = 0
+        last_id = 0
+        while True:
+            rows = list(
+                pending.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', 'module_name', 'course_name')[:batch_size]
+            )
+            if not rows:
+                break
+            
+            groups = {}
+            for pk, module_name, course_name in rows:
+                groups.setdefault((module_name, course_name), []).append(pk)
+            
+            with transaction.atomic():
+                for names, pks in groups.items():
+                    if names not in ids:
+                        ids[names] = module_catalog.intern(*names)
+                    module_id, course_id = ids[names]
+                    # Rows saved meanwhile already point at their rows
+                    updated += model.objects.filter(pk__in=pks, module__isnull=True).update(
+                        module_id=module_id, course_id=course_id
+                    )
+            
+            last_id = rows[-1][0]
+            if sleep:
+                time.sleep(sleep)
+        
+        return updated
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def intern_question_modules(apps, schema_editor):
+    """
+    Create the Module/Course rows behind the module_name/course_name strings of
+    existing questions
+    """
+    Module = apps.get_model('questions', 'Module')
+    Course = apps.get_model('questions', 'Course')
+    Question = apps.get_model('questions', 'Question')
+
+    modules = dict(Module.objects.values_list('name', 'id'))
+    courses = set(Course.objects.values_list('module_id', 'name'))
+
+    rows = Question.objects.order_by('module_name', 'year').values_list('module_name', 'course_name', 'year').distinct()
+    for module_name, course_name, year in rows:
+        if module_name not in modules:
+            modules[module_name] = Module.objects.create(name=module_name, year=year).id
+        if course_name and (modules[module_name], course_name) not in courses:
+            Course.objects.create(module_id=modules[module_name], name=course_name)
+            courses.add((modules[module_name], course_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0002_remove_question_course_remove_question_module_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_question_modules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_question_module_fks(apps, schema_editor):
+    """
+    Point existing questions at the Module/Course rows behind their
+    module_name/course_name strings, one UPDATE per distinct name pair
+    """
+    Module = apps.get_model('questions', 'Module')
+    Course = apps.get_model('questions', 'Course')
+    Question = apps.get_model('questions', 'Question')
+
+    modules = dict(Module.objects.values_list('name', 'id'))
+    # Duplicate course names resolve to the oldest row
+    courses = {}
+    for module_id, name, course_id in Course.objects.order_by('-id').values_list('module_id', 'name', 'id'):
+        courses[(module_id, name)] = course_id
+
+    rows = Question.objects.order_by().values_list('module_name', 'course_name').distinct()
+    for module_name, course_name in rows:
+        module_id = modules.get(module_name)
+        if module_id is None:
+            continue
+        Question.objects.filter(module_name=module_name, course_name=course_name).update(
+            module_id=module_id,
+            course_id=courses.get((module_id, course_name)) if course_name else None
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0003_intern_modules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='course',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='questions', to='questions.course'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='module',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='questions', to='questions.module'),
+        ),
+        migrations.RunPython(fill_question_module_fks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0004_question_module_fks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemStatisticsRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('through', models.DateTimeField()),
+                ('responses', models.IntegerField(default=0)),
+                ('questions_updated', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-through'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('responses', models.IntegerField(default=0)),
+                ('correct_responses', models.IntegerField(default=0)),
+                ('option_counts', models.JSONField(blank=True, default=dict)),
+                ('time_histogram', models.JSONField(blank=True, default=dict)),
+                ('scored_responses', models.IntegerField(default=0)),
+                ('score_sums', models.JSONField(blank=True, default=list)),
+                ('p_value', models.FloatField(blank=True, null=True)),
+                ('discrimination', models.FloatField(blank=True, null=True)),
+                ('median_time_seconds', models.IntegerField(blank=True, null=True)),
+                ('flags', models.JSONField(blank=True, default=list)),
+                ('is_flagged', models.BooleanField(default=False)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='questions.question')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+
+def create_start_run(apps, schema_editor):
+    """
+    Store the row the first update_item_statistics run locks and continues from
+    """
+    ItemStatisticsRun = apps.get_model('questions', 'ItemStatisticsRun')
+    if not ItemStatisticsRun.objects.exists():
+        ItemStatisticsRun.objects.create(through=datetime(1970, 1, 1, tzinfo=timezone.utc))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0005_item_statistics'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_start_run, migrations.RunPython.noop),
+    ]
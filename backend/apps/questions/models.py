@@ -1,4 +1,5 @@
 # models.py
+from datetime import datetime, timezone as dt_timezone
 from django.db import models
 from apps.core.models import TimeStampedModel, DifficultyChoices, YearChoices
 from apps.authentication.models import User
@@ -32,6 +33,11 @@ class Question(TimeStampedModel):
     explanation_image = models.ImageField(upload_to='questions/explanations/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_questions')
+    # Interned rows behind module_name/course_name, filled on save (existing rows by
+    # migration 0004); reads take the current names through these keys, the string
+    # columns keep the names the row was saved with
+    module = models.ForeignKey(Module, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='questions')
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='questions')
     
     def __str__(self):
         return f"{self.question_text[:50]}..."
@@ -68,4 +74,136 @@ class QuestionReport(TimeStampedModel):
     resolved_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
-        return f"Report for Question {self.question.id} by {self.reported_by.email}"
\ No newline at end of file
+        return f"Report for Question {self.question.id} by {self.reported_by.email}"
+
+class QuestionStatistics(TimeStampedModel):
+    """
+    Item analysis of a question, accumulated incrementally by update_item_statistics
+    from completed quiz session answers and practice attempts.
+
+    Only sums are stored, so new responses are merged without rereading old ones:
+    option_counts and time_histogram map option letters / whole seconds to counts,
+    score_sums holds [sum x, sum y, sum y^2, sum xy] over scored responses where x is
+    the item score and y the rest of the session score, for the discrimination index.
+    """
+    FLAGS = (
+        'difficulty_mismatch', 'too_easy', 'too_hard',
+        'negative_discrimination', 'low_discrimination', 'distractor_beats_key',
+    )
+    
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='statistics')
+    responses = models.IntegerField(default=0)
+    correct_responses = models.IntegerField(default=0)
+    option_counts = models.JSONField(default=dict, blank=True)
+    time_histogram = models.JSONField(default=dict, blank=True)
+    scored_responses = models.IntegerField(default=0)
+    score_sums = models.JSONField(default=list, blank=True)
+    # Derived from the sums on every update
+    p_value = models.FloatField(null=True, blank=True)
+    discrimination = models.FloatField(null=True, blank=True)
+    median_time_seconds = models.IntegerField(null=True, blank=True)
+    flags = models.JSONField(default=list, blank=True)
+    is_flagged = models.BooleanField(default=False)
+    
+    def __str__(self):
+        return f"Statistics for Question {self.question_id}"
+    
+    def add_response(self, selected_option, is_correct, seconds=None, rest_score=None, max_seconds=600):
+        self.responses += 1
+        self.correct_responses += int(is_correct)
+        self.option_counts[selected_option] = self.option_counts.get(selected_option, 0) + 1
+        
+        if seconds:
+            bucket = str(min(int(seconds), max_seconds))
+            self.time_histogram[bucket] = self.time_histogram.get(bucket, 0) + 1
+        
+        if rest_score is not None:
+            x = float(is_correct)
+            sums = self.score_sums or [0.0, 0.0, 0.0, 0.0]
+            self.score_sums = [sums[0] + x, sums[1] + rest_score, sums[2] + rest_score ** 2, sums[3] + x * rest_score]
+            self.scored_responses += 1
+    
+    def merge(self, other):
+        """
+        Add the responses accumulated in another (unsaved) instance
+        """
+        self.responses += other.responses
+        self.correct_responses += other.correct_responses
+        for letter, count in other.option_counts.items():
+            self.option_counts[letter] = self.option_counts.get(letter, 0) + count
+        for bucket, count in other.time_histogram.items():
+            self.time_histogram[bucket] = self.time_histogram.get(bucket, 0) + count
+        if other.scored_responses:
+            sums = self.score_sums or [0.0, 0.0, 0.0, 0.0]
+            self.score_sums = [total + value for total, value in zip(sums, other.score_sums)]
+            self.scored_responses += other.scored_responses
+    
+    def evaluate(self, difficulty, correct_letters, thresholds, min_responses):
+        """
+        Recompute the derived columns and flags, see ITEM_ANALYSIS for the thresholds.
+        `correct_letters` holds every correct option of the question.
+        """
+        self.p_value = self.correct_responses / self.responses if self.responses else None
+        self.discrimination = self._point_biserial()
+        self.median_time_seconds = self._median_time()
+        
+        flags = []
+        if self.responses >= min_responses:
+            low, high = thresholds['expected_p_values'].get(difficulty, (0.0, 1.0))
+            if not low <= self.p_value <= high:
+                flags.append('difficulty_mismatch')
+            if self.p_value > thresholds['too_easy_p_value']:
+                flags.append('too_easy')
+            if self.p_value < thresholds['too_hard_p_value']:
+                flags.append('too_hard')
+            if self.discrimination is not None:
+                if self.discrimination < 0:
+                    flags.append('negative_discrimination')
+                elif self.discrimination < thresholds['min_discrimination']:
+                    flags.append('low_discrimination')
+            # A wrong option picked more often than every correct one usually means a wrong key
+            key_count = max((self.option_counts.get(letter, 0) for letter in correct_letters), default=0)
+            if any(count > key_count for letter, count in self.option_counts.items() if letter not in correct_letters):
+                flags.append('distractor_beats_key')
+        
+        self.flags = flags
+        self.is_flagged = bool(flags)
+    
+    def _point_biserial(self):
+        n = self.scored_responses
+        if n < 2:
+            return None
+        sum_x, sum_y, sum_yy, sum_xy = self.score_sums
+        variance_x = n * sum_x - sum_x ** 2
+        variance_y = n * sum_yy - sum_y ** 2
+        if variance_x <= 0 or variance_y <= 0:
+            return None
+        return (n * sum_xy - sum_x * sum_y) / (variance_x * variance_y) ** 0.5
+    
+    def _median_time(self):
+        total = sum(self.time_histogram.values())
+        if not total:
+            return None
+        seen = 0
+        for seconds in sorted(self.time_histogram, key=int):
+            seen += self.time_histogram[seconds]
+            if seen * 2 >= total:
+                return int(seconds)
+
+class ItemStatisticsRun(TimeStampedModel):
+    """
+    One update_item_statistics run; `through` is the high-water mark the next run
+    continues from. Migration 0006 stores a starting row at START, so there is always
+    a latest row for runs to lock.
+    """
+    START = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    
+    through = models.DateTimeField()
+    responses = models.IntegerField(default=0)
+    questions_updated = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-through']
+    
+    def __str__(self):
+        return f"Item statistics through {self.through}"
\ No newline at end of file
@@ -1,6 +1,7 @@
 # serializers.py
 from rest_framework import serializers
 from .models import Module, Course, Question, QuestionOption, QuestionReport
+from .utils import answer_keys, module_catalog
 
 class ModuleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,6 +15,18 @@ class CourseSerializer(serializers.ModelSerializer):
         model = Course
         fields = '__all__'
 
+class CatalogNamesMixin:
+    """
+    Emit module_name/course_name as the current names behind the foreign keys, so a
+    renamed module shows without rewriting the rows that point at it
+    """
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'module_name' in data:
+            data['module_name'], data['course_name'] = module_catalog.names_of(instance)
+        return data
+
 class QuestionOptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = QuestionOption
@@ -24,8 +37,8 @@ class QuestionOptionCreateSerializer(serializers.ModelSerializer):
         model = QuestionOption
         fields = ['option_text', 'option_letter', 'is_correct']
 
-class QuestionSerializer(serializers.ModelSerializer):
-    # Create mock objects for frontend compatibility
+class QuestionSerializer(CatalogNamesMixin, serializers.ModelSerializer):
+    # Module/course objects for frontend compatibility
     module = serializers.SerializerMethodField()
     course = serializers.SerializerMethodField()
     created_by = serializers.SerializerMethodField()
@@ -36,18 +49,17 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = '__all__'
     
     def get_module(self, obj):
-        # Return a mock module object for frontend compatibility
+        # Module/Course rows are interned on save, names come from the in-memory catalog
         return {
-            'id': hash(obj.module_name) % 10000,  # Generate a consistent fake ID
-            'name': obj.module_name,
+            'id': obj.module_id,
+            'name': module_catalog.names_of(obj)[0],
             'year': obj.year
         }
     
     def get_course(self, obj):
-        # Return a mock course object for frontend compatibility
         return {
-            'id': hash(obj.course_name) % 10000,  # Generate a consistent fake ID
-            'name': obj.course_name
+            'id': obj.course_id,
+            'name': module_catalog.names_of(obj)[1]
         }
     
     def get_created_by(self, obj):
@@ -61,14 +73,14 @@ class QuestionSerializer(serializers.ModelSerializer):
 class QuestionCreateUpdateSerializer(serializers.ModelSerializer):
     options = QuestionOptionCreateSerializer(many=True)
     # Accept string values from frontend
-    module_name = serializers.CharField(source='module_name')
-    course_name = serializers.CharField(source='course_name')
+    module_name = serializers.CharField()
+    course_name = serializers.CharField()
     
     class Meta:
         model = Question
         fields = [
             'question_text', 'module_name', 'course_name', 'year', 
-            'difficulty', 'explanation', 'image', 'explanation_image', 'options'
+            'difficulty', 'explanation', 'image', 'explanation_image', 'is_active', 'options'
         ]
     
     def create(self, validated_data):
@@ -95,6 +107,10 @@ class QuestionCreateUpdateSerializer(serializers.ModelSerializer):
             for option_data in options_data:
                 QuestionOption.objects.create(question=instance, **option_data)
         
+        # Grading uses cached answer keys, drop the stale entry
+        if options_data:
+            answer_keys.invalidate(instance.id)
+        
         return instance
 
 class QuestionReportSerializer(serializers.ModelSerializer):
@@ -0,0 +1,44 @@
+# apps/questions/signals.py
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Module, Course, Question
+from .utils import question_pool, module_catalog
+
+@receiver(pre_save, sender=Question)
+def intern_question_module(sender, instance, **kwargs):
+    """
+    Point the module/course foreign keys at the rows behind the strings (no query once interned)
+    """
+    module_catalog.intern_row(instance)
+
+@receiver(post_save, sender=Question)
+def update_question_pool(sender, instance, **kwargs):
+    """
+    Keep the quiz question pool index current, once the change is committed
+    """
+    transaction.on_commit(lambda: question_pool.update(instance))
+
+@receiver(post_delete, sender=Question)
+def remove_from_question_pool(sender, instance, **kwargs):
+    question_id = instance.id
+    transaction.on_commit(lambda: question_pool.remove(question_id))
+
+@receiver(post_save, sender=Module)
+def update_module_catalog(sender, instance, created, **kwargs):
+    # Rows read the current name through their foreign key (module_catalog.names_of),
+    # a rename only has to reach the catalog; course entries are keyed by module name too
+    if created:
+        transaction.on_commit(lambda: module_catalog.add_module(instance))
+    else:
+        transaction.on_commit(module_catalog.clear)
+
+@receiver(post_save, sender=Course)
+def update_course_catalog(sender, instance, **kwargs):
+    transaction.on_commit(lambda: module_catalog.add_course(instance))
+
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Course)
+def reload_module_catalog(sender, instance, **kwargs):
+    # Deletes are rare, the next lookup reloads the whole table
+    module_catalog.clear()
@@ -0,0 +1,465 @@
+# apps/questions/utils.py
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import FilteredRelation, Q
+from apps.core.cache import cache_version, invalidate_cache
+from .models import Module, Course, Question, QuestionOption
+
+logger = logging.getLogger(__name__)
+
+class AnswerKeyCache:
+    """
+    Process-local map of question_id -> correct option letters used for grading, a
+    sorted tuple since a question may have several correct options.
+
+    Entries live for ANSWER_KEY_CACHE_LOCAL_TIMEOUT seconds. invalidate() also bumps the
+    'answer_keys' version in the default cache, every worker drops its local entries when
+    it sees a new version. That only reaches other workers when the default cache is
+    shared (REDIS_CACHE_URL); with the LocMemCache fallback each process has its own
+    version, so edits made in another worker show up after the local timeout at most.
+    When ANSWER_KEY_CACHE_ALIAS names a configured cache backend (e.g. Redis), it is
+    consulted before the database and shared across workers.
+    """
+
+    key_prefix = 'answer_key'
+    max_entries = 50000
+
+    def __init__(self):
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def local_timeout(self):
+        return getattr(settings, 'ANSWER_KEY_CACHE_LOCAL_TIMEOUT', 60)
+
+    @property
+    def shared_cache(self):
+        alias = getattr(settings, 'ANSWER_KEY_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def _shared_key(self, question_id):
+        return f'{self.key_prefix}_{question_id}'
+
+    def get(self, question_id):
+        """
+        Return the correct letters of a question (empty if it has no correct option).
+        Raises Question.DoesNotExist for unknown questions.
+        """
+        keys = self.get_many([question_id])
+        if question_id not in keys:
+            raise Question.DoesNotExist(f'Question {question_id} does not exist')
+        return keys[question_id]
+
+    def get_many(self, question_ids):
+        """
+        Return {question_id: correct_letters} for the given ids, loading misses in one query
+        """
+        self._sync_version()
+        now = time.monotonic()
+        found = {}
+        missing = []
+
+        with self._lock:
+            for question_id in set(question_ids):
+                entry = self._entries.get(question_id)
+                if entry and entry[1] > now:
+                    found[question_id] = entry[0]
+                else:
+                    missing.append(question_id)
+
+        if missing and self.shared_cache is not None:
+            shared = self.shared_cache.get_many([self._shared_key(qid) for qid in missing])
+            for question_id in list(missing):
+                key = self._shared_key(question_id)
+                if key in shared:
+                    found[question_id] = shared[key]
+                    missing.remove(question_id)
+                    self._store({question_id: shared[key]})
+
+        if missing:
+            found.update(self._load(Question.objects.filter(id__in=missing)))
+
+        return found
+
+    def invalidate(self, *question_ids):
+        with self._lock:
+            for question_id in question_ids:
+                self._entries.pop(question_id, None)
+
+        if self.shared_cache is not None:
+            self.shared_cache.delete_many([self._shared_key(qid) for qid in question_ids])
+
+        # Other workers drop their local copies when they see the new version
+        invalidate_cache('answer_keys')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _sync_version(self):
+        version = cache_version('answer_keys')
+        if version != self._version:
+            with self._lock:
+                self._entries.clear()
+                self._version = version
+
+    def _load(self, questions):
+        # One row per correct option, a single row with a NULL letter when there is none
+        letters = {}
+        for question_id, letter in questions.order_by().annotate(
+            correct_option=FilteredRelation('options', condition=Q(options__is_correct=True))
+        ).values_list('id', 'correct_option__option_letter'):
+            letters.setdefault(question_id, set())
+            if letter:
+                letters[question_id].add(letter)
+        keys = {question_id: tuple(sorted(found)) for question_id, found in letters.items()}
+
+        self._store(keys)
+        if keys and self.shared_cache is not None:
+            self.shared_cache.set_many(
+                {self._shared_key(qid): correct for qid, correct in keys.items()},
+                getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 3600)
+            )
+
+        return keys
+
+    def _store(self, keys):
+        expires_at = time.monotonic() + self.local_timeout
+
+        with self._lock:
+            # Simple bound on memory: start over rather than track recency
+            if len(self._entries) + len(keys) > self.max_entries:
+                self._entries.clear()
+            for question_id, correct in keys.items():
+                self._entries[question_id] = (correct, expires_at)
+
+answer_keys = AnswerKeyCache()
+
+class QuestionPoolIndex:
+    """
+    Process-local index of question ids keyed by (module_id, course_id, year,
+    difficulty, is_active), used to draw quiz questions without touching the table.
+
+    Requests only read it: the first read starts a background thread that builds the
+    index with one values_list query and rebuilds it every QUESTION_POOL_REFRESH_SECONDS,
+    so changes made by other workers or by queryset updates (which send no signals) show
+    up too. In between, the Question save/delete signals keep it current. Until the first
+    build is done, ids() runs a filtered query and fields_of() knows no question.
+    """
+
+    fields = ('module_id', 'course_id', 'year', 'difficulty', 'is_active')
+
+    def __init__(self):
+        self._pools = {}
+        self._keys = {}
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'QUESTION_POOL_REFRESH_SECONDS', 300)
+
+    @property
+    def background_refresh(self):
+        return getattr(settings, 'QUESTION_POOL_BACKGROUND_REFRESH', True)
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def key_for(self, question):
+        return tuple(getattr(question, field) for field in self.fields)
+
+    def ids(self, module_id, course_id=None, year=None, difficulty=None, is_active=True):
+        """
+        Sorted ids of the questions matching the given fields, None matches any value
+        """
+        wanted = (module_id, course_id, year, difficulty, is_active)
+        if not self.is_built:
+            self.start()
+            filters = {field: value for field, value in zip(self.fields, wanted) if value is not None}
+            return list(Question.objects.filter(**filters).order_by('id').values_list('id', flat=True))
+
+        matched = set()
+        with self._lock:
+            for key, question_ids in self._pools.items():
+                if all(value is None or value == key_value for value, key_value in zip(wanted, key)):
+                    matched |= question_ids
+
+        return sorted(matched)
+
+    def fields_of(self, question_id):
+        """
+        Indexed field values of a question as a {field: value} dict, None if unknown
+        """
+        if not self.is_built:
+            self.start()
+            return None
+        key = self._keys.get(question_id)
+        return dict(zip(self.fields, key)) if key is not None else None
+
+    def update(self, question):
+        """
+        Move a saved question to the pool of its current fields
+        """
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._discard(question.id)
+            key = self.key_for(question)
+            self._pools.setdefault(key, set()).add(question.id)
+            self._keys[question.id] = key
+
+    def remove(self, question_id):
+        with self._lock:
+            self._discard(question_id)
+
+    def rebuild(self):
+        pools = {}
+        keys = {}
+        for question_id, *key in Question.objects.order_by().values_list('id', *self.fields):
+            key = tuple(key)
+            pools.setdefault(key, set()).add(question_id)
+            keys[question_id] = key
+
+        with self._lock:
+            self._pools = pools
+            self._keys = keys
+            self._built_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._pools = {}
+            self._keys = {}
+            self._built_at = None
+
+    def start(self):
+        """
+        Start the refresher thread unless it runs already or QUESTION_POOL_BACKGROUND_REFRESH is off
+        """
+        if not self.background_refresh:
+            return
+
+        # Threads do not survive fork(), so a dead thread is restarted in the child
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._thread = threading.Thread(target=self._run, name='question-pool-refresher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.rebuild()
+            except Exception as e:
+                logger.error(f"Failed to rebuild the question pool: {e}")
+            finally:
+                # The thread owns its own database connection
+                connection.close()
+            time.sleep(self.refresh_interval)
+
+    def _discard(self, question_id):
+        key = self._keys.pop(question_id, None)
+        if key is None:
+            return
+        pool = self._pools.get(key)
+        if pool is not None:
+            pool.discard(question_id)
+            if not pool:
+                del self._pools[key]
+
+question_pool = QuestionPoolIndex()
+
+class ModuleCatalog:
+    """
+    Process-local lookup of the Module/Course rows behind the module_name/course_name
+    strings of questions and quizzes, and of the current names behind their foreign
+    keys, so serializers emit stable ids and renamed names without queries.
+
+    Loaded with two values_list queries and kept current by the Module/Course signals
+    once their changes are committed.
+    A lookup miss reloads the table (at most every `miss_reload_interval` seconds) and
+    the whole table is reloaded every MODULE_CATALOG_REFRESH_SECONDS.
+    """
+
+    miss_reload_interval = 30
+
+    def __init__(self):
+        self._modules = {}
+        self._courses = {}
+        self._module_names = {}
+        self._course_names = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'MODULE_CATALOG_REFRESH_SECONDS', 300)
+
+    def module_id(self, module_name):
+        return self._lookup('_modules', module_name)
+
+    def course_id(self, module_name, course_name):
+        if not course_name:
+            return None
+        return self._lookup('_courses', (module_name, course_name))
+
+    def names_of(self, obj):
+        """
+        Current (module_name, course_name) of a question or quiz, read through its foreign
+        keys so a renamed module shows without rewriting the rows. The stored strings are
+        the fallback for rows whose keys are not filled yet.
+        """
+        module_name = obj.module_id and self._lookup('_module_names', obj.module_id)
+        if not module_name:
+            return obj.module_name, obj.course_name
+        course_name = obj.course_id and self._lookup('_course_names', obj.course_id)
+        return module_name, course_name or obj.course_name
+
+    def intern(self, module_name, course_name='', year=None):
+        """
+        Ids of the Module (and Course) rows for these names, created when missing.
+        Returns (module_id, course_id); course_id is None without a course name.
+        """
+        # Rows are only added to the catalog once committed, a rollback cannot leave
+        # ids of rows that never existed behind
+        module_id = self.module_id(module_name)
+        if module_id is None:
+            module, created = Module.objects.get_or_create(
+                name=module_name,
+                defaults={'year': year or 1}
+            )
+            module_id = module.id
+            transaction.on_commit(lambda: self.add_module(module))
+
+        course_id = None
+        if course_name:
+            course_id = self.course_id(module_name, course_name)
+            if course_id is None:
+                course = Course.objects.filter(module_id=module_id, name=course_name).order_by('id').first()
+                if course is None:
+                    course = Course.objects.create(module_id=module_id, name=course_name)
+                course_id = course.id
+                transaction.on_commit(lambda: self.add_course(course, module_name))
+
+        return module_id, course_id
+
+    def intern_row(self, instance):
+        """
+        Fill the module/course foreign keys of a question or quiz from its name strings.
+        A row whose strings are still the stored ones keeps its keys (and takes the current
+        names), so the old strings of a renamed module do not create that module again.
+        """
+        names = (instance.module_name, instance.course_name)
+        if instance.pk and instance.module_id and names != self.names_of(instance):
+            stored = type(instance).objects.filter(pk=instance.pk).values_list(
+                'module_name', 'course_name'
+            ).first()
+            if stored == names:
+                instance.module_name, instance.course_name = self.names_of(instance)
+                return
+
+        instance.module_id, instance.course_id = self.intern(
+            instance.module_name, instance.course_name, instance.year
+        )
+
+    def add_module(self, module):
+        with self._lock:
+            for name, module_id in list(self._modules.items()):
+                if module_id == module.id and name != module.name:
+                    del self._modules[name]
+            self._modules[module.name] = module.id
+            self._module_names[module.id] = module.name
+        return module.id
+
+    def add_course(self, course, module_name=None):
+        if module_name is None:
+            module_name = Module.objects.filter(id=course.module_id).values_list('name', flat=True).first()
+        with self._lock:
+            for key, course_id in list(self._courses.items()):
+                if course_id == course.id and key != (module_name, course.name):
+                    del self._courses[key]
+            # Duplicate course names resolve to the oldest row
+            self._course_names[course.id] = course.name
+            current = self._courses.get((module_name, course.name))
+            if current is None or course.id < current:
+                self._courses[(module_name, course.name)] = course.id
+        return self._courses[(module_name, course.name)]
+
+    def clear(self):
+        with self._lock:
+            self._modules = {}
+            self._courses = {}
+            self._module_names = {}
+            self._course_names = {}
+            self._loaded_at = None
+
+    def load(self):
+        module_names = dict(Module.objects.values_list('id', 'name'))
+        modules = {name: module_id for module_id, name in module_names.items()}
+        courses = {}
+        course_names = {}
+        for module_name, course_name, course_id in Course.objects.order_by('-id').values_list(
+            'module__name', 'name', 'id'
+        ):
+            courses[(module_name, course_name)] = course_id
+            course_names[course_id] = course_name
+
+        with self._lock:
+            self._modules = modules
+            self._courses = courses
+            self._module_names = module_names
+            self._course_names = course_names
+            self._loaded_at = time.monotonic()
+
+    def _lookup(self, table_name, key):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_interval:
+            self.load()
+            loaded_at = self._loaded_at
+
+        # load() swaps the tables, so look them up by name after each reload
+        value = getattr(self, table_name).get(key)
+        if value is None and time.monotonic() - loaded_at > self.miss_reload_interval:
+            self.load()
+            value = getattr(self, table_name).get(key)
+        return value
+
+module_catalog = ModuleCatalog()
+
+def module_filter(module_name, course_name=None, prefix=''):
+    """
+    Filter kwargs selecting the rows of a module (and course) by name. Resolved to the
+    indexed foreign keys through the catalog while MODULE_FK_FILTERS is on; migrations
+    fill the keys of existing rows and saves keep them current.
+    """
+    filters = {f'{prefix}module_name': module_name}
+    if course_name:
+        filters[f'{prefix}course_name'] = course_name
+
+    if not getattr(settings, 'MODULE_FK_FILTERS', True):
+        return filters
+
+    module_id = module_catalog.module_id(module_name)
+    if module_id is None:
+        return filters
+    fk_filters = {f'{prefix}module_id': module_id}
+
+    if course_name:
+        course_id = module_catalog.course_id(module_name, course_name)
+        if course_id is None:
+            return filters
+        fk_filters[f'{prefix}course_id'] = course_id
+
+    return fk_filters
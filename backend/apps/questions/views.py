@@ -5,12 +5,16 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
 from .models import Module, Course, Question, QuestionReport
+from apps.core.cache import CachedListMixin
+from apps.core.activity import track_activity
+from .utils import module_filter
 from .serializers import (
     ModuleSerializer, CourseSerializer, QuestionSerializer, 
     QuestionCreateUpdateSerializer, QuestionReportSerializer
 )
 
-class ModuleListCreateView(generics.ListCreateAPIView):
+class ModuleListCreateView(CachedListMixin, generics.ListCreateAPIView):
+    cache_name = 'module_list'
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -41,16 +45,29 @@ class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 class QuestionListCreateView(generics.ListCreateAPIView):
+    activity_action = {'POST': 'Question Created'}
     # Removed 'module' and 'course' from select_related as they are no longer ForeignKeys on Question
     queryset = Question.objects.select_related('created_by').prefetch_related('options')
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    # Changed 'module' to 'module_name' and 'course' to 'course_name' for filtering
-    filterset_fields = ['module_name', 'course_name', 'year', 'difficulty', 'is_active']
-    search_fields = ['question_text', 'explanation', 'module_name', 'course_name'] # Added module_name and course_name
+    # module_name/course_name are resolved to the foreign keys in get_queryset
+    filterset_fields = ['module', 'course', 'year', 'difficulty', 'is_active']
+    search_fields = ['question_text', 'explanation', 'module__name', 'course__name']
     ordering_fields = ['created_at', 'difficulty', 'year']
     ordering = ['-created_at']
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        module_name = self.request.query_params.get('module_name')
+        course_name = self.request.query_params.get('course_name')
+        
+        if module_name:
+            queryset = queryset.filter(**module_filter(module_name, course_name))
+        elif course_name:
+            queryset = queryset.filter(course__name=course_name)
+        
+        return queryset
+    
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return QuestionCreateUpdateSerializer
@@ -60,6 +77,7 @@ class QuestionListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 class QuestionDetailView(generics.RetrieveUpdateDestroyAPIView):
+    activity_action = {'PUT': 'Question Updated', 'DELETE': 'Question Deleted'}
     # Removed 'module' and 'course' from select_related as they are no longer ForeignKeys on Question
     queryset = Question.objects.select_related('created_by').prefetch_related('options')
     permission_classes = [permissions.IsAuthenticated]
@@ -70,6 +88,7 @@ class QuestionDetailView(generics.RetrieveUpdateDestroyAPIView):
         return QuestionSerializer
 
 class QuestionReportListCreateView(generics.ListCreateAPIView):
+    activity_action = {'POST': 'Question Reported'}
     queryset = QuestionReport.objects.select_related('question', 'reported_by', 'resolved_by')
     serializer_class = QuestionReportSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -94,6 +113,7 @@ class QuestionReportDetailView(generics.RetrieveUpdateDestroyAPIView):
         else:
             serializer.save()
 
+@track_activity('Report Resolved')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def resolve_report(request, pk):
@@ -111,6 +131,7 @@ def resolve_report(request, pk):
     except QuestionReport.DoesNotExist:
         return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@track_activity('Report Dismissed')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def dismiss_report(request, pk):
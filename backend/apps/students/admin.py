@@ -2,7 +2,8 @@
 from django.contrib import admin
 from .models import (
     Quiz, QuizQuestion, QuizSession, QuizAnswer,
-    StudentCalendarEvent, StudentNote, StudentPreference
+    StudentCalendarEvent, StudentNote, StudentPreference, StudentStatistics,
+    StudentRecommendation, StudentMastery
 )
 
 @admin.register(Quiz)
@@ -87,4 +88,22 @@ class StudentNoteAdmin(admin.ModelAdmin):
 class StudentPreferenceAdmin(admin.ModelAdmin):
     list_display = ['user', 'preferred_study_time', 'difficulty_preference', 'daily_study_goal_minutes']
     list_filter = ['preferred_study_time', 'difficulty_preference', 'theme_preference']
-    search_fields = ['user__email', 'user__full_name']
\ No newline at end of file
+    search_fields = ['user__email', 'user__full_name']
+
+@admin.register(StudentStatistics)
+class StudentStatisticsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'quizzes_completed', 'best_score', 'current_streak', 'last_study_date', 'updated_at']
+    search_fields = ['user__email', 'user__full_name']
+    readonly_fields = ['module_stats', 'difficulty_stats', 'daily_stats']
+
+@admin.register(StudentRecommendation)
+class StudentRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'version', 'computed_at']
+    search_fields = ['user__email', 'user__full_name']
+    readonly_fields = ['quiz_ids', 'version', 'computed_at']
+
+@admin.register(StudentMastery)
+class StudentMasteryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'updated_at']
+    search_fields = ['user__email', 'user__full_name']
+    readonly_fields = ['module_ids', 'course_ids', 'successes', 'failures']
\ No newline at end of file
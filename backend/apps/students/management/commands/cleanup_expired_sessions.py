@@ -1,10 +1,10 @@
 # apps/students/management/commands/cleanup_expired_sessions.py
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from apps.students.models import QuizSession
 
 class Command(BaseCommand):
-    help = 'Clean up expired quiz sessions'
+    help = 'Persist the expiry of lapsed quiz sessions in small batches'
     
     def add_arguments(self, parser):
         parser.add_argument(
@@ -12,26 +12,26 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be cleaned up without making changes',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'QUIZ_SESSION_EXPIRY_BATCH_SIZE', 500),
+            help='Sessions updated per UPDATE statement',
+        )
     
     def handle(self, *args, **options):
-        now = timezone.now()
-        expired_sessions = QuizSession.objects.filter(
-            status='in_progress',
-            expires_at__lt=now
-        )
-        
-        count = expired_sessions.count()
-        
         if options['dry_run']:
+            lapsed_sessions = QuizSession.objects.lapsed()
+            count = lapsed_sessions.count()
             self.stdout.write(
                 self.style.WARNING(f'Would expire {count} quiz sessions')
             )
-            for session in expired_sessions[:10]:  # Show first 10
+            for session in lapsed_sessions.select_related('user')[:10]:  # Show first 10
                 self.stdout.write(f'  - Session {session.id} by {session.user.email}')
             if count > 10:
                 self.stdout.write(f'  ... and {count - 10} more')
         else:
-            expired_sessions.update(status='expired')
+            count = QuizSession.objects.expire_lapsed(batch_size=options['batch_size'])
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully expired {count} quiz sessions')
-            )
\ No newline at end of file
+            )
@@ -2,7 +2,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from apps.students.models import Quiz
-from apps.questions.models import Question
 from apps.students.utils import generate_quiz_questions
 
 User = get_user_model()
@@ -156,15 +155,11 @@ class Command(BaseCommand):
             
             if created:
                 # Try to generate questions for the quiz
-                available_questions_count = Question.objects.filter(
-                    module_name=quiz_data['module_name'],
-                    is_active=True
-                ).count()
+                selected_ids = generate_quiz_questions(quiz, quiz_data['questions_count'])
                 
-                if available_questions_count > 0:
-                    generate_quiz_questions(quiz, min(quiz_data['questions_count'], available_questions_count))
+                if selected_ids:
                     created_count += 1
-                    self.stdout.write(f'Created quiz: {quiz.title} with {min(quiz_data["questions_count"], available_questions_count)} questions')
+                    self.stdout.write(f'Created quiz: {quiz.title} with {len(selected_ids)} questions')
                 else:
                     self.stdout.write(
                         self.style.WARNING(f'Created quiz: {quiz.title} but no questions found for module {quiz_data["module_name"]}')
@@ -0,0 +1,31 @@
+# apps/students/management/commands/reconcile_user_progress.py
+from django.core.management.base import BaseCommand
+from apps.students.utils import reconcile_user_progress
+
+class Command(BaseCommand):
+    help = 'Recompute user progress totals from the full quiz session history'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only reconcile the given user ID (can be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of progress rows written per query',
+        )
+    
+    def handle(self, *args, **options):
+        count = reconcile_user_progress(
+            user_ids=options.get('user_ids'),
+            batch_size=options['batch_size']
+        )
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled progress for {count} users')
+        )
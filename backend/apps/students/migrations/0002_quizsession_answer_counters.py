@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:07
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_answer_counters(apps, schema_editor):
+    QuizSession = apps.get_model('students', 'QuizSession')
+    
+    sessions = QuizSession.objects.annotate(
+        answers_total=Count('answers'),
+        answers_correct=Count('answers', filter=Q(answers__is_correct=True))
+    ).filter(answers_total__gt=0)
+    
+    for session in sessions.iterator():
+        QuizSession.objects.filter(pk=session.pk).update(
+            answered_count=session.answers_total,
+            correct_count=session.answers_correct
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='answered_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='correct_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_answer_counters, migrations.RunPython.noop),
+    ]
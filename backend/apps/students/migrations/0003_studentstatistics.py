@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('students', '0002_quizsession_answer_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quizzes_completed', models.IntegerField(default=0)),
+                ('score_total', models.FloatField(default=0)),
+                ('best_score', models.FloatField(default=0)),
+                ('questions_answered', models.IntegerField(default=0)),
+                ('correct_answers', models.IntegerField(default=0)),
+                ('time_spent_seconds', models.IntegerField(default=0)),
+                ('module_stats', models.JSONField(blank=True, default=dict)),
+                ('difficulty_stats', models.JSONField(blank=True, default=dict)),
+                ('daily_stats', models.JSONField(blank=True, default=dict)),
+                ('current_streak', models.IntegerField(default=0)),
+                ('longest_streak', models.IntegerField(default=0)),
+                ('last_study_date', models.DateField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_statistics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
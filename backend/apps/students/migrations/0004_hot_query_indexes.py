@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_studentstatistics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['user', 'status', 'completed_at'], name='students_qs_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(fields=['quiz', 'status'], name='students_qs_quiz_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['user', 'quiz'], name='students_qs_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizsession',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['expires_at'], name='students_qs_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentcalendarevent',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['user', 'event_date'], name='students_event_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentcalendarevent',
+            index=models.Index(condition=models.Q(('is_completed', False), ('reminder_enabled', True)), fields=['event_date'], name='students_event_reminder_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='question_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='seed',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
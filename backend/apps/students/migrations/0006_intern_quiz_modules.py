@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def intern_quiz_modules(apps, schema_editor):
+    """
+    Create the Module/Course rows behind the module_name/course_name strings of
+    existing quizzes
+    """
+    Module = apps.get_model('questions', 'Module')
+    Course = apps.get_model('questions', 'Course')
+    Quiz = apps.get_model('students', 'Quiz')
+
+    modules = dict(Module.objects.values_list('name', 'id'))
+    courses = set(Course.objects.values_list('module_id', 'name'))
+
+    rows = Quiz.objects.order_by('module_name', 'year').values_list('module_name', 'course_name', 'year').distinct()
+    for module_name, course_name, year in rows:
+        if module_name not in modules:
+            modules[module_name] = Module.objects.create(name=module_name, year=year).id
+        if course_name and (modules[module_name], course_name) not in courses:
+            Course.objects.create(module_id=modules[module_name], name=course_name)
+            courses.add((modules[module_name], course_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0003_intern_modules'),
+        ('students', '0005_quizsession_draw'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_quiz_modules, migrations.RunPython.noop),
+    ]
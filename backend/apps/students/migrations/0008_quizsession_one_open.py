@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+
+def abandon_duplicate_open_sessions(apps, schema_editor):
+    """
+    Keep the newest in-progress session per (user, quiz) so the constraint can be added
+    """
+    QuizSession = apps.get_model('students', 'QuizSession')
+
+    seen = set()
+    duplicates = []
+    for session_id, user_id, quiz_id in QuizSession.objects.filter(status='in_progress').order_by(
+        '-started_at', '-id'
+    ).values_list('id', 'user_id', 'quiz_id').iterator():
+        if (user_id, quiz_id) in seen:
+            duplicates.append(session_id)
+        seen.add((user_id, quiz_id))
+
+    for start in range(0, len(duplicates), 500):
+        QuizSession.objects.filter(id__in=duplicates[start:start + 500]).update(status='abandoned')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_quiz_module_fks'),
+    ]
+
+    operations = [
+        migrations.RunPython(abandon_duplicate_open_sessions, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='quizsession',
+            name='students_qs_open_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='quizsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'in_progress')), fields=('user', 'quiz'), name='students_qs_one_open_uniq'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('students', '0009_studentrecommendation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentrecommendation',
+            name='version',
+            field=models.PositiveSmallIntegerField(),
+        ),
+        migrations.CreateModel(
+            name='StudentMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('module_ids', models.JSONField(blank=True, default=list)),
+                ('course_ids', models.JSONField(blank=True, default=list)),
+                ('successes', models.JSONField(blank=True, default=list)),
+                ('failures', models.JSONField(blank=True, default=list)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mastery', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
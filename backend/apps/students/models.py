@@ -1,8 +1,11 @@
 # apps/students/models.py
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
 from apps.core.models import TimeStampedModel, DifficultyChoices, YearChoices
 from apps.authentication.models import User
-from apps.questions.models import Question
+from apps.questions.models import Module, Course, Question
 
 class Quiz(TimeStampedModel):
     QUIZ_STATUS_CHOICES = (
@@ -24,6 +27,9 @@ class Quiz(TimeStampedModel):
     status = models.CharField(max_length=20, choices=QUIZ_STATUS_CHOICES, default='active')
     is_public = models.BooleanField(default=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_quizzes')
+    # Interned rows behind module_name/course_name, see Question.module
+    module = models.ForeignKey(Module, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='quizzes')
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='quizzes')
     
     def __str__(self):
         return self.title
@@ -38,6 +44,54 @@ class QuizQuestion(TimeStampedModel):
         unique_together = ['quiz', 'question']
         ordering = ['order']
 
+class QuizSessionQuerySet(models.QuerySet):
+    """
+    Expiry is derived from expires_at when reading; the stored status of a lapsed
+    session only changes when the sweeper (expire_lapsed) gets to it.
+    """
+    
+    def with_effective_status(self, now=None):
+        return self.annotate(effective_status=Case(
+            When(status='in_progress', expires_at__lte=now or timezone.now(), then=Value('expired')),
+            default=F('status'),
+            output_field=models.CharField()
+        ))
+    
+    def open(self, now=None):
+        """
+        Sessions still running: in progress and not past their time limit
+        """
+        return self.filter(status='in_progress', expires_at__gt=now or timezone.now())
+    
+    def lapsed(self, now=None):
+        """
+        Sessions past their time limit that are still stored as in progress
+        """
+        return self.filter(status='in_progress', expires_at__lte=now or timezone.now())
+    
+    def expired(self, now=None):
+        """
+        Expired sessions, whether or not the sweeper has stored it yet
+        """
+        return self.filter(Q(status='expired') | Q(status='in_progress', expires_at__lte=now or timezone.now()))
+    
+    def expire_lapsed(self, batch_size=500, now=None):
+        """
+        Persist the expiry of lapsed sessions in bounded batches walked along the partial
+        expiry index, each UPDATE touches at most `batch_size` rows. Returns the count.
+        """
+        now = now or timezone.now()
+        expired = 0
+        
+        while True:
+            batch = list(self.lapsed(now).order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return expired
+            
+            expired += QuizSession.objects.filter(pk__in=batch, status='in_progress').update(status='expired')
+            if len(batch) < batch_size:
+                return expired
+
 class QuizSession(TimeStampedModel):
     SESSION_STATUS_CHOICES = (
         ('in_progress', 'In Progress'),
@@ -56,10 +110,86 @@ class QuizSession(TimeStampedModel):
     total_questions = models.IntegerField(default=0)
     correct_answers = models.IntegerField(default=0)
     time_spent_seconds = models.IntegerField(default=0)
+    # Running counters maintained by answer submission, so progress never needs a COUNT
+    answered_count = models.IntegerField(default=0)
+    correct_count = models.IntegerField(default=0)
+    # Per-session draw: the seed reproduces the question set and option order
+    seed = models.PositiveIntegerField(null=True, blank=True)
+    question_ids = models.JSONField(default=list, blank=True)
+    
+    objects = QuizSessionQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # A student's history by status, newest completions first (dashboard, statistics, recommendations)
+            models.Index(fields=['user', 'status', 'completed_at'], name='students_qs_user_status_idx'),
+            # Completed sessions of a quiz (quiz statistics)
+            models.Index(fields=['quiz', 'status'], name='students_qs_quiz_status_idx'),
+            # Expiry sweep over open sessions
+            models.Index(fields=['expires_at'], condition=Q(status='in_progress'), name='students_qs_expiry_idx'),
+        ]
+        constraints = [
+            # At most one open session of a student per quiz, also the index used to find it
+            models.UniqueConstraint(fields=['user', 'quiz'], condition=Q(status='in_progress'), name='students_qs_one_open_uniq'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.quiz.title}"
     
+    @property
+    def is_lapsed(self):
+        return self.status == 'in_progress' and timezone.now() >= self.expires_at
+    
+    @property
+    def effective_status(self):
+        """
+        Status with expiry applied, the with_effective_status() annotation when present
+        """
+        annotated = self.__dict__.get('_effective_status')
+        if annotated is not None:
+            return annotated
+        return 'expired' if self.is_lapsed else self.status
+    
+    @effective_status.setter
+    def effective_status(self, value):
+        # Receives the queryset annotation
+        self.__dict__['_effective_status'] = value
+    
+    def lock_counters(self):
+        """
+        Lock this session row and load the current answer counters onto the instance.
+        Must be called inside a transaction.
+        """
+        counters = QuizSession.objects.select_for_update().values(
+            'answered_count', 'correct_count'
+        ).get(pk=self.pk)
+        self.answered_count = counters['answered_count']
+        self.correct_count = counters['correct_count']
+    
+    def apply_answer_delta(self, answered_delta=0, correct_delta=0):
+        """
+        Shift the answer counters with F-expressions and mirror the result on the instance
+        """
+        if not answered_delta and not correct_delta:
+            return
+        
+        QuizSession.objects.filter(pk=self.pk).update(
+            answered_count=F('answered_count') + answered_delta,
+            correct_count=F('correct_count') + correct_delta
+        )
+        self.answered_count += answered_delta
+        self.correct_count += correct_delta
+    
+    def sync_score_from_counters(self):
+        """
+        Copy the running counters into correct_answers/score once every question is answered
+        """
+        if self.answered_count >= self.total_questions:
+            self.correct_answers = self.correct_count
+            if self.total_questions > 0:
+                self.score = (self.correct_count / self.total_questions) * 100
+            self.save(update_fields=['correct_answers', 'score'])
+    
     @property
     def percentage_score(self):
         if self.total_questions > 0:
@@ -104,6 +234,18 @@ class StudentCalendarEvent(TimeStampedModel):
     tags = models.JSONField(default=list, blank=True)
     color = models.CharField(max_length=7, blank=True)  # Hex color
     
+    class Meta:
+        indexes = [
+            # Upcoming open events of a student (dashboard)
+            models.Index(fields=['user', 'event_date'], condition=Q(is_completed=False), name='students_event_user_idx'),
+            # Reminder task window over open events with reminders on
+            models.Index(
+                fields=['event_date'],
+                condition=Q(is_completed=False, reminder_enabled=True),
+                name='students_event_reminder_idx'
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.title} - {self.event_date.strftime('%Y-%m-%d %H:%M')}"
 
@@ -142,4 +284,276 @@ class StudentPreference(TimeStampedModel):
     notification_enabled = models.BooleanField(default=True)
     
     def __str__(self):
-        return f"{self.user.email} preferences"
\ No newline at end of file
+        return f"{self.user.email} preferences"
+
+class StudentStatistics(TimeStampedModel):
+    """
+    Denormalized quiz statistics per student, maintained incrementally as sessions
+    complete so dashboard endpoints read one row instead of aggregating QuizSession.
+
+    Buckets in module_stats, difficulty_stats and daily_stats are stored as
+    [quizzes_completed, score_total, questions_answered].
+    """
+    DAILY_HISTORY_DAYS = 400
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='quiz_statistics')
+    quizzes_completed = models.IntegerField(default=0)
+    score_total = models.FloatField(default=0)
+    best_score = models.FloatField(default=0)
+    questions_answered = models.IntegerField(default=0)
+    correct_answers = models.IntegerField(default=0)
+    time_spent_seconds = models.IntegerField(default=0)
+    module_stats = models.JSONField(default=dict, blank=True)
+    difficulty_stats = models.JSONField(default=dict, blank=True)
+    daily_stats = models.JSONField(default=dict, blank=True)
+    # Streak is the run of consecutive study days ending on last_study_date
+    current_streak = models.IntegerField(default=0)
+    longest_streak = models.IntegerField(default=0)
+    last_study_date = models.DateField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user.email} statistics"
+    
+    @property
+    def average_score(self):
+        if self.quizzes_completed > 0:
+            return self.score_total / self.quizzes_completed
+        return 0
+    
+    @classmethod
+    def for_user(cls, user):
+        """
+        Return the statistics row of a user, building it from history on first access
+        """
+        try:
+            return cls.objects.get(user=user)
+        except cls.DoesNotExist:
+            with transaction.atomic():
+                stats, created = cls.objects.select_for_update().get_or_create(user=user)
+                if created:
+                    stats.rebuild()
+            return stats
+    
+    @classmethod
+    def record_session(cls, session):
+        """
+        Fold a just-completed session into the owner's statistics.
+        Must be called inside the transaction that completed the session.
+        """
+        stats, created = cls.objects.select_for_update().get_or_create(user_id=session.user_id)
+        
+        # A new row may be missing older history, the rebuild already includes this session
+        if created:
+            stats.rebuild()
+        else:
+            stats.add_session(session)
+            stats.save()
+        
+        return stats
+    
+    def rebuild(self):
+        """
+        Recompute every field from the user's completed sessions and save
+        """
+        self.quizzes_completed = 0
+        self.score_total = 0
+        self.best_score = 0
+        self.questions_answered = 0
+        self.correct_answers = 0
+        self.time_spent_seconds = 0
+        self.module_stats = {}
+        self.difficulty_stats = {}
+        self.daily_stats = {}
+        self.current_streak = 0
+        self.longest_streak = 0
+        self.last_study_date = None
+        
+        sessions = QuizSession.objects.filter(
+            user_id=self.user_id,
+            status='completed'
+        ).select_related('quiz').only(
+            'score', 'total_questions', 'correct_answers', 'time_spent_seconds',
+            'completed_at', 'quiz__module_name', 'quiz__difficulty'
+        ).order_by('completed_at')
+        
+        for session in sessions.iterator():
+            self.add_session(session)
+        
+        self.save()
+    
+    def add_session(self, session):
+        score = float(session.score or 0)
+        
+        self.best_score = max(self.best_score, score) if self.quizzes_completed else score
+        self.quizzes_completed += 1
+        self.score_total += score
+        self.questions_answered += session.total_questions
+        self.correct_answers += session.correct_answers
+        self.time_spent_seconds += session.time_spent_seconds
+        
+        bucket = [1, score, session.total_questions]
+        self._add_to_bucket(self.module_stats, session.quiz.module_name, bucket)
+        self._add_to_bucket(self.difficulty_stats, session.quiz.difficulty, bucket)
+        
+        if session.completed_at:
+            study_date = timezone.localdate(session.completed_at)
+            self._add_to_bucket(self.daily_stats, study_date.isoformat(), bucket)
+            self._prune_daily_stats(study_date)
+            self._extend_streak(study_date)
+    
+    def streak_as_of(self, today):
+        """
+        Current streak counts only if the last study day was today or yesterday
+        """
+        if self.last_study_date and (today - self.last_study_date).days <= 1:
+            return self.current_streak
+        return 0
+    
+    def _add_to_bucket(self, buckets, key, values):
+        current = buckets.get(key, [0, 0, 0])
+        buckets[key] = [current[i] + values[i] for i in range(3)]
+    
+    def _prune_daily_stats(self, study_date):
+        cutoff = (study_date - timedelta(days=self.DAILY_HISTORY_DAYS)).isoformat()
+        for key in [key for key in self.daily_stats if key < cutoff]:
+            del self.daily_stats[key]
+    
+    def _extend_streak(self, study_date):
+        if self.last_study_date is None or study_date > self.last_study_date + timedelta(days=1):
+            self.current_streak = 1
+        elif study_date == self.last_study_date + timedelta(days=1):
+            self.current_streak += 1
+        else:
+            # Same day (or an out of order session) does not change the streak
+            return
+        
+        self.last_study_date = study_date
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+
+class StudentRecommendation(TimeStampedModel):
+    """
+    Ranked quiz recommendations of a student, precomputed by generate_quiz_recommendations
+    so the endpoint reads one row. Rows written by another ALGORITHM_VERSION or older than
+    RECOMMENDATION_MAX_AGE_SECONDS are treated as missing and recomputed on demand.
+    """
+    # Bump when the ranking changes so stored rows are recomputed
+    ALGORITHM_VERSION = 2
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='quiz_recommendations')
+    quiz_ids = models.JSONField(default=list, blank=True)
+    # Set on every write, no default so bumping ALGORITHM_VERSION needs no migration
+    version = models.PositiveSmallIntegerField()
+    computed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.user.email} recommendations"
+    
+    def is_current(self, max_age):
+        return (
+            self.version == self.ALGORITHM_VERSION
+            and timezone.now() - self.computed_at < timedelta(seconds=max_age)
+        )
+    
+    @classmethod
+    def store_many(cls, rankings):
+        """
+        Upsert {user_id: [quiz ids]} in one statement
+        """
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [
+                cls(user_id=user_id, quiz_ids=quiz_ids, version=cls.ALGORITHM_VERSION, computed_at=now)
+                for user_id, quiz_ids in rankings.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['quiz_ids', 'version', 'computed_at', 'updated_at']
+        )
+    
+    @classmethod
+    def invalidate(cls, user_id):
+        """
+        Drop the stored ranking, the next read recomputes it
+        """
+        cls.objects.filter(user_id=user_id).delete()
+
+class StudentMastery(TimeStampedModel):
+    """
+    Per-student mastery of each (module, course) area as a Beta posterior over answer
+    evidence. Correct answers add successes and wrong ones failures, weighted by question
+    difficulty, so the model updates incrementally as answers arrive and the nightly
+    recompute_mastery batch gives exactly the same numbers.
+
+    Areas are stored as parallel arrays: module_ids[i], course_ids[i] (0 without a
+    course), successes[i], failures[i].
+    """
+    # Beta(1, 1) prior, an area without evidence has mastery 0.5
+    PRIOR = (1.0, 1.0)
+    # A correct hard answer says more than a correct easy one, and the reverse for wrong answers
+    CORRECT_WEIGHTS = {'easy': 0.5, 'medium': 1.0, 'hard': 1.5}
+    WRONG_WEIGHTS = {'easy': 1.5, 'medium': 1.0, 'hard': 0.5}
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='mastery')
+    module_ids = models.JSONField(default=list, blank=True)
+    course_ids = models.JSONField(default=list, blank=True)
+    successes = models.JSONField(default=list, blank=True)
+    failures = models.JSONField(default=list, blank=True)
+    
+    def __str__(self):
+        return f"{self.user.email} mastery"
+    
+    @classmethod
+    def evidence_weights(cls, difficulty, is_correct):
+        """
+        (successes, failures) added by one answer
+        """
+        if is_correct:
+            return cls.CORRECT_WEIGHTS.get(difficulty, 1.0), 0.0
+        return 0.0, cls.WRONG_WEIGHTS.get(difficulty, 1.0)
+    
+    @property
+    def has_evidence(self):
+        return bool(self.module_ids)
+    
+    def areas(self):
+        """
+        {(module_id, course_id): [successes, failures]}
+        """
+        return {
+            (module_id, course_id): [success, failure]
+            for module_id, course_id, success, failure
+            in zip(self.module_ids, self.course_ids, self.successes, self.failures)
+        }
+    
+    def set_areas(self, areas):
+        keys = sorted(areas)
+        self.module_ids = [module_id for module_id, course_id in keys]
+        self.course_ids = [course_id for module_id, course_id in keys]
+        self.successes = [areas[key][0] for key in keys]
+        self.failures = [areas[key][1] for key in keys]
+    
+    def apply(self, changes):
+        """
+        Fold answer changes in, each a (module_id, course_id, difficulty, is_correct, sign)
+        tuple where sign is 1 for a recorded answer and -1 for a withdrawn one
+        """
+        areas = self.areas()
+        for module_id, course_id, difficulty, is_correct, sign in changes:
+            success, failure = self.evidence_weights(difficulty, is_correct)
+            area = areas.setdefault((module_id, course_id or 0), [0.0, 0.0])
+            area[0] += sign * success
+            area[1] += sign * failure
+        self.set_areas(areas)
+    
+    def mastery_of(self, module_id, course_id=None):
+        """
+        Posterior mean mastery of a course, or of a whole module without course_id
+        """
+        success = failure = 0.0
+        for area_module, area_course, area_success, area_failure in zip(
+            self.module_ids, self.course_ids, self.successes, self.failures
+        ):
+            if area_module == module_id and (not course_id or area_course == course_id):
+                success += area_success
+                failure += area_failure
+        return (success + self.PRIOR[0]) / (success + failure + self.PRIOR[0] + self.PRIOR[1])
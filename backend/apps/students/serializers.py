@@ -1,18 +1,25 @@
 # apps/students/serializers.py
 from rest_framework import serializers
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from datetime import timedelta
+import secrets
 from .models import (
     Quiz, QuizQuestion, QuizSession, QuizAnswer, 
-    StudentCalendarEvent, StudentNote, StudentPreference
+    StudentCalendarEvent, StudentNote, StudentPreference, StudentStatistics, StudentMastery
 )
-from apps.questions.serializers import QuestionSerializer
+from apps.questions.models import Question
+from apps.questions.serializers import CatalogNamesMixin
+from apps.questions.utils import answer_keys, module_catalog
 from apps.authentication.serializers import UserSerializer
+from apps.core.constants import QUIZ_SETTINGS
+from apps.core.cache import get_or_set_cached
+from .utils import draw_session_questions, record_mastery
 
 # Add this import:
 from apps.authentication.models import User # <--- ADD THIS LINE
 
-class QuizListSerializer(serializers.ModelSerializer):
+class QuizListSerializer(CatalogNamesMixin, serializers.ModelSerializer):
     created_by = serializers.SerializerMethodField()
     questions_count = serializers.ReadOnlyField()
     difficulty_display = serializers.CharField(source='get_difficulty_display', read_only=True)
@@ -33,8 +40,94 @@ class QuizListSerializer(serializers.ModelSerializer):
             'email': obj.created_by.email
         }
 
-class QuizDetailSerializer(serializers.ModelSerializer):
-    questions = serializers.SerializerMethodField()
+class DeliveryQuestionSerializer(CatalogNamesMixin, serializers.ModelSerializer):
+    """
+    Read-only question shape used to deliver quizzes: authors, modules and courses are
+    referenced by key and listed once in the side tables of build_delivery_payload
+    """
+    options = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Question
+        fields = [
+            'id', 'question_text', 'module_name', 'course_name', 'year', 'difficulty',
+            'explanation', 'image', 'explanation_image', 'created_by', 'options'
+        ]
+        read_only_fields = fields
+    
+    def get_options(self, obj):
+        # Options come from the prefetch, answers are hidden while a session is running
+        if self.context.get('include_answers', True):
+            return [
+                {'id': option.id, 'option_text': option.option_text,
+                 'option_letter': option.option_letter, 'is_correct': option.is_correct}
+                for option in obj.options.all()
+            ]
+        return [
+            {'id': option.id, 'option_text': option.option_text, 'option_letter': option.option_letter}
+            for option in obj.options.all()
+        ]
+
+def build_delivery_payload(questions, include_answers=True):
+    """
+    Serialize questions (with created_by selected and options prefetched) in one pass,
+    returning the questions plus their authors, modules and courses listed once
+    """
+    authors = {}
+    modules = {}
+    courses = {}
+    
+    for question in questions:
+        author = question.created_by
+        authors[author.id] = {
+            'id': author.id,
+            'username': author.username,
+            'email': author.email,
+            'full_name': getattr(author, 'full_name', author.username)
+        }
+        module_name, course_name = module_catalog.names_of(question)
+        if module_name not in modules:
+            modules[module_name] = {
+                'id': question.module_id,
+                'name': module_name
+            }
+        if (module_name, course_name) not in courses:
+            courses[(module_name, course_name)] = {
+                'id': question.course_id,
+                'name': course_name,
+                'module_name': module_name
+            }
+    
+    return {
+        'questions': DeliveryQuestionSerializer(
+            questions, many=True, context={'include_answers': include_answers}
+        ).data,
+        'authors': list(authors.values()),
+        'modules': list(modules.values()),
+        'courses': list(courses.values()),
+    }
+
+def quiz_delivery_payload(quiz, include_answers=True):
+    """
+    Questions of a quiz in delivery order with their side tables, cached per quiz version
+    """
+    def build():
+        quiz_questions = list(
+            quiz.quiz_questions.order_by('order').select_related('question__created_by')
+            .prefetch_related('question__options')
+        )
+        payload = build_delivery_payload(
+            [quiz_question.question for quiz_question in quiz_questions], include_answers
+        )
+        for question_data, quiz_question in zip(payload['questions'], quiz_questions):
+            question_data['points'] = quiz_question.points
+            question_data['order'] = quiz_question.order
+        return payload
+    
+    variant = f"{quiz.updated_at.timestamp()}:{'answers' if include_answers else 'questions'}"
+    return get_or_set_cached('quiz_payload', build, variant=variant, quiz_id=quiz.id)
+
+class QuizDetailSerializer(CatalogNamesMixin, serializers.ModelSerializer):
     created_by = serializers.SerializerMethodField()
     
     class Meta:
@@ -43,22 +136,13 @@ class QuizDetailSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'module_name', 'course_name', 
             'year', 'difficulty', 'time_limit_minutes', 'questions_count', 
             'passing_score', 'status', 'is_public', 'created_by', 
-            'created_at', 'questions'
+            'created_at'
         ]
     
-    def get_questions(self, obj):
-        # Get questions with their options
-        quiz_questions = obj.quiz_questions.select_related('question').prefetch_related('question__options')
-        questions_data = []
-        
-        for quiz_q in quiz_questions:
-            question = quiz_q.question
-            question_data = QuestionSerializer(question).data
-            question_data['points'] = quiz_q.points
-            question_data['order'] = quiz_q.order
-            questions_data.append(question_data)
-        
-        return questions_data
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data.update(quiz_delivery_payload(instance, self.context.get('include_answers', True)))
+        return data
     
     def get_created_by(self, obj):
         return {
@@ -84,8 +168,13 @@ class QuizSessionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['user', 'started_at', 'expires_at']
     
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['status'] = instance.effective_status
+        return data
+    
     def get_time_remaining_seconds(self, obj):
-        if obj.status != 'in_progress':
+        if obj.effective_status != 'in_progress':
             return 0
         
         now = timezone.now()
@@ -95,30 +184,61 @@ class QuizSessionSerializer(serializers.ModelSerializer):
         return int((obj.expires_at - now).total_seconds())
     
     def create(self, validated_data):
-        quiz = Quiz.objects.get(id=validated_data['quiz_id'])
+        """
+        Insert the session, or return the student's open session of this quiz: the
+        partial unique constraint on (user, quiz) rejects a second in-progress row, so
+        concurrent starts cannot both create one. `self.created` tells which happened.
+        """
+        quiz = Quiz.objects.select_related('created_by').get(id=validated_data['quiz_id'])
         user = self.context['request'].user
         
-        # Check if user already has an active session for this quiz
-        existing_session = QuizSession.objects.filter(
-            user=user, 
-            quiz=quiz, 
-            status='in_progress'
-        ).first()
+        expires_at = timezone.now() + timedelta(minutes=quiz.time_limit_minutes)
         
-        if existing_session:
-            return existing_session
+        # Each session draws its own questions and option order from a reproducible seed
+        seed = None
+        if QUIZ_SETTINGS['randomize_questions'] or QUIZ_SETTINGS['randomize_options']:
+            seed = secrets.randbits(31)
         
-        # Create new session
-        expires_at = timezone.now() + timedelta(minutes=quiz.time_limit_minutes)
+        question_ids = []
+        if QUIZ_SETTINGS['randomize_questions']:
+            mastery = StudentMastery.objects.filter(user=user).first()
+            question_ids = draw_session_questions(quiz, seed, mastery=mastery)
+        if not question_ids:
+            question_ids = list(
+                quiz.quiz_questions.order_by('order').values_list('question_id', flat=True)
+            )
         
-        session = QuizSession.objects.create(
-            user=user,
-            quiz=quiz,
-            expires_at=expires_at,
-            total_questions=quiz.questions_count
-        )
+        for attempt in range(3):
+            try:
+                with transaction.atomic():
+                    session = QuizSession.objects.create(
+                        user=user,
+                        quiz=quiz,
+                        expires_at=expires_at,
+                        total_questions=len(question_ids) or quiz.questions_count,
+                        seed=seed,
+                        question_ids=question_ids
+                    )
+            except IntegrityError:
+                existing_session = QuizSession.objects.filter(
+                    user=user, quiz=quiz, status='in_progress'
+                ).select_related('quiz__created_by').first()
+                
+                if existing_session is not None and not existing_session.is_lapsed:
+                    self.created = False
+                    return existing_session
+                
+                # A lapsed session still holds the slot, expire it now rather than at the next sweep
+                if existing_session is not None:
+                    QuizSession.objects.filter(pk=existing_session.pk, status='in_progress').update(status='expired')
+                continue
+            
+            self.created = True
+            # Warm the answer keys so grading this session never hits the database
+            answer_keys.get_many(question_ids)
+            return session
         
-        return session
+        raise serializers.ValidationError({'quiz_id': 'Could not start the quiz session, please retry'})
 
 class QuizAnswerSerializer(serializers.ModelSerializer):
     question_id = serializers.IntegerField(write_only=True)
@@ -131,30 +251,55 @@ class QuizAnswerSerializer(serializers.ModelSerializer):
             'time_taken_seconds', 'flagged', 'created_at'
         ]
     
+    def validate_question_id(self, value):
+        quiz_session = self.context.get('quiz_session')
+        # Sessions started before per-session draws have no question list
+        if quiz_session and quiz_session.question_ids and value not in quiz_session.question_ids:
+            raise serializers.ValidationError('Question is not part of this quiz session')
+        return value
+    
     def create(self, validated_data):
         quiz_session = self.context['quiz_session']
         question_id = validated_data.pop('question_id')
         
-        from apps.questions.models import Question
-        question = Question.objects.get(id=question_id)
+        # Check if answer is correct against the cached answer key
+        try:
+            correct_letters = answer_keys.get(question_id)
+        except Question.DoesNotExist:
+            raise serializers.ValidationError({'question_id': 'Question not found'})
+        is_correct = validated_data['selected_option'] in correct_letters
         
-        # Check if answer is correct
-        is_correct = question.options.filter(
-            option_letter=validated_data['selected_option'], 
-            is_correct=True
-        ).exists()
-        
-        # Update or create answer
-        answer, created = QuizAnswer.objects.update_or_create(
-            quiz_session=quiz_session,
-            question=question,
-            defaults={
-                'selected_option': validated_data['selected_option'],
-                'is_correct': is_correct,
-                'time_taken_seconds': validated_data.get('time_taken_seconds', 0),
-                'flagged': validated_data.get('flagged', False)
-            }
-        )
+        with transaction.atomic():
+            # Lock the session so concurrent submissions see consistent counters
+            quiz_session.lock_counters()
+            
+            answer = QuizAnswer.objects.filter(
+                quiz_session=quiz_session,
+                question_id=question_id
+            ).first()
+            
+            # A changed answer only shifts the correct counter by the difference
+            if answer:
+                answered_delta = 0
+                correct_delta = int(is_correct) - int(answer.is_correct)
+                mastery_changes = []
+                if answer.is_correct != is_correct:
+                    mastery_changes = [(question_id, answer.is_correct, -1), (question_id, is_correct, 1)]
+            else:
+                answer = QuizAnswer(quiz_session=quiz_session, question_id=question_id)
+                answered_delta = 1
+                correct_delta = int(is_correct)
+                mastery_changes = [(question_id, is_correct, 1)]
+            
+            quiz_session.apply_answer_delta(answered_delta, correct_delta)
+            
+            # Update or create answer
+            answer.selected_option = validated_data['selected_option']
+            answer.is_correct = is_correct
+            answer.time_taken_seconds = validated_data.get('time_taken_seconds', 0)
+            answer.flagged = validated_data.get('flagged', False)
+            answer.save()
+            record_mastery(quiz_session.user_id, mastery_changes)
         
         return answer
 
@@ -255,23 +400,11 @@ class StudentProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'username', 'created_at', 'last_login']
     
     def get_quiz_stats(self, obj):
-        sessions = QuizSession.objects.filter(user=obj, status='completed')
-        if not sessions.exists():
-            return {
-                'total_completed': 0,
-                'average_score': 0,
-                'total_questions': 0,
-                'total_time_spent': 0
-            }
-        
-        total_completed = sessions.count()
-        avg_score = sessions.aggregate(avg=serializers.models.Avg('score'))['avg'] or 0
-        total_questions = sessions.aggregate(total=serializers.models.Sum('total_questions'))['total'] or 0
-        total_time = sessions.aggregate(total=serializers.models.Sum('time_spent_seconds'))['total'] or 0
+        stats = StudentStatistics.for_user(obj)
         
         return {
-            'total_completed': total_completed,
-            'average_score': round(avg_score, 1),
-            'total_questions': total_questions,
-            'total_time_spent': round(total_time / 3600, 1)  # Convert to hours
+            'total_completed': stats.quizzes_completed,
+            'average_score': round(stats.average_score, 1),
+            'total_questions': stats.questions_answered,
+            'total_time_spent': round(stats.time_spent_seconds / 3600, 1)  # Convert to hours
         }
\ No newline at end of file
@@ -1,10 +1,9 @@
 # apps/students/signals.py
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
-from datetime import timedelta
 from apps.authentication.models import User
-from .models import QuizSession, StudentPreference, QuizAnswer
+from apps.questions.utils import module_catalog
+from .models import Quiz, QuizSession, StudentPreference, StudentRecommendation, QuizAnswer
 
 @receiver(post_save, sender=User)
 def create_student_preferences(sender, instance=None, created=False, **kwargs):
@@ -25,54 +24,50 @@ def create_student_preferences(sender, instance=None, created=False, **kwargs):
             }
         )
 
-@receiver(pre_save, sender=QuizSession)
-def check_quiz_session_expiry(sender, instance=None, **kwargs):
+@receiver(post_save, sender=StudentPreference)
+def invalidate_recommendations(sender, instance, created, **kwargs):
     """
-    Automatically expire quiz sessions that have passed their time limit
+    Preferences feed the ranking, changed ones make the stored recommendations stale
     """
-    if instance.status == 'in_progress' and timezone.now() > instance.expires_at:
-        instance.status = 'expired'
+    if not created:
+        StudentRecommendation.invalidate(instance.user_id)
 
-@receiver(post_save, sender=QuizAnswer)
-def update_session_progress(sender, instance, created, **kwargs):
+@receiver(pre_save, sender=Quiz)
+def intern_quiz_module(sender, instance, **kwargs):
     """
-    Update quiz session progress when answers are submitted
+    Point the quiz module/course foreign keys at the rows behind the strings
+    """
+    module_catalog.intern_row(instance)
+
+@receiver(pre_save, sender=QuizSession)
+def remember_session_status(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the stored status so post_save can tell whether this save completes the session
     """
-    if created:
-        session = instance.quiz_session
-        
-        # Update session statistics
-        total_answers = session.answers.count()
-        correct_answers = session.answers.filter(is_correct=True).count()
-        
-        # Update session if all questions are answered
-        if total_answers >= session.total_questions:
-            session.correct_answers = correct_answers
-            if session.total_questions > 0:
-                session.score = (correct_answers / session.total_questions) * 100
-            session.save(update_fields=['correct_answers', 'score'])
+    instance._previous_status = None
+    if instance.pk and (update_fields is None or 'status' in update_fields):
+        instance._previous_status = sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
 
 @receiver(post_save, sender=QuizSession)
-def update_user_progress_on_completion(sender, instance, **kwargs):
+def add_completed_session_to_progress(sender, instance, update_fields=None, **kwargs):
     """
-    Update user progress when a quiz session is completed
+    Fold a session into UserProgress when it becomes completed, whoever completes it
+    (the complete endpoint, the admin, a shell or a task)
     """
-    if instance.status == 'completed':
-        from apps.users.models import UserProgress
-        
-        progress, created = UserProgress.objects.get_or_create(user=instance.user)
-        
-        # Recalculate total progress
-        completed_sessions = QuizSession.objects.filter(
-            user=instance.user,
-            status='completed'
-        )
-        
-        total_questions = sum(session.total_questions for session in completed_sessions)
-        correct_answers = sum(session.correct_answers for session in completed_sessions)
-        total_time = sum(session.time_spent_seconds for session in completed_sessions)
-        
-        progress.total_questions_attempted = total_questions
-        progress.correct_answers = correct_answers
-        progress.total_study_time = timedelta(seconds=total_time)
-        progress.save()
\ No newline at end of file
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    if instance.status != 'completed' or getattr(instance, '_previous_status', None) == 'completed':
+        return
+    
+    from apps.users.models import UserProgress
+    UserProgress.add_session(
+        instance.user, instance.total_questions, instance.correct_answers, instance.time_spent_seconds
+    )
+
+@receiver(post_save, sender=QuizAnswer)
+def update_session_progress(sender, instance, created, **kwargs):
+    """
+    Update quiz session progress when answers are submitted
+    """
+    # Counters are kept current by the answer submission, no need to re-count
+    instance.quiz_session.sync_score_from_counters()
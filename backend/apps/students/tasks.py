@@ -5,16 +5,17 @@ from django.core.mail import send_mail
 from django.conf import settings
 from datetime import timedelta
 
-from backend.apps.authentication.models import User
 from .models import QuizSession, StudentCalendarEvent
-from .utils import check_session_expiry
 
 @shared_task
 def cleanup_expired_quiz_sessions():
     """
-    Clean up expired quiz sessions
+    Persist the expiry of lapsed quiz sessions in small batches. Reads already treat
+    them as expired, so this only catches the stored status up.
     """
-    expired_count = check_session_expiry()
+    expired_count = QuizSession.objects.expire_lapsed(
+        batch_size=getattr(settings, 'QUIZ_SESSION_EXPIRY_BATCH_SIZE', 500)
+    )
     return f"Cleaned up {expired_count} expired quiz sessions"
 
 @shared_task
@@ -62,51 +63,36 @@ def send_calendar_reminders():
 @shared_task
 def update_student_statistics():
     """
-    Update student statistics and progress tracking
+    Reconcile student progress against the full quiz history.
+    Completion applies incremental updates, so this only needs to run rarely.
     """
-    from apps.users.models import UserProgress
-    from django.db.models import Count, Avg, Sum
-    
-    # Update user progress for all students
-    students = User.objects.filter(role='student')
-    updated_count = 0
-    
-    for student in students:
-        completed_sessions = QuizSession.objects.filter(
-            user=student, 
-            status='completed'
-        )
-        
-        if completed_sessions.exists():
-            total_questions = completed_sessions.aggregate(
-                total=Sum('total_questions')
-            )['total'] or 0
-            
-            correct_answers = completed_sessions.aggregate(
-                total=Sum('correct_answers')
-            )['total'] or 0
-            
-            total_time = completed_sessions.aggregate(
-                total=Sum('time_spent_seconds')
-            )['total'] or 0
-            
-            progress, created = UserProgress.objects.get_or_create(user=student)
-            progress.total_questions_attempted = total_questions
-            progress.correct_answers = correct_answers
-            progress.total_study_time = timedelta(seconds=total_time)
-            progress.save()
-            
-            updated_count += 1
+    from .utils import reconcile_user_progress
     
+    updated_count = reconcile_user_progress()
     return f"Updated statistics for {updated_count} students"
 
 @shared_task
-def generate_quiz_recommendations():
+def recompute_student_mastery():
+    """
+    Rebuild every student's mastery model from the answer history in one batch.
+    Answer submission updates it incrementally, so this only repairs drift.
+    """
+    from .utils import recompute_mastery
+    
+    updated_count = recompute_mastery(
+        batch_size=getattr(settings, 'STUDENT_MASTERY_BATCH_SIZE', 500)
+    )
+    return f"Recomputed mastery for {updated_count} students"
+
+@shared_task
+def generate_quiz_recommendations(batch_size=500):
     """
-    Generate personalized quiz recommendations for active students
+    Rank quiz recommendations for recently active students and store them, so the
+    recommendations endpoint serves one row per request
     """
     from django.contrib.auth import get_user_model
-    from .utils import get_student_recommendations
+    from .models import StudentRecommendation
+    from .utils import rank_recommendations
     
     User = get_user_model()
     
@@ -116,17 +102,37 @@ def generate_quiz_recommendations():
         role='student',
         status='active',
         last_login__gte=recent_cutoff
-    )
+    ).only('id', 'email', 'year')
     
     recommendations_generated = 0
+    rankings = {}
     
-    for student in active_students:
+    for student in active_students.iterator(chunk_size=batch_size):
         try:
-            recommendations = get_student_recommendations(student)
-            # Store recommendations in cache or send notifications
-            # Implementation depends on your caching strategy
-            recommendations_generated += 1
+            rankings[student.id] = rank_recommendations(student)
         except Exception as e:
             print(f"Failed to generate recommendations for {student.email}: {e}")
+            continue
+        
+        if len(rankings) >= batch_size:
+            StudentRecommendation.store_many(rankings)
+            recommendations_generated += len(rankings)
+            rankings = {}
+    
+    if rankings:
+        StudentRecommendation.store_many(rankings)
+        recommendations_generated += len(rankings)
+    
+    return f"Generated recommendations for {recommendations_generated} students"
+
+@shared_task
+def update_item_statistics():
+    """
+    Fold new quiz answers and practice attempts into the per-question item statistics
+    """
+    from .utils import update_item_statistics as run_item_statistics
     
-    return f"Generated recommendations for {recommendations_generated} students"
\ No newline at end of file
+    run = run_item_statistics()
+    if run is None:
+        return "Item statistics run skipped, another run is in progress"
+    return f"Updated item statistics of {run.questions_updated} questions from {run.responses} responses"
\ No newline at end of file
@@ -1,17 +1,41 @@
 # apps/students/tests.py
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, transaction
+from django.apps import apps as django_apps
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import timedelta
-from rest_framework.test import APITestCase
+from django.db.models import Avg, Count
+from datetime import datetime, timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
-from apps.questions.models import Question, QuestionOption
-from .models import Quiz, QuizSession, QuizAnswer, StudentCalendarEvent
+from apps.questions.models import Module, Course, Question, QuestionOption, QuestionStatistics, ItemStatisticsRun
+from apps.questions.serializers import QuestionSerializer, QuestionCreateUpdateSerializer
+from apps.questions.utils import AnswerKeyCache, answer_keys, question_pool, module_catalog
+from apps.users.models import UserProgress, UserActivity, QuizAttempt
+from apps.core.counters import reconcile_counters
+from apps.core.constants import ITEM_ANALYSIS
+from .models import (
+    Quiz, QuizQuestion, QuizSession, QuizAnswer, StudentCalendarEvent, StudentStatistics,
+    StudentPreference, StudentRecommendation, StudentMastery
+)
+from .utils import (
+    generate_quiz_questions, reconcile_user_progress, time_series,
+    draw_session_questions, option_order, recompute_mastery, rank_recommendations,
+    update_item_statistics
+)
+from .tasks import generate_quiz_recommendations
+from . import utils as student_utils
 
 User = get_user_model()
 
 class QuizModelTest(TestCase):
     def setUp(self):
+        module_catalog.clear()
         self.admin_user = User.objects.create_user(
             username='admin',
             email='admin@test.com',
@@ -35,9 +59,137 @@ class QuizModelTest(TestCase):
         self.assertEqual(self.quiz.title, 'Test Quiz')
         self.assertEqual(self.quiz.status, 'active')
         self.assertTrue(self.quiz.is_public)
+    
+    def test_generate_quiz_questions_widens_tiers(self):
+        def create_question(difficulty, year=1):
+            return Question.objects.create(
+                question_text='Test question?',
+                module_name='Test Module',
+                year=year,
+                difficulty=difficulty,
+                created_by=self.admin_user
+            )
+        
+        exact = create_question('easy')
+        same_year = [create_question('hard'), create_question('medium')]
+        other_year = create_question('easy', year=2)
+        
+        self.assertEqual(generate_quiz_questions(self.quiz, 1), [exact.id])
+        self.assertEqual(
+            set(generate_quiz_questions(self.quiz, 3)),
+            {exact.id} | {question.id for question in same_year}
+        )
+        self.assertEqual(len(generate_quiz_questions(self.quiz, 10)), 4)
+        
+        # Re-selected questions are not duplicated
+        self.assertEqual(
+            set(self.quiz.quiz_questions.values_list('question_id', flat=True)),
+            {exact.id, other_year.id} | {question.id for question in same_year}
+        )
+        self.assertEqual(self.quiz.quiz_questions.count(), 4)
+    
+    def test_module_and_course_ids_are_interned(self):
+        # The rows are rolled back after the test, so must their catalog entries
+        self.addCleanup(module_catalog.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(
+                question_text='Test question?',
+                module_name='Test Module',
+                course_name='Anatomy',
+                year=1,
+                difficulty='easy',
+                created_by=self.admin_user
+            )
+        module = Module.objects.get(name='Test Module')
+        course = Course.objects.get(module=module, name='Anatomy')
+        
+        serializer = QuestionSerializer()
+        with self.assertNumQueries(0):
+            self.assertEqual(serializer.get_module(question)['id'], module.id)
+            self.assertEqual(serializer.get_course(question)['id'], course.id)
+        
+        # Saving again reuses the interned rows
+        Question.objects.create(
+            question_text='Another question?',
+            module_name='Test Module',
+            course_name='Anatomy',
+            year=2,
+            difficulty='hard',
+            created_by=self.admin_user
+        )
+        self.assertEqual(Module.objects.filter(name='Test Module').count(), 1)
+        self.assertEqual(Course.objects.filter(name='Anatomy').count(), 1)
+    
+    def test_backfill_module_fks_and_rename(self):
+        questions = [
+            Question.objects.create(
+                question_text=f'Question {i}?',
+                module_name='Test Module',
+                course_name='Anatomy' if i % 2 else 'Histology',
+                year=1,
+                difficulty='easy',
+                created_by=self.admin_user
+            )
+            for i in range(5)
+        ]
+        module = Module.objects.get(name='Test Module')
+        self.assertEqual(self.quiz.module_id, module.id)
+        self.assertTrue(all(question.module_id == module.id for question in questions))
+        
+        # Rows from before the foreign keys existed
+        Question.objects.update(module=None, course=None)
+        Quiz.objects.update(module=None, course=None)
+        call_command('backfill_module_fks', batch_size=2, stdout=StringIO())
+        
+        self.assertFalse(Question.objects.filter(module__isnull=True).exists())
+        self.assertEqual(
+            set(Question.objects.values_list('course__name', 'course_name').distinct()),
+            {('Anatomy', 'Anatomy'), ('Histology', 'Histology')}
+        )
+        self.assertEqual(Quiz.objects.get(id=self.quiz.id).module_id, module.id)
+        
+        # The migrations that add the foreign keys fill them for existing rows
+        Question.objects.update(module=None, course=None)
+        Quiz.objects.update(module=None, course=None)
+        import_module('apps.questions.migrations.0004_question_module_fks').fill_question_module_fks(django_apps, None)
+        import_module('apps.students.migrations.0007_quiz_module_fks').fill_quiz_module_fks(django_apps, None)
+        self.assertFalse(Question.objects.filter(module__isnull=True).exists())
+        self.assertEqual(
+            set(Question.objects.values_list('course__name', 'course_name').distinct()),
+            {('Anatomy', 'Anatomy'), ('Histology', 'Histology')}
+        )
+        self.assertEqual(Quiz.objects.get(id=self.quiz.id).module_id, module.id)
+        
+        # module_name stays accepted by the list filters
+        client = APIClient()
+        client.force_authenticate(user=self.admin_user)
+        response = client.get('/api/questions/', {'module_name': 'Test Module', 'course_name': 'Anatomy'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        
+        # A renamed module is read through the foreign key, the rows are not rewritten
+        with self.captureOnCommitCallbacks(execute=True):
+            module.name = 'Renamed Module'
+            module.save()
+        self.assertEqual(Question.objects.filter(module_name='Test Module').count(), 5)
+        response = client.get('/api/questions/', {'module_name': 'Renamed Module', 'course_name': 'Anatomy'})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(
+            {question['module_name'] for question in response.json()['results']}, {'Renamed Module'}
+        )
+        self.assertEqual(response.json()['results'][0]['module']['name'], 'Renamed Module')
+        
+        # Saving a row with its old strings keeps its keys instead of interning the old name
+        quiz = Quiz.objects.get(id=self.quiz.id)
+        quiz.title = 'Retitled'
+        quiz.save()
+        self.assertEqual((quiz.module_id, quiz.module_name), (module.id, 'Renamed Module'))
+        self.assertFalse(Module.objects.filter(name='Test Module').exists())
 
+@override_settings(ACTIVITY_TRACKING_ASYNC=False, QUESTION_POOL_BACKGROUND_REFRESH=False)
 class QuizSessionTest(APITestCase):
     def setUp(self):
+        module_catalog.clear()
         self.student = User.objects.create_user(
             username='student',
             email='student@test.com',
@@ -87,6 +239,9 @@ class QuizSessionTest(APITestCase):
             option_letter='b',
             is_correct=False
         )
+        
+        answer_keys.clear()
+        question_pool.clear()
     
     def test_start_quiz_session(self):
         self.client.force_authenticate(user=self.student)
@@ -125,6 +280,450 @@ class QuizSessionTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(response.data['is_correct'])
     
+    def test_start_is_idempotent_and_unique(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.student)
+        
+        response = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id},
+                                    HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        # A retry with the same key is replayed from the cache
+        with self.assertNumQueries(0):
+            replayed = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id},
+                                        HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(replayed.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed.data['id'], response.data['id'])
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        
+        # The database refuses a second open session of the same quiz
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            QuizSession.objects.create(user=self.student, quiz=self.quiz, expires_at=timezone.now())
+        
+        # A lapsed session gives up its slot to a new start
+        QuizSession.objects.filter(id=response.data['id']).update(expires_at=timezone.now() - timedelta(minutes=1))
+        restarted = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id})
+        self.assertEqual(restarted.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(restarted.data['id'], response.data['id'])
+        self.assertEqual(QuizSession.objects.get(id=response.data['id']).status, 'expired')
+    
+    def test_sessions_draw_reproducible_question_sets(self):
+        # Reads never build the index, until the refresher has run they query the table
+        with self.assertNumQueries(1):
+            self.assertEqual(question_pool.ids(self.question.module_id), [self.question.id])
+        self.assertIsNone(question_pool.fields_of(self.question.id))
+        self.assertFalse(question_pool.is_built)
+        
+        question_pool.rebuild()
+        self.assertEqual(question_pool.ids(self.question.module_id), [self.question.id])
+        
+        # The built index follows saves and deletes without another scan
+        with self.captureOnCommitCallbacks(execute=True):
+            extra = [
+                Question.objects.create(
+                    question_text=f'Extra question {i}?',
+                    module_name='Test Module',
+                    course_name='Test Course',
+                    year=1,
+                    difficulty='easy',
+                    explanation='Test explanation',
+                    created_by=self.admin
+                )
+                for i in range(6)
+            ]
+            retired = extra.pop()
+            retired.is_active = False
+            retired.save()
+        
+        pool_ids = [self.question.id] + [question.id for question in extra]
+        with self.assertNumQueries(0):
+            self.assertEqual(question_pool.ids(self.question.module_id, year=1), pool_ids)
+        
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id})
+        session = QuizSession.objects.get(id=response.data['id'])
+        
+        self.assertEqual(len(session.question_ids), 5)
+        self.assertEqual(session.total_questions, 5)
+        self.assertTrue(set(session.question_ids) <= set(pool_ids))
+        self.assertEqual(draw_session_questions(self.quiz, session.seed), session.question_ids)
+        
+        response = self.client.get(f'/api/students/quiz-sessions/{session.id}/questions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([question['id'] for question in response.data['questions']], session.question_ids)
+        for delivered in response.data['questions']:
+            letters = [option['option_letter'] for option in delivered['options']]
+            self.assertEqual(letters, option_order(session.seed, delivered['id'], letters))
+        
+        # Questions outside the session's draw are rejected
+        outside_id = next(question_id for question_id in pool_ids if question_id not in session.question_ids)
+        response = self.client.post(f'/api/students/quiz-sessions/{session.id}/answer/', {
+            'question_id': outside_id,
+            'selected_option': 'a'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # A quiz with curated questions draws from its own questions only
+        curated = extra[:3]
+        for order, question in enumerate(curated):
+            QuizQuestion.objects.create(quiz=self.quiz, question=question, order=order)
+        QuizSession.objects.filter(id=session.id).update(status='abandoned')
+        response = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id})
+        session = QuizSession.objects.get(id=response.data['id'])
+        self.assertEqual(sorted(session.question_ids), sorted(question.id for question in curated))
+        self.assertEqual(draw_session_questions(self.quiz, session.seed), session.question_ids)
+    
+    def test_quiz_detail_payload_is_compact_and_cached(self):
+        cache.clear()
+        second_question = Question.objects.create(
+            question_text='Second question?',
+            module_name='Test Module',
+            course_name='Test Course',
+            year=1,
+            difficulty='easy',
+            explanation='Test explanation',
+            created_by=self.admin
+        )
+        QuizQuestion.objects.create(quiz=self.quiz, question=self.question, order=1)
+        QuizQuestion.objects.create(quiz=self.quiz, question=second_question, order=2, points=2)
+        
+        self.client.force_authenticate(user=self.student)
+        response = self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([question['id'] for question in response.data['questions']],
+                         [self.question.id, second_question.id])
+        self.assertEqual(response.data['questions'][1]['points'], 2)
+        self.assertEqual(response.data['questions'][0]['created_by'], self.admin.id)
+        self.assertEqual(len(response.data['authors']), 1)
+        self.assertEqual([module['name'] for module in response.data['modules']], ['Test Module'])
+        # Answers stay hidden from students who have not completed the quiz
+        self.assertNotIn('is_correct', response.data['questions'][0]['options'][0])
+        
+        # Served from cache: only the quiz and the session check hit the database
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        
+        # Option edits reach the cached payload
+        QuestionOption.objects.filter(question=self.question, option_letter='b').first().delete()
+        response = self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        self.assertEqual(len(response.data['questions'][0]['options']), 1)
+        
+        self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id})
+        QuizSession.objects.filter(user=self.student, quiz=self.quiz).update(status='completed')
+        response = self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        self.assertIn('is_correct', response.data['questions'][0]['options'][0])
+        
+        # ...and again while a new attempt is running
+        self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id})
+        response = self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        self.assertNotIn('is_correct', response.data['questions'][0]['options'][0])
+        
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        self.assertIn('is_correct', response.data['questions'][0]['options'][0])
+        
+        # Questions added by generate_quiz_questions (bulk_create, no signals) show up too
+        QuizQuestion.objects.filter(quiz=self.quiz).delete()
+        response = self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        self.assertEqual(response.data['questions'], [])
+        generate_quiz_questions(self.quiz, 1)
+        response = self.client.get(f'/api/students/quizzes/{self.quiz.id}/')
+        self.assertEqual(len(response.data['questions']), 1)
+    
+    def test_lapsed_session_expires_at_read_time(self):
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id})
+        session_id = response.data['id']
+        QuizSession.objects.filter(id=session_id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        
+        # Reads see the expiry without anything being written
+        response = self.client.get(f'/api/students/quiz-sessions/{session_id}/')
+        self.assertEqual(response.data['status'], 'expired')
+        self.assertEqual(response.data['time_remaining_seconds'], 0)
+        response = self.client.post(f'/api/students/quiz-sessions/{session_id}/answer/', {
+            'question_id': self.question.id,
+            'selected_option': 'a'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(QuizSession.objects.get(id=session_id).status, 'in_progress')
+        
+        response = self.client.get('/api/students/quiz-sessions/', {'status': 'expired'})
+        self.assertEqual([session['id'] for session in response.data['results']], [session_id])
+        response = self.client.get('/api/students/quiz-sessions/', {'status': 'in_progress'})
+        self.assertEqual(response.data['results'], [])
+        
+        # The sweeper persists the transition in bounded batches
+        for minutes in (2, 3, 4):
+            QuizSession.objects.create(
+                user=User.objects.create_user(
+                    username=f'lapsed{minutes}', email=f'lapsed{minutes}@test.com', password='testpass123'
+                ),
+                quiz=self.quiz,
+                expires_at=timezone.now() - timedelta(minutes=minutes)
+            )
+        # Two full batches (SELECT ids + UPDATE) and the empty probe
+        with self.assertNumQueries(5):
+            self.assertEqual(QuizSession.objects.expire_lapsed(batch_size=2), 4)
+        self.assertFalse(QuizSession.objects.filter(status='in_progress').exists())
+    
+    def test_lapsed_session_cannot_be_completed(self):
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id})
+        session_id = response.data['id']
+        self.client.post(f'/api/students/quiz-sessions/{session_id}/answer/', {
+            'question_id': self.question.id,
+            'selected_option': 'a'
+        })
+        QuizSession.objects.filter(id=session_id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        
+        # Refused and persisted as expired, nothing reaches the statistics or progress
+        response = self.client.post(f'/api/students/quiz-sessions/{session_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(QuizSession.objects.get(id=session_id).status, 'expired')
+        self.assertFalse(StudentStatistics.objects.filter(user=self.student, quizzes_completed__gt=0).exists())
+        self.assertEqual(UserProgress.objects.get(user=self.student).total_questions_attempted, 0)
+    
+    def test_changed_answer_updates_counters(self):
+        self.client.force_authenticate(user=self.student)
+        
+        session_response = self.client.post('/api/students/quiz-sessions/start/', {
+            'quiz_id': self.quiz.id
+        })
+        session_id = session_response.data['id']
+        answer_url = f'/api/students/quiz-sessions/{session_id}/answer/'
+        
+        self.client.post(answer_url, {'question_id': self.question.id, 'selected_option': 'a'})
+        session = QuizSession.objects.get(id=session_id)
+        self.assertEqual(session.answered_count, 1)
+        self.assertEqual(session.correct_count, 1)
+        
+        # Changing the answer applies the difference instead of counting twice
+        self.client.post(answer_url, {'question_id': self.question.id, 'selected_option': 'b'})
+        session.refresh_from_db()
+        self.assertEqual(session.answered_count, 1)
+        self.assertEqual(session.correct_count, 0)
+        self.assertEqual(QuizAnswer.objects.filter(quiz_session=session).count(), 1)
+    
+    def test_answer_key_invalidated_on_option_update(self):
+        self.client.force_authenticate(user=self.student)
+        
+        session_response = self.client.post('/api/students/quiz-sessions/start/', {
+            'quiz_id': self.quiz.id
+        })
+        session_id = session_response.data['id']
+        self.assertEqual(answer_keys.get(self.question.id), ('a',))
+        # Stands in for the cache of another worker
+        other_worker = AnswerKeyCache()
+        self.assertEqual(other_worker.get(self.question.id), ('a',))
+        
+        # Replacing the options must drop the cached key, here and in other workers
+        serializer = QuestionCreateUpdateSerializer(self.question, data={
+            'options': [
+                {'option_text': 'Option A', 'option_letter': 'a', 'is_correct': False},
+                {'option_text': 'Option B', 'option_letter': 'b', 'is_correct': True},
+                {'option_text': 'Option C', 'option_letter': 'c', 'is_correct': True},
+            ]
+        }, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(other_worker.get(self.question.id), ('b', 'c'))
+        
+        # Either correct option of a multi-answer question is graded correct
+        for selected_option in ('b', 'c'):
+            response = self.client.post(f'/api/students/quiz-sessions/{session_id}/answer/', {
+                'question_id': self.question.id,
+                'selected_option': selected_option
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertTrue(response.data['is_correct'])
+    
+    def test_mastery_follows_answers_and_matches_batch_recompute(self):
+        other_question = Question.objects.create(
+            question_text='Other question?',
+            module_name='Test Module',
+            course_name='Other Course',
+            year=1,
+            difficulty='hard',
+            explanation='Test explanation',
+            created_by=self.admin
+        )
+        QuestionOption.objects.create(question=other_question, option_text='Option A', option_letter='a', is_correct=True)
+        self.client.force_authenticate(user=self.student)
+        session_id = self.client.post('/api/students/quiz-sessions/start/', {'quiz_id': self.quiz.id}).data['id']
+        
+        # First answer builds the row, later ones update it, a changed answer moves its evidence
+        answer_url = f'/api/students/quiz-sessions/{session_id}/answer/'
+        self.client.post(answer_url, {'question_id': self.question.id, 'selected_option': 'a'})
+        self.client.post(f'/api/students/quiz-sessions/{session_id}/answers/', {
+            'answers': [{'question_id': other_question.id, 'selected_option': 'b'}]
+        }, format='json')
+        self.client.post(answer_url, {'question_id': self.question.id, 'selected_option': 'b'})
+        # The write path reads the question pool but never builds it
+        self.assertFalse(question_pool.is_built)
+        
+        mastery = StudentMastery.objects.get(user=self.student)
+        test_course, other_course = self.question.course_id, other_question.course_id
+        self.assertAlmostEqual(mastery.mastery_of(self.question.module_id, test_course), 1 / 3.5)
+        self.assertAlmostEqual(mastery.mastery_of(self.question.module_id, other_course), 1 / 2.5)
+        self.assertAlmostEqual(mastery.mastery_of(self.question.module_id), 1 / 4)
+        
+        incremental = (mastery.module_ids, mastery.course_ids, mastery.successes, mastery.failures)
+        # NumPy (when installed) and the plain Python fallback recompute the same row
+        for numpy_module in (student_utils.np, None):
+            with self.subTest(numpy=numpy_module is not None), mock.patch.object(student_utils, 'np', numpy_module):
+                StudentMastery.objects.filter(user=self.student).update(successes=[], failures=[])
+                self.assertEqual(recompute_mastery(), 1)
+                mastery.refresh_from_db()
+                self.assertEqual(
+                    (mastery.module_ids, mastery.course_ids, mastery.successes, mastery.failures), incremental
+                )
+        
+        # The NumPy sums are merged across chunks
+        if student_utils.np is not None:
+            rows = [(1, 5, 7, 'easy', True), (1, 5, 7, 'hard', False), (2, 5, None, 'medium', True)]
+            self.assertEqual(
+                student_utils._accumulate_evidence_numpy(rows, chunk_size=2),
+                student_utils._accumulate_evidence(rows)
+            )
+        
+        # Weakest areas are recommended first
+        quizzes = {
+            course_name: Quiz.objects.create(
+                title=course_name, module_name='Test Module', course_name=course_name,
+                year=1, difficulty='easy', created_by=self.admin
+            )
+            for course_name in ('Other Course', 'Test Course')
+        }
+        self.assertEqual(
+            rank_recommendations(self.student),
+            [self.quiz.id, quizzes['Test Course'].id, quizzes['Other Course'].id]
+        )
+    
+    @override_settings(ITEM_STATISTICS_MIN_RESPONSES=5)
+    def test_item_statistics_are_incremental_and_flag_questions(self):
+        second_question = Question.objects.create(
+            question_text='Second question?',
+            module_name='Test Module',
+            course_name='Test Course',
+            year=1,
+            difficulty='easy',
+            explanation='Test explanation',
+            created_by=self.admin
+        )
+        QuestionOption.objects.create(question=second_question, option_text='Option A', option_letter='a', is_correct=True)
+        
+        # (first option, seconds, second option): the first question's key 'a' goes with high scores
+        for first_option, seconds, second_option in (('a', 10, 'a'), ('a', 20, 'b'), ('b', 30, 'b'), ('b', 40, 'b')):
+            correct = (first_option == 'a') + (second_option == 'a')
+            session = QuizSession.objects.create(
+                user=self.student, quiz=self.quiz, status='completed', completed_at=timezone.now(),
+                expires_at=timezone.now(), total_questions=2, answered_count=2,
+                correct_count=correct, correct_answers=correct
+            )
+            QuizAnswer.objects.create(
+                quiz_session=session, question=self.question, selected_option=first_option,
+                is_correct=first_option == 'a', time_taken_seconds=seconds
+            )
+            QuizAnswer.objects.create(
+                quiz_session=session, question=second_question, selected_option=second_option,
+                is_correct=second_option == 'a'
+            )
+        QuizAttempt.objects.create(
+            user=self.student, question=self.question, selected_option='b', is_correct=False,
+            time_taken=timedelta(seconds=5)
+        )
+        
+        run = update_item_statistics(now=timezone.now() + timedelta(minutes=10))
+        self.assertEqual((run.responses, run.questions_updated), (9, 2))
+        stats = QuestionStatistics.objects.get(question=self.question)
+        self.assertEqual(stats.p_value, 0.4)
+        self.assertAlmostEqual(stats.discrimination, 2 / 12 ** 0.5)
+        self.assertEqual(stats.option_counts, {'a': 2, 'b': 3})
+        self.assertEqual(stats.median_time_seconds, 20)
+        self.assertEqual(stats.flags, ['difficulty_mismatch', 'distractor_beats_key'])
+        self.assertFalse(QuestionStatistics.objects.get(question=second_question).is_flagged)
+        
+        # A later run only reads responses past the high-water mark
+        self.assertEqual(update_item_statistics(now=timezone.now() + timedelta(minutes=20)).responses, 0)
+        QuizAttempt.objects.create(
+            user=self.student, question=self.question, selected_option='a', is_correct=True,
+            created_at=timezone.now() + timedelta(minutes=17)
+        )
+        self.assertEqual(update_item_statistics(now=timezone.now() + timedelta(minutes=30)).responses, 1)
+        stats.refresh_from_db()
+        self.assertEqual((stats.responses, stats.correct_responses, stats.scored_responses), (6, 3, 4))
+        # The key is no longer outpicked, the easy label still does not fit
+        self.assertEqual(stats.flags, ['difficulty_mismatch'])
+        
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get('/api/admin/item-statistics/').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/admin/item-statistics/', {'flag': 'difficulty_mismatch'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['question_id'] for row in response.data['results']], [self.question.id])
+        response = self.client.get('/api/admin/item-statistics/', {'flag': 'too_easy', 'all': 1})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get('/api/admin/item-statistics/', {'flag': 'mismatch'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # A run that cannot lock the latest run row (another run holds it) does nothing
+        latest = ItemStatisticsRun.objects.first()
+        with mock.patch.object(ItemStatisticsRun.objects, 'select_for_update', side_effect=OperationalError):
+            self.assertIsNone(update_item_statistics(now=timezone.now() + timedelta(minutes=40)))
+        self.assertEqual(ItemStatisticsRun.objects.first(), latest)
+        
+        # Every correct option of a multi-answer question counts as the key
+        stats = QuestionStatistics(option_counts={'a': 2, 'b': 3, 'c': 1}, correct_responses=5, responses=6)
+        stats.evaluate('medium', {'a', 'b'}, ITEM_ANALYSIS, 5)
+        self.assertNotIn('distractor_beats_key', stats.flags)
+        stats.evaluate('medium', {'c'}, ITEM_ANALYSIS, 5)
+        self.assertIn('distractor_beats_key', stats.flags)
+    
+    def test_submit_quiz_answers_batch(self):
+        self.client.force_authenticate(user=self.student)
+        
+        second_question = Question.objects.create(
+            question_text='Second question?',
+            module_name='Test Module',
+            course_name='Test Course',
+            year=1,
+            difficulty='easy',
+            explanation='Test explanation',
+            created_by=self.admin
+        )
+        QuestionOption.objects.create(
+            question=second_question,
+            option_text='Option C',
+            option_letter='c',
+            is_correct=True
+        )
+        
+        session_response = self.client.post('/api/students/quiz-sessions/start/', {
+            'quiz_id': self.quiz.id
+        })
+        session_id = session_response.data['id']
+        
+        response = self.client.post(f'/api/students/quiz-sessions/{session_id}/answers/', {
+            'answers': [
+                {'question_id': self.question.id, 'selected_option': 'a'},
+                {'question_id': 999999, 'selected_option': 'a'},
+                {'question_id': second_question.id, 'selected_option': 'z'},
+                {'question_id': second_question.id, 'selected_option': 'd'},
+            ]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(len(results), 4)
+        self.assertTrue(results[0]['is_correct'])
+        self.assertIn('question_id', results[1]['errors'])
+        self.assertIn('selected_option', results[2]['errors'])
+        self.assertFalse(results[3]['is_correct'])
+        
+        session = QuizSession.objects.get(id=session_id)
+        self.assertEqual(session.answered_count, 2)
+        self.assertEqual(session.correct_count, 1)
+    
     def test_complete_quiz_session(self):
         self.client.force_authenticate(user=self.student)
         
@@ -147,7 +746,198 @@ class QuizSessionTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], 'completed')
         self.assertGreater(response.data['percentage_score'], 0)
+        
+        # Progress is updated incrementally and agrees with a full reconciliation
+        progress = UserProgress.objects.get(user=self.student)
+        self.assertEqual(progress.total_questions_attempted, 1)
+        self.assertEqual(progress.correct_answers, 1)
+        
+        reconcile_user_progress()
+        progress.refresh_from_db()
+        self.assertEqual(progress.total_questions_attempted, 1)
+        self.assertEqual(progress.correct_answers, 1)
+        
+        # Completing twice must not count the session again
+        response = self.client.post(f'/api/students/quiz-sessions/{session_id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        # Completions outside the endpoint (admin, shell, tasks) reach progress too
+        other_session = QuizSession.objects.create(
+            user=self.student, quiz=self.quiz, expires_at=timezone.now() + timedelta(minutes=30)
+        )
+        other_session.status = 'completed'
+        other_session.total_questions = 4
+        other_session.correct_answers = 3
+        other_session.save()
+        other_session.save()
+        progress.refresh_from_db()
+        self.assertEqual((progress.total_questions_attempted, progress.correct_answers), (5, 4))
+        
+        # Students without completed sessions are reset, not skipped
+        QuizSession.objects.filter(user=self.student).update(status='abandoned')
+        reconcile_user_progress()
+        progress.refresh_from_db()
+        self.assertEqual((progress.total_questions_attempted, progress.correct_answers), (0, 0))
+
+@override_settings(ACTIVITY_TRACKING_ASYNC=False, QUESTION_POOL_BACKGROUND_REFRESH=False)
+class StudentStatisticsTest(APITestCase):
+    def setUp(self):
+        module_catalog.clear()
+        cache.clear()
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+        
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='admin'
+        )
+        
+        self.quiz = Quiz.objects.create(
+            title='Test Quiz',
+            module_name='Test Module',
+            year=1,
+            difficulty='easy',
+            questions_count=2,
+            created_by=self.admin
+        )
+    
+    def create_completed_session(self, days_ago, score):
+        completed_at = timezone.now() - timedelta(days=days_ago)
+        return QuizSession.objects.create(
+            user=self.student,
+            quiz=self.quiz,
+            status='completed',
+            completed_at=completed_at,
+            expires_at=completed_at,
+            score=score,
+            total_questions=2,
+            correct_answers=1,
+            time_spent_seconds=600
+        )
+    
+    def test_incremental_statistics_match_rebuild(self):
+        sessions = [
+            self.create_completed_session(3, 40),
+            self.create_completed_session(1, 80),
+            self.create_completed_session(0, 60),
+        ]
+        
+        stats = StudentStatistics(user=self.student)
+        for session in sessions:
+            stats.add_session(session)
+        
+        # First access builds the row from history
+        rebuilt = StudentStatistics.for_user(self.student)
+        
+        for field in ['quizzes_completed', 'score_total', 'best_score', 'questions_answered',
+                      'module_stats', 'difficulty_stats', 'daily_stats',
+                      'current_streak', 'longest_streak', 'last_study_date']:
+            self.assertEqual(getattr(stats, field), getattr(rebuilt, field), field)
+        self.assertEqual(stats.current_streak, 2)
+    
+    def test_statistics_endpoints_read_from_stats_row(self):
+        self.create_completed_session(0, 50)
+        self.create_completed_session(0, 100)
+        self.client.force_authenticate(user=self.student)
+        
+        response = self.client.get('/api/students/statistics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_sessions'], 2)
+        self.assertEqual(response.data['average_score'], 75)
+        self.assertEqual(response.data['best_score'], 100)
+        self.assertEqual(response.data['monthly_progress'][-1]['quizzes_completed'], 2)
+        
+        response = self.client.get('/api/students/dashboard/stats/')
+        self.assertEqual(response.data['performance_trend'][-1]['count'], 2)
+        self.assertEqual(response.data['performance_trend'][-1]['score'], 75)
+        
+        response = self.client.get('/api/students/study-streak/')
+        self.assertEqual(response.data['current_streak'], 1)
 
+    def test_student_statistics_cached_until_session_changes(self):
+        self.create_completed_session(0, 50)
+        self.client.force_authenticate(user=self.student)
+        
+        response = self.client.get('/api/students/statistics/')
+        self.assertEqual(response.data['total_sessions'], 1)
+        
+        # Bypasses signals, so the cached response is still served
+        StudentStatistics.objects.filter(user=self.student).update(quizzes_completed=5)
+        response = self.client.get('/api/students/statistics/')
+        self.assertEqual(response.data['total_sessions'], 1)
+        
+        # Saving a session drops the cached entry once the save commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_completed_session(0, 100)
+        response = self.client.get('/api/students/statistics/')
+        self.assertEqual(response.data['total_sessions'], 5)
+
+    def test_time_series_is_gap_filled(self):
+        self.create_completed_session(0, 50)
+        self.create_completed_session(0, 100)
+        self.create_completed_session(2, 30)
+        sessions = QuizSession.objects.filter(user=self.student, status='completed')
+        today = timezone.localdate()
+        
+        daily = time_series(sessions, 'completed_at', 'day', 7, count=Count('id'), avg=Avg('score'))
+        self.assertEqual(len(daily), 7)
+        self.assertEqual(daily[-1], {'period': today, 'count': 2, 'avg': 75})
+        self.assertEqual(daily[-2]['count'], 0)
+        self.assertEqual(daily[-3]['count'], 1)
+        
+        weekly = time_series(sessions, 'completed_at', 'week', 4, count=Count('id'))
+        self.assertEqual(weekly[-1]['period'].weekday(), 0)
+        self.assertEqual(sum(row['count'] for row in weekly), 3)
+        
+        monthly = time_series(sessions, 'completed_at', 'month', 6, count=Count('id'))
+        self.assertEqual([row['period'].day for row in monthly], [1] * 6)
+        self.assertEqual(sum(row['count'] for row in monthly), 3)
+
+    def test_recommendations_are_stored_and_served_from_one_row(self):
+        self.student.status = 'active'
+        self.student.last_login = timezone.now()
+        self.student.save()
+        self.create_completed_session(1, 90)
+        medium = Quiz.objects.create(
+            title='Medium Quiz', module_name='Test Module', year=1, difficulty='medium', created_by=self.admin
+        )
+        favorite = Quiz.objects.create(
+            title='Favorite Quiz', module_name='Anatomy', year=1, difficulty='easy', created_by=self.admin
+        )
+        hard = Quiz.objects.create(
+            title='Hard Quiz', module_name='Test Module', year=1, difficulty='hard', created_by=self.admin
+        )
+        StudentPreference.objects.filter(user=self.student).update(favorite_modules=['Anatomy'])
+        
+        self.assertEqual(generate_quiz_recommendations(), 'Generated recommendations for 1 students')
+        stored = StudentRecommendation.objects.get(user=self.student)
+        # Completed quiz left out, favorites first, then the stated preference without answer history
+        self.assertEqual(stored.quiz_ids, [favorite.id, medium.id, hard.id])
+        
+        self.client.force_authenticate(user=self.student)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/students/quizzes/recommended/')
+        self.assertEqual([quiz['id'] for quiz in response.data], stored.quiz_ids)
+        
+        # Rows of an older ranking version are recomputed on read
+        StudentRecommendation.objects.filter(user=self.student).update(version=0, quiz_ids=[])
+        response = self.client.get('/api/students/quizzes/recommended/')
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(StudentRecommendation.objects.get(user=self.student).version, StudentRecommendation.ALGORITHM_VERSION)
+        
+        # Changed preferences drop the stored ranking
+        preferences = StudentPreference.objects.get(user=self.student)
+        preferences.favorite_modules = []
+        preferences.save()
+        self.assertFalse(StudentRecommendation.objects.filter(user=self.student).exists())
+
+@override_settings(ACTIVITY_TRACKING_ASYNC=False, QUESTION_POOL_BACKGROUND_REFRESH=False)
 class StudentCalendarEventTest(APITestCase):
     def setUp(self):
         self.student = User.objects.create_user(
@@ -175,3 +965,142 @@ class StudentCalendarEventTest(APITestCase):
         self.assertEqual(response.data['title'], 'Test Event')
         self.assertEqual(response.data['user']['id'], self.student.id)
 
+@override_settings(ACTIVITY_TRACKING_ASYNC=False, QUESTION_POOL_BACKGROUND_REFRESH=False)
+class QuickStatsCountersTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+    
+    def test_counters_follow_signals_and_reconcile(self):
+        response = self.client.get('/api/admin/quick-stats/')
+        self.assertEqual(response.data['users_today'], 0)
+        self.assertEqual(response.data['pending_accounts'], 0)
+        
+        student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+        response = self.client.get('/api/admin/quick-stats/')
+        self.assertEqual(response.data['users_today'], 1)
+        self.assertEqual(response.data['pending_accounts'], 1)
+        
+        student.status = 'active'
+        student.save()
+        response = self.client.get('/api/admin/quick-stats/')
+        self.assertEqual(response.data['pending_accounts'], 0)
+        
+        # Bulk updates bypass signals until the reconciliation task runs
+        User.objects.filter(pk=student.pk).update(status='pending')
+        self.assertEqual(reconcile_counters()['pending_accounts'], 1)
+        response = self.client.get('/api/admin/quick-stats/')
+        self.assertEqual(response.data['pending_accounts'], 1)
+    
+    def test_statistics_data_groups_series_and_is_cached(self):
+        year = timezone.now().year
+        january = timezone.make_aware(datetime(year, 1, 15, 12))
+        march = timezone.make_aware(datetime(year, 3, 10, 12))
+        students = [
+            User.objects.create_user(
+                username=f'student{index}',
+                email=f'student{index}@test.com',
+                password='testpass123',
+                role='student',
+                year=2
+            ) for index in range(3)
+        ]
+        User.objects.filter(pk=students[0].pk).update(created_at=january, status='active')
+        User.objects.filter(pk__in=[students[1].pk, students[2].pk]).update(created_at=march)
+        
+        question = Question.objects.create(
+            question_text='Test question?',
+            module_name='Test Module',
+            year=2,
+            difficulty='easy',
+            created_by=self.admin
+        )
+        for is_correct in (True, True, False):
+            QuizAttempt.objects.create(
+                user=students[0], question=question, selected_option='a', is_correct=is_correct
+            )
+        QuizAttempt.objects.update(created_at=march)
+        
+        response = self.client.get('/api/admin/statistics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        monthly_users = response.data['user_registrations_data']['datasets'][0]['data']
+        self.assertEqual(monthly_users, [1, 0, 2] + [0] * 9)
+        monthly_attempts = response.data['quiz_attempts_data']['datasets'][0]['data']
+        self.assertEqual(monthly_attempts, [0, 0, 3] + [0] * 9)
+        self.assertEqual(response.data['revenue_data']['datasets'][0]['data'][:3], [2000, 0, 4000])
+        self.assertEqual(response.data['year_distribution_data']['datasets'][0]['data'], [0, 3, 0, 0, 0])
+        
+        platform_stats = response.data['platform_stats']
+        self.assertEqual(platform_stats['total_users'], 3)
+        self.assertEqual(platform_stats['active_users'], 1)
+        self.assertEqual(platform_stats['total_questions'], 1)
+        self.assertEqual(platform_stats['total_quiz_attempts'], 3)
+        self.assertEqual(platform_stats['avg_user_score'], 66.7)
+        
+        # The second call is served from the cache
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/admin/statistics/')
+        self.assertEqual(cached.data, response.data)
+        
+        response = self.client.get('/api/admin/statistics/?refresh=1')
+        self.assertEqual(response.data['platform_stats']['total_quiz_attempts'], 3)
+
+class HotQueryIndexTest(TestCase):
+    def setUp(self):
+        module_catalog.clear()
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+        self.quiz = Quiz.objects.create(
+            title='Test Quiz',
+            module_name='Test Module',
+            year=1,
+            difficulty='easy',
+            questions_count=2,
+            created_by=self.student
+        )
+    
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f'{index_name} not used:\n{plan}')
+    
+    def test_hot_queries_use_indexes(self):
+        now = timezone.now()
+        sessions = QuizSession.objects
+        events = StudentCalendarEvent.objects
+        
+        self.assertUsesIndex(
+            sessions.filter(user=self.student, status='completed').order_by('-completed_at'),
+            'students_qs_user_status_idx'
+        )
+        self.assertUsesIndex(sessions.filter(quiz=self.quiz, status='completed'), 'students_qs_quiz_status_idx')
+        self.assertUsesIndex(
+            sessions.filter(user=self.student, quiz=self.quiz, status='in_progress'),
+            'students_qs_one_open_uniq'
+        )
+        self.assertUsesIndex(sessions.lapsed(now).order_by('expires_at'), 'students_qs_expiry_idx')
+        self.assertUsesIndex(
+            events.filter(user=self.student, event_date__gte=now, is_completed=False).order_by('event_date'),
+            'students_event_user_idx'
+        )
+        self.assertUsesIndex(
+            events.filter(event_date__gte=now, event_date__lte=now + timedelta(hours=1),
+                          reminder_enabled=True, is_completed=False),
+            'students_event_reminder_idx'
+        )
+        self.assertUsesIndex(QuizAttempt.objects.filter(created_at__gte=now), 'users_attempt_created_idx')
+        self.assertUsesIndex(UserActivity.objects.filter(created_at__gte=now), 'users_activity_created_idx')
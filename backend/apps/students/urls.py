@@ -18,7 +18,9 @@ urlpatterns = [
     path('quiz-sessions/', views.QuizSessionListView.as_view(), name='quiz-sessions-list'),
     path('quiz-sessions/start/', views.QuizSessionCreateView.as_view(), name='start-quiz-session'),
     path('quiz-sessions/<int:pk>/', views.QuizSessionDetailView.as_view(), name='quiz-session-detail'),
+    path('quiz-sessions/<int:session_id>/questions/', views.quiz_session_questions, name='quiz-session-questions'),
     path('quiz-sessions/<int:session_id>/answer/', views.submit_quiz_answer, name='submit-quiz-answer'),
+    path('quiz-sessions/<int:session_id>/answers/', views.submit_quiz_answers_batch, name='submit-quiz-answers-batch'),
     path('quiz-sessions/<int:session_id>/complete/', views.complete_quiz_session, name='complete-quiz-session'),
     
     # Calendar Events
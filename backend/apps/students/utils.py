@@ -1,60 +1,529 @@
 # apps/students/utils.py
 import random
-from datetime import timedelta
+from itertools import islice
+from datetime import datetime, time, timedelta
 from django.utils import timezone
-from django.db.models import Count, Avg
-from .models import Quiz, QuizSession, QuizQuestion
-from apps.questions.models import Question
+from django.db import OperationalError, transaction
+from django.conf import settings
+from django.db.models import Count, Avg, Sum, Q, DateField, Exists, OuterRef
+from django.db.models.functions import Coalesce, TruncDate, TruncWeek, TruncMonth
+from .models import (
+    Quiz, QuizSession, QuizQuestion, QuizAnswer, StudentPreference, StudentRecommendation,
+    StudentMastery
+)
+from apps.questions.models import Question, QuestionOption
+from apps.questions.utils import answer_keys, question_pool
+from apps.core.constants import ITEM_ANALYSIS
+from apps.core.cache import invalidate_cache
+
+try:
+    import numpy as np
+except ImportError:  # Optional, recompute_mastery falls back to plain Python
+    np = None
+
+# Above this many candidates the sample is drawn by the database instead of in Python
+DB_RANDOM_SAMPLE_THRESHOLD = 10000
+
+# Difficulty suited to a mastery level: below 0.5 easy, below 0.75 medium, then hard
+MASTERY_DIFFICULTY_BANDS = ((0.5, 'easy'), (0.75, 'medium'))
+DIFFICULTY_LEVELS = {'easy': 0, 'medium': 1, 'hard': 2}
+
+def target_difficulty(mastery):
+    for upper_bound, difficulty in MASTERY_DIFFICULTY_BANDS:
+        if mastery < upper_bound:
+            return difficulty
+    return 'hard'
+
+def weighted_sample(rng, population, weights, k):
+    """
+    k items drawn without replacement with probability proportional to their weights
+    (Efraimidis-Spirakis), uniform when every weight is equal
+    """
+    keyed = sorted(
+        zip(population, weights),
+        key=lambda item: rng.random() ** (1.0 / item[1]),
+        reverse=True
+    )
+    return [item for item, weight in keyed[:k]]
+
+def practice_weight(mastery, module_id, course_id):
+    """
+    Sampling weight of a question for a student, from 0.5 (mastered) to 1.5 (not at all)
+    """
+    return 1.5 - mastery.mastery_of(module_id, course_id)
 
 def generate_quiz_questions(quiz, questions_count=None):
     """
-    Generate questions for a quiz based on module, year, and difficulty
+    Generate questions for a quiz based on module, year, and difficulty.
+
+    Candidates are narrowed in tiers (exact match, then same module and year, then the
+    whole module); the size of every tier comes from one aggregate and only primary keys
+    are sampled. The quiz is shared, per-student weighting happens in
+    draw_session_questions. Returns the ids of the selected questions.
     """
     if questions_count is None:
         questions_count = quiz.questions_count
     
-    # Get available questions matching quiz criteria
-    available_questions = Question.objects.filter(
-        module_name=quiz.module_name,
-        year=quiz.year,
-        difficulty=quiz.difficulty,
-        is_active=True
+    module_questions = Question.objects.filter(is_active=True, module_id=quiz.module_id)
+    
+    exact_match = Q(year=quiz.year, difficulty=quiz.difficulty)
+    if quiz.course_id:
+        exact_match &= Q(course_id=quiz.course_id)
+    tiers = [exact_match, Q(year=quiz.year), Q()]
+    
+    sizes = module_questions.aggregate(**{
+        f'tier_{index}': Count('id', filter=condition) if condition else Count('id')
+        for index, condition in enumerate(tiers)
+    })
+    
+    # First tier with enough questions, otherwise the widest one
+    index = next(
+        (index for index in range(len(tiers)) if sizes[f'tier_{index}'] >= questions_count),
+        len(tiers) - 1
+    )
+    candidates = module_questions.filter(tiers[index])
+    pool_size = sizes[f'tier_{index}']
+    sample_size = min(questions_count, pool_size)
+    
+    # Randomly select questions
+    if pool_size > DB_RANDOM_SAMPLE_THRESHOLD:
+        selected_ids = list(candidates.order_by('?').values_list('id', flat=True)[:sample_size])
+    else:
+        selected_ids = random.sample(list(candidates.values_list('id', flat=True)), sample_size)
+    
+    # Questions already on the quiz are left as they are
+    QuizQuestion.objects.bulk_create(
+        [
+            QuizQuestion(quiz=quiz, question_id=question_id, order=order, points=1)
+            for order, question_id in enumerate(selected_ids, start=1)
+        ],
+        ignore_conflicts=True
     )
+    # bulk_create sends no post_save, so the QuizQuestion receiver cannot drop the payload
+    invalidate_cache('quiz_payload', quiz_id=quiz.id)
     
-    if quiz.course_name:
-        available_questions = available_questions.filter(course_name=quiz.course_name)
+    return selected_ids
+
+def draw_session_questions(quiz, seed, questions_count=None, mastery=None):
+    """
+    Draw the question ids of one session.
+
+    A quiz with curated QuizQuestion rows draws from its own active questions. Other
+    quizzes draw from the in-memory question pool with the same tiers as
+    generate_quiz_questions. Given the student's StudentMastery, both lean towards weak
+    courses. The draw only depends on the seed, the candidates and the mastery, so a
+    session can be reproduced from its seed.
+    """
+    if questions_count is None:
+        questions_count = quiz.questions_count
     
-    # If we don't have enough questions, expand criteria
-    if available_questions.count() < questions_count:
-        # Try without course filter
-        available_questions = Question.objects.filter(
-            module_name=quiz.module_name,
-            year=quiz.year,
-            is_active=True
+    candidates = list(
+        quiz.quiz_questions.filter(question__is_active=True).order_by('question_id').values_list(
+            'question_id', flat=True
         )
+    )
+    
+    if not candidates:
+        tiers = [
+            {'course_id': quiz.course_id, 'year': quiz.year, 'difficulty': quiz.difficulty},
+            {'year': quiz.year},
+            {},
+        ]
+        for filters in tiers:
+            candidates = question_pool.ids(quiz.module_id, **filters)
+            if len(candidates) >= questions_count:
+                break
+    
+    sample_size = min(questions_count, len(candidates))
+    if mastery is not None and mastery.has_evidence:
+        areas = question_areas(candidates)
+        weights = [
+            practice_weight(mastery, *areas[question_id][:2]) if question_id in areas else 1.0
+            for question_id in candidates
+        ]
+        return weighted_sample(random.Random(seed), candidates, weights, sample_size)
+    
+    return random.Random(seed).sample(candidates, sample_size)
+
+def option_order(seed, question_id, letters):
+    """
+    Deterministic permutation of a question's option letters for one session
+    """
+    letters = sorted(letters)
+    random.Random(f'{seed}:{question_id}').shuffle(letters)
+    return letters
+
+def record_quiz_answers(quiz_session, answers):
+    """
+    Grade and store several answers of a session at once.
+
+    `answers` maps question_id -> validated answer data. Grading uses one answer key
+    lookup, the rows are written with bulk_create/bulk_update and the session counters
+    are shifted once, all in a single transaction. Returns (saved, unknown_ids) where
+    `saved` maps question_id -> QuizAnswer.
+    """
+    keys = answer_keys.get_many(answers.keys())
+    unknown_ids = [question_id for question_id in answers if question_id not in keys]
+    graded = {
+        question_id: data for question_id, data in answers.items()
+        if question_id in keys
+    }
+    
+    saved = {}
+    if not graded:
+        return saved, unknown_ids
+    
+    with transaction.atomic():
+        quiz_session.lock_counters()
         
-        # If still not enough, try different difficulty
-        if available_questions.count() < questions_count:
-            available_questions = Question.objects.filter(
-                module_name=quiz.module_name,
-                is_active=True
+        existing = {
+            answer.question_id: answer
+            for answer in QuizAnswer.objects.filter(
+                quiz_session=quiz_session,
+                question_id__in=graded.keys()
             )
+        }
+        
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        answered_delta = 0
+        correct_delta = 0
+        mastery_changes = []
+        
+        for question_id, data in graded.items():
+            is_correct = data['selected_option'] in keys[question_id]
+            answer = existing.get(question_id)
+            
+            if answer:
+                correct_delta += int(is_correct) - int(answer.is_correct)
+                if answer.is_correct != is_correct:
+                    mastery_changes += [(question_id, answer.is_correct, -1), (question_id, is_correct, 1)]
+                answer.updated_at = now
+                to_update.append(answer)
+            else:
+                answer = QuizAnswer(quiz_session=quiz_session, question_id=question_id)
+                answered_delta += 1
+                correct_delta += int(is_correct)
+                mastery_changes.append((question_id, is_correct, 1))
+                to_create.append(answer)
+            
+            answer.selected_option = data['selected_option']
+            answer.is_correct = is_correct
+            answer.time_taken_seconds = data.get('time_taken_seconds', 0)
+            answer.flagged = data.get('flagged', False)
+            saved[question_id] = answer
+        
+        QuizAnswer.objects.bulk_create(to_create)
+        QuizAnswer.objects.bulk_update(to_update, [
+            'selected_option', 'is_correct', 'time_taken_seconds', 'flagged', 'updated_at'
+        ])
+        
+        # Bulk writes skip post_save, so update the session once for the whole batch
+        quiz_session.apply_answer_delta(answered_delta, correct_delta)
+        quiz_session.sync_score_from_counters()
+        record_mastery(quiz_session.user_id, mastery_changes)
     
-    # Randomly select questions
-    selected_questions = random.sample(
-        list(available_questions), 
-        min(questions_count, available_questions.count())
+    return saved, unknown_ids
+
+def question_areas(question_ids):
+    """
+    {question_id: (module_id, course_id, difficulty)} resolved through the in-memory
+    question pool, questions it does not know are read from the table
+    """
+    areas = {}
+    missing = []
+    
+    for question_id in question_ids:
+        fields = question_pool.fields_of(question_id)
+        if not fields or not fields['module_id']:
+            missing.append(question_id)
+            continue
+        areas[question_id] = (fields['module_id'], fields['course_id'] or 0, fields['difficulty'])
+    
+    if missing:
+        for question_id, module_id, course_id, difficulty in Question.objects.filter(
+            id__in=missing, module__isnull=False
+        ).values_list('id', 'module_id', 'course_id', 'difficulty'):
+            areas[question_id] = (module_id, course_id or 0, difficulty)
+    
+    return areas
+
+def record_mastery(user_id, changes):
+    """
+    Fold answer changes, (question_id, is_correct, sign) tuples, into a student's mastery.
+    Must be called inside the transaction that saved the answers.
+    """
+    if not changes:
+        return
+    
+    mastery, created = StudentMastery.objects.select_for_update().get_or_create(user_id=user_id)
+    
+    # A new row may be missing older history, the recompute already includes these answers
+    if created:
+        recompute_mastery(user_ids=[user_id])
+        return
+    
+    areas = question_areas({question_id for question_id, is_correct, sign in changes})
+    mastery.apply([
+        (*areas[question_id], is_correct, sign)
+        for question_id, is_correct, sign in changes
+        if question_id in areas
+    ])
+    mastery.save()
+
+def _accumulate_evidence(rows):
+    evidence = {}
+    for user_id, module_id, course_id, difficulty, is_correct in rows:
+        success, failure = StudentMastery.evidence_weights(difficulty, is_correct)
+        area = evidence.setdefault(user_id, {}).setdefault((module_id, course_id or 0), [0.0, 0.0])
+        area[0] += success
+        area[1] += failure
+    return evidence
+
+def _accumulate_evidence_numpy(rows, chunk_size=5000):
+    # Sums chunk by chunk, memory stays bounded by one chunk plus the areas seen so far
+    evidence = {}
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return evidence
+        for user_id, user_areas in _sum_evidence_chunk(chunk).items():
+            areas = evidence.setdefault(user_id, {})
+            for area, (success, failure) in user_areas.items():
+                totals = areas.setdefault(area, [0.0, 0.0])
+                totals[0] += success
+                totals[1] += failure
+
+def _sum_evidence_chunk(rows):
+    user_ids, module_ids, course_ids, difficulties, correct = zip(*rows)
+    keys = np.column_stack([
+        np.asarray(user_ids, dtype=np.int64),
+        np.asarray(module_ids, dtype=np.int64),
+        np.asarray([course_id or 0 for course_id in course_ids], dtype=np.int64),
+    ])
+    correct = np.asarray(correct, dtype=bool)
+    
+    # Per-answer weights through the few distinct difficulty labels
+    labels, label_index = np.unique(np.asarray(difficulties), return_inverse=True)
+    success_weights = np.array([StudentMastery.evidence_weights(label, True)[0] for label in labels])
+    failure_weights = np.array([StudentMastery.evidence_weights(label, False)[1] for label in labels])
+    label_index = label_index.reshape(-1)
+    
+    areas, area_index = np.unique(keys, axis=0, return_inverse=True)
+    area_index = area_index.reshape(-1)
+    successes = np.bincount(
+        area_index, weights=np.where(correct, success_weights[label_index], 0.0), minlength=len(areas)
+    )
+    failures = np.bincount(
+        area_index, weights=np.where(correct, 0.0, failure_weights[label_index]), minlength=len(areas)
+    )
+    
+    evidence = {}
+    for (user_id, module_id, course_id), success, failure in zip(
+        areas.tolist(), successes.tolist(), failures.tolist()
+    ):
+        evidence.setdefault(user_id, {})[(module_id, course_id)] = [success, failure]
+    return evidence
+
+def recompute_mastery(user_ids=None, batch_size=500):
+    """
+    Recompute StudentMastery from the full QuizAnswer history, for the whole cohort
+    unless user_ids is given.
+
+    The evidence of every (student, module, course) area is summed in one pass,
+    vectorized with NumPy when it is installed, and the rows are upserted in batches.
+    Returns the number of students written.
+    """
+    answers = QuizAnswer.objects.filter(question__module__isnull=False)
+    if user_ids is not None:
+        answers = answers.filter(quiz_session__user_id__in=user_ids)
+    rows = answers.order_by().values_list(
+        'quiz_session__user_id', 'question__module_id', 'question__course_id',
+        'question__difficulty', 'is_correct'
+    ).iterator(chunk_size=5000)
+    
+    if np is not None:
+        evidence = _accumulate_evidence_numpy(rows)
+    else:
+        evidence = _accumulate_evidence(rows)
+    
+    # Requested students without answers are reset too
+    for user_id in user_ids or []:
+        evidence.setdefault(user_id, {})
+    
+    to_write = []
+    for user_id, areas in evidence.items():
+        mastery = StudentMastery(user_id=user_id)
+        mastery.set_areas(areas)
+        to_write.append(mastery)
+    
+    StudentMastery.objects.bulk_create(
+        to_write,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['module_ids', 'course_ids', 'successes', 'failures', 'updated_at']
+    )
+    return len(to_write)
+
+def reconcile_user_progress(user_ids=None, batch_size=500):
+    """
+    Recompute UserProgress totals from the full quiz history.
+
+    Completion keeps UserProgress current with O(1) deltas, so this is only needed
+    occasionally to repair drift. Runs one grouped aggregate and writes in batches;
+    progress rows of students without completed sessions are reset to zero.
+    """
+    from apps.users.models import UserProgress
+    
+    sessions = QuizSession.objects.filter(status='completed')
+    progress_without_sessions = UserProgress.objects.exclude(
+        Exists(QuizSession.objects.filter(user_id=OuterRef('user_id'), status='completed'))
+    )
+    if user_ids is not None:
+        sessions = sessions.filter(user_id__in=user_ids)
+        progress_without_sessions = progress_without_sessions.filter(user_id__in=user_ids)
+    
+    progress_without_sessions.exclude(
+        total_questions_attempted=0, correct_answers=0, total_study_time=timedelta(0)
+    ).update(
+        total_questions_attempted=0,
+        correct_answers=0,
+        total_study_time=timedelta(0),
+        updated_at=timezone.now()
     )
     
-    # Create QuizQuestion objects
-    for i, question in enumerate(selected_questions):
-        QuizQuestion.objects.get_or_create(
-            quiz=quiz,
-            question=question,
-            defaults={'order': i + 1, 'points': 1}
+    totals = {
+        row['user_id']: row
+        for row in sessions.values('user_id').annotate(
+            questions=Sum('total_questions'),
+            correct=Sum('correct_answers'),
+            seconds=Sum('time_spent_seconds')
+        ).order_by()
+    }
+    
+    progress_rows = UserProgress.objects.filter(user_id__in=totals.keys())
+    existing_user_ids = set()
+    to_update = []
+    
+    for progress in progress_rows.iterator(chunk_size=batch_size):
+        row = totals[progress.user_id]
+        existing_user_ids.add(progress.user_id)
+        progress.total_questions_attempted = row['questions'] or 0
+        progress.correct_answers = row['correct'] or 0
+        progress.total_study_time = timedelta(seconds=row['seconds'] or 0)
+        progress.updated_at = timezone.now()
+        to_update.append(progress)
+    
+    UserProgress.objects.bulk_update(to_update, [
+        'total_questions_attempted', 'correct_answers', 'total_study_time', 'updated_at'
+    ], batch_size=batch_size)
+    
+    UserProgress.objects.bulk_create([
+        UserProgress(
+            user_id=user_id,
+            total_questions_attempted=row['questions'] or 0,
+            correct_answers=row['correct'] or 0,
+            total_study_time=timedelta(seconds=row['seconds'] or 0)
         )
+        for user_id, row in totals.items() if user_id not in existing_user_ids
+    ], batch_size=batch_size, ignore_conflicts=True)
+    
+    return len(totals)
+
+def period_start(day, granularity):
+    """
+    Return the first day of the day/week/month bucket containing `day` (weeks start on Monday)
+    """
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+def bucket_periods(granularity='day', periods=7, end=None):
+    """
+    Return the start dates of the last `periods` buckets, oldest first, ending with
+    the bucket that contains `end` (today by default)
+    """
+    start = period_start(end or timezone.localdate(), granularity)
+    starts = [start]
+    
+    for i in range(periods - 1):
+        if granularity == 'day':
+            start = start - timedelta(days=1)
+        elif granularity == 'week':
+            start = start - timedelta(weeks=1)
+        else:
+            start = (start - timedelta(days=1)).replace(day=1)
+        starts.insert(0, start)
+    
+    return starts
+
+def _next_period_start(start, granularity):
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(weeks=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def time_series(queryset, date_field, granularity='day', periods=7, end=None, **aggregates):
+    """
+    Aggregate `queryset` per day/week/month over the last `periods` buckets with a
+    single GROUP BY and return a gap-filled list, oldest first:
+    
+        time_series(sessions, 'completed_at', 'month', 6, count=Count('id'))
+        -> [{'period': date(2025, 5, 1), 'count': 0}, ...]
+    
+    Buckets without rows report 0 for every aggregate.
+    """
+    trunc = {
+        'day': TruncDate,
+        'week': lambda field: TruncWeek(field, output_field=DateField()),
+        'month': lambda field: TruncMonth(field, output_field=DateField()),
+    }[granularity]
+    
+    starts = bucket_periods(granularity, periods, end)
+    range_start = timezone.make_aware(datetime.combine(starts[0], time.min))
+    range_end = timezone.make_aware(
+        datetime.combine(_next_period_start(starts[-1], granularity), time.min)
+    )
+    
+    rows = queryset.filter(**{
+        f'{date_field}__gte': range_start,
+        f'{date_field}__lt': range_end,
+    }).annotate(period=trunc(date_field)).values('period').annotate(**aggregates).order_by()
+    
+    by_period = {period_start(row['period'], granularity): row for row in rows}
+    
+    series = []
+    for start in starts:
+        row = by_period.get(start, {})
+        series.append({
+            'period': start,
+            **{name: row.get(name) or 0 for name in aggregates}
+        })
+    
+    return series
+
+def rollup_buckets(daily_buckets, granularity='day', periods=7, end=None, width=3):
+    """
+    Roll pre-aggregated daily buckets ({'YYYY-MM-DD': [count, total, ...]}) up into the
+    same gap-filled periods as time_series, returning [(period_start, [count, total, ...])]
+    """
+    starts = bucket_periods(granularity, periods, end)
+    totals = {start: [0] * width for start in starts}
+    
+    for day, values in daily_buckets.items():
+        start = period_start(datetime.strptime(day, '%Y-%m-%d').date(), granularity)
+        if start in totals:
+            totals[start] = [total + value for total, value in zip(totals[start], values)]
     
-    return selected_questions
+    return [(start, totals[start]) for start in starts]
 
 def calculate_quiz_statistics(quiz):
     """
@@ -95,72 +564,198 @@ def calculate_quiz_statistics(quiz):
         'difficulty_rating': difficulty_rating
     }
 
-def get_student_recommendations(user):
+def update_item_statistics(now=None, batch_size=500):
     """
-    Get personalized quiz recommendations for a student
+    Fold the responses recorded since the last run into QuestionStatistics.
+
+    Reads answers of sessions completed, and practice attempts made, between the previous
+    run's high-water mark and `now` minus ITEM_STATISTICS_SETTLE_SECONDS (so rows of
+    still-open transactions are not skipped), merges them per question into the stored
+    sums and re-evaluates the flags of the questions touched. Returns the run, or None
+    when another run holds the lock.
     """
-    # Get completed quizzes to avoid recommending them
-    completed_quiz_ids = QuizSession.objects.filter(
-        user=user, 
-        status='completed'
-    ).values_list('quiz_id', flat=True)
-    
-    # Get available quizzes
-    available_quizzes = Quiz.objects.filter(
-        status='active',
-        is_public=True
-    ).exclude(id__in=completed_quiz_ids)
-    
-    # Filter by user's year
-    if hasattr(user, 'year') and user.year:
-        available_quizzes = available_quizzes.filter(year=user.year)
-    
-    # Get user's performance history to recommend appropriate difficulty
-    recent_sessions = QuizSession.objects.filter(
-        user=user, 
-        status='completed'
-    ).order_by('-completed_at')[:10]
-    
-    if recent_sessions.exists():
-        avg_recent_score = recent_sessions.aggregate(avg=Avg('score'))['avg']
+    from apps.questions.models import ItemStatisticsRun
+    
+    with transaction.atomic():
+        # Overlapping runs would start from the same high-water mark and count responses
+        # twice. The latest run row is locked until the next one is stored in this
+        # transaction, a concurrent run gives up instead of waiting.
+        try:
+            with transaction.atomic():
+                last_run = ItemStatisticsRun.objects.select_for_update(nowait=True).first()
+        except OperationalError:
+            return None
         
-        # Recommend difficulty based on recent performance
-        if avg_recent_score >= 85:
-            preferred_difficulties = ['hard', 'medium']
-        elif avg_recent_score >= 70:
-            preferred_difficulties = ['medium', 'easy']
-        else:
-            preferred_difficulties = ['easy', 'medium']
+        if last_run is None:
+            # Only when the starting row of migration 0006 was deleted
+            last_run = ItemStatisticsRun.objects.create(through=ItemStatisticsRun.START)
         
-        # Prioritize by difficulty preference
-        recommended = []
-        for difficulty in preferred_difficulties:
-            quizzes = available_quizzes.filter(difficulty=difficulty)[:3]
-            recommended.extend(quizzes)
-            if len(recommended) >= 5:
-                break
+        return _update_item_statistics(last_run.through, now, batch_size)
+
+def _update_item_statistics(since, now, batch_size):
+    from apps.questions.models import QuestionStatistics, ItemStatisticsRun
+    from apps.users.models import QuizAttempt
+    
+    through = (now or timezone.now()) - timedelta(seconds=getattr(settings, 'ITEM_STATISTICS_SETTLE_SECONDS', 300))
+    max_seconds = ITEM_ANALYSIS['max_time_seconds']
+    
+    answers = QuizAnswer.objects.filter(
+        quiz_session__status='completed',
+        quiz_session__completed_at__gt=since,
+        quiz_session__completed_at__lte=through
+    )
+    attempts = QuizAttempt.objects.filter(created_at__gt=since, created_at__lte=through)
+    
+    deltas = {}
+    responses = 0
+    
+    for question_id, selected_option, is_correct, seconds, session_correct, session_total in answers.order_by().values_list(
+        'question_id', 'selected_option', 'is_correct', 'time_taken_seconds',
+        'quiz_session__correct_answers', 'quiz_session__total_questions'
+    ).iterator(chunk_size=5000):
+        # Corrected item-total: the session score without this question
+        rest_score = None
+        if session_total > 1:
+            rest_score = (session_correct - int(is_correct)) / (session_total - 1)
+        delta = deltas.setdefault(question_id, QuestionStatistics(question_id=question_id))
+        delta.add_response(selected_option, is_correct, seconds, rest_score, max_seconds)
+        responses += 1
+    
+    for question_id, selected_option, is_correct, time_taken in attempts.order_by().values_list(
+        'question_id', 'selected_option', 'is_correct', 'time_taken'
+    ).iterator(chunk_size=5000):
+        seconds = time_taken.total_seconds() if time_taken else None
+        delta = deltas.setdefault(question_id, QuestionStatistics(question_id=question_id))
+        delta.add_response(selected_option, is_correct, seconds, max_seconds=max_seconds)
+        responses += 1
+    
+    min_responses = getattr(settings, 'ITEM_STATISTICS_MIN_RESPONSES', 30)
+    question_ids = sorted(deltas)
+    updated = 0
+    
+    # The sums and the new high-water mark commit together, in the caller's locked transaction
+    for start in range(0, len(question_ids), batch_size):
+        chunk = question_ids[start:start + batch_size]
+        difficulties = dict(Question.objects.filter(id__in=chunk).values_list('id', 'difficulty'))
+        keys = {}
+        for question_id, letter in QuestionOption.objects.filter(
+            question_id__in=chunk, is_correct=True
+        ).values_list('question_id', 'option_letter'):
+            keys.setdefault(question_id, set()).add(letter)
+        stored = QuestionStatistics.objects.in_bulk(chunk, field_name='question_id')
+        
+        rows = []
+        for question_id in chunk:
+            # Responses of questions deleted since are dropped
+            if question_id not in difficulties:
+                continue
+            row = stored.get(question_id) or QuestionStatistics(question_id=question_id)
+            row.merge(deltas[question_id])
+            row.evaluate(difficulties[question_id], keys.get(question_id, set()), ITEM_ANALYSIS, min_responses)
+            rows.append(row)
         
-        return recommended[:5]
+        QuestionStatistics.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['question'],
+            update_fields=[
+                'responses', 'correct_responses', 'option_counts', 'time_histogram',
+                'scored_responses', 'score_sums', 'p_value', 'discrimination',
+                'median_time_seconds', 'flags', 'is_flagged', 'updated_at'
+            ]
+        )
+        updated += len(rows)
     
-    # For new users, recommend easy to medium difficulty
-    return available_quizzes.filter(
-        difficulty__in=['easy', 'medium']
-    ).order_by('?')[:5]
+    return ItemStatisticsRun.objects.create(through=through, responses=responses, questions_updated=updated)
+
+# StudentPreference.difficulty_preference -> Quiz.difficulty
+PREFERENCE_DIFFICULTIES = {
+    'beginner': 'easy',
+    'intermediate': 'medium',
+    'advanced': 'hard',
+}
+
+def recommendation_settings():
+    return {
+        'count': getattr(settings, 'RECOMMENDATION_COUNT', 5),
+        'candidates': getattr(settings, 'RECOMMENDATION_CANDIDATES', 200),
+        'max_age': getattr(settings, 'RECOMMENDATION_MAX_AGE_SECONDS', 2 * 24 * 60 * 60),
+    }
 
-def check_session_expiry():
+def rank_recommendations(user, count=None):
     """
-    Check and update expired quiz sessions
+    Ids of the quizzes to recommend to a student, best first.
+
+    Candidates are the newest active public quizzes of the student's year that they have
+    not completed. Favorite modules rank first, then the areas the student's
+    StudentMastery rates weakest, at the difficulty suited to that mastery. Students
+    without answer history get their stated difficulty preference. Newer quizzes break ties.
     """
-    now = timezone.now()
-    expired_sessions = QuizSession.objects.filter(
-        status='in_progress',
-        expires_at__lt=now
+    options = recommendation_settings()
+    count = count or options['count']
+    
+    completed = QuizSession.objects.filter(user=user, quiz=OuterRef('pk'), status='completed')
+    candidates = Quiz.objects.filter(status='active', is_public=True).exclude(Exists(completed))
+    if getattr(user, 'year', None):
+        candidates = candidates.filter(year=user.year)
+    # Favorites hold module names, the current one is read through the foreign key
+    candidates = list(
+        candidates.annotate(current_module_name=Coalesce('module__name', 'module_name')).order_by(
+            '-created_at', '-id'
+        ).values_list(
+            'id', 'current_module_name', 'difficulty', 'module_id', 'course_id'
+        )[:options['candidates']]
     )
+    if not candidates:
+        return []
+    
+    preferences = StudentPreference.objects.filter(user=user).values_list(
+        'difficulty_preference', 'favorite_modules'
+    ).first() or (None, [])
+    favorite_modules = set(preferences[1] or [])
+    mastery = StudentMastery.objects.filter(user=user).first()
     
-    expired_count = expired_sessions.count()
-    expired_sessions.update(status='expired')
+    if mastery is not None and mastery.has_evidence:
+        def rank(candidate):
+            quiz_id, module_name, difficulty, module_id, course_id = candidate
+            level = mastery.mastery_of(module_id, course_id)
+            distance = abs(DIFFICULTY_LEVELS.get(difficulty, 1) - DIFFICULTY_LEVELS[target_difficulty(level)])
+            # Mastery in tenths, so the difficulty fit decides between similar areas
+            return module_name not in favorite_modules, round(level, 1), distance
+    else:
+        preferred = PREFERENCE_DIFFICULTIES.get(preferences[0])
+        difficulties = [preferred] if preferred else []
+        difficulties += [difficulty for difficulty in ('easy', 'medium') if difficulty != preferred]
+        
+        def rank(candidate):
+            difficulty = candidate[2]
+            position = difficulties.index(difficulty) if difficulty in difficulties else len(difficulties)
+            return candidate[1] not in favorite_modules, position
     
-    return expired_count
+    # candidates are newest first and sorted() is stable, so recency breaks ties
+    return [candidate[0] for candidate in sorted(candidates, key=rank)[:count]]
+
+def get_recommended_quiz_ids(user):
+    """
+    Stored recommendations of a student, ranked and stored on demand when missing or stale
+    """
+    stored = StudentRecommendation.objects.filter(user=user).first()
+    if stored is not None and stored.is_current(recommendation_settings()['max_age']):
+        return stored.quiz_ids
+    
+    quiz_ids = rank_recommendations(user)
+    StudentRecommendation.store_many({user.id: quiz_ids})
+    return quiz_ids
+
+def get_student_recommendations(user):
+    """
+    Get personalized quiz recommendations for a student
+    """
+    quiz_ids = get_recommended_quiz_ids(user)
+    quizzes = Quiz.objects.filter(
+        id__in=quiz_ids, status='active', is_public=True
+    ).select_related('created_by').in_bulk()
+    return [quizzes[quiz_id] for quiz_id in quiz_ids if quiz_id in quizzes]
 
 # apps/students/filters.py
 import django_filters
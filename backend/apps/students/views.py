@@ -1,35 +1,41 @@
 # apps/students/views.py
-from pyexpat import model
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Count, Avg, Sum, Q
 from datetime import timedelta, datetime
 import random
 
 from .models import (
     Quiz, QuizSession, QuizAnswer, StudentCalendarEvent, 
-    StudentNote, StudentPreference
+    StudentNote, StudentPreference, StudentStatistics, StudentRecommendation
 )
 from .serializers import (
     QuizListSerializer, QuizDetailSerializer, QuizSessionSerializer,
     QuizAnswerSerializer, QuizResultSerializer, StudentCalendarEventSerializer,
     StudentNoteSerializer, StudentPreferenceSerializer, StudentDashboardStatsSerializer,
-    StudentProfileSerializer
+    StudentProfileSerializer, build_delivery_payload
 )
+from .utils import record_quiz_answers, rollup_buckets, option_order, get_student_recommendations
 from apps.questions.models import Question
+from apps.questions.utils import module_catalog, module_filter
 from apps.core.permissions import IsOwnerOrAdmin
+from apps.core.constants import QUIZ_SETTINGS
+from apps.core.cache import cache_response, IdempotentCreateMixin
+from apps.core.activity import track_activity
 
 # Quiz Views
 class QuizListView(generics.ListAPIView):
     serializer_class = QuizListSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['module_name', 'year', 'difficulty', 'status']
-    search_fields = ['title', 'description', 'module_name', 'course_name']
+    # module_name is resolved to the foreign key in get_queryset
+    filterset_fields = ['module', 'year', 'difficulty', 'status']
+    search_fields = ['title', 'description', 'module__name', 'course__name']
     ordering_fields = ['created_at', 'title', 'difficulty']
     ordering = ['-created_at']
     
@@ -37,6 +43,10 @@ class QuizListView(generics.ListAPIView):
         # Only show active public quizzes to students
         queryset = Quiz.objects.filter(status='active', is_public=True)
         
+        module_name = self.request.query_params.get('module_name')
+        if module_name:
+            queryset = queryset.filter(**module_filter(module_name))
+        
         # Filter by user's year if specified
         user = self.request.user
         if hasattr(user, 'year') and user.year:
@@ -49,27 +59,38 @@ class QuizDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Quiz.objects.filter(status='active', is_public=True)
+        return Quiz.objects.filter(status='active', is_public=True).select_related('created_by')
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if user.is_admin:
+            context['include_answers'] = True
+            return context
+        
+        # Students only see the correct answers once they completed the quiz,
+        # and not while another attempt is in progress
+        sessions = QuizSession.objects.filter(user=user, quiz_id=self.kwargs['pk']).aggregate(
+            completed=Count('id', filter=Q(status='completed')),
+            running=Count('id', filter=Q(status='in_progress', expires_at__gt=timezone.now()))
+        )
+        context['include_answers'] = bool(sessions['completed']) and not sessions['running']
+        return context
 
 # Quiz Session Views
-class QuizSessionCreateView(generics.CreateAPIView):
+class QuizSessionCreateView(IdempotentCreateMixin, generics.CreateAPIView):
     serializer_class = QuizSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def create(self, request, *args, **kwargs):
-        # Check if user already has an active session for this quiz
-        quiz_id = request.data.get('quiz_id')
-        existing_session = QuizSession.objects.filter(
-            user=request.user,
-            quiz_id=quiz_id,
-            status='in_progress'
-        ).first()
+        # The serializer inserts or returns the open session of this quiz
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
         
-        if existing_session:
-            serializer = self.get_serializer(existing_session)
+        if not serializer.created:
             return Response(serializer.data, status=status.HTTP_200_OK)
-        
-        return super().create(request, *args, **kwargs)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 class QuizSessionDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = QuizSessionSerializer
@@ -78,6 +99,40 @@ class QuizSessionDetailView(generics.RetrieveUpdateAPIView):
     def get_queryset(self):
         return QuizSession.objects.filter(user=self.request.user)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def quiz_session_questions(request, session_id):
+    """
+    The questions drawn for a session, in session order with its option permutation
+    """
+    try:
+        quiz_session = QuizSession.objects.select_related('quiz').get(id=session_id, user=request.user)
+    except QuizSession.DoesNotExist:
+        return Response({'error': 'Quiz session not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    question_ids = quiz_session.question_ids or list(
+        quiz_session.quiz.quiz_questions.order_by('order').values_list('question_id', flat=True)
+    )
+    questions = Question.objects.filter(id__in=question_ids).select_related(
+        'created_by'
+    ).prefetch_related('options').in_bulk()
+    questions = [questions[question_id] for question_id in question_ids if question_id in questions]
+    
+    payload = build_delivery_payload(questions, include_answers=quiz_session.effective_status != 'in_progress')
+    for order, question_data in enumerate(payload['questions'], start=1):
+        question_data['order'] = order
+        if quiz_session.seed is not None and QUIZ_SETTINGS['randomize_options']:
+            options = {option['option_letter']: option for option in question_data['options']}
+            question_data['options'] = [
+                options[letter] for letter in option_order(quiz_session.seed, question_data['id'], options)
+            ]
+    
+    return Response({
+        'session_id': quiz_session.id,
+        'total_questions': len(payload['questions']),
+        **payload
+    })
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def submit_quiz_answer(request, session_id):
@@ -90,10 +145,8 @@ def submit_quiz_answer(request, session_id):
     except QuizSession.DoesNotExist:
         return Response({'error': 'Quiz session not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Check if session has expired
-    if timezone.now() > quiz_session.expires_at:
-        quiz_session.status = 'expired'
-        quiz_session.save()
+    # Expiry is derived from expires_at, the sweeper persists the status later
+    if quiz_session.is_lapsed:
         return Response({'error': 'Quiz session has expired'}, status=status.HTTP_400_BAD_REQUEST)
     
     serializer = QuizAnswerSerializer(
@@ -109,7 +162,11 @@ def submit_quiz_answer(request, session_id):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
-def complete_quiz_session(request, session_id):
+def submit_quiz_answers_batch(request, session_id):
+    """
+    Submit several answers in one request, e.g. when a client syncs after being offline.
+    Results (or errors) are returned in the same order as the submitted answers.
+    """
     try:
         quiz_session = QuizSession.objects.get(
             id=session_id, 
@@ -119,34 +176,108 @@ def complete_quiz_session(request, session_id):
     except QuizSession.DoesNotExist:
         return Response({'error': 'Quiz session not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Calculate final score
-    answers = quiz_session.answers.all()
-    correct_answers = answers.filter(is_correct=True).count()
-    total_questions = answers.count()
-    
-    if total_questions > 0:
-        score = (correct_answers / total_questions) * 100
-    else:
-        score = 0
-    
-    # Calculate time spent
-    time_spent = int((timezone.now() - quiz_session.started_at).total_seconds())
-    
-    # Update session
-    quiz_session.status = 'completed'
-    quiz_session.completed_at = timezone.now()
-    quiz_session.score = score
-    quiz_session.correct_answers = correct_answers
-    quiz_session.total_questions = total_questions
-    quiz_session.time_spent_seconds = time_spent
-    quiz_session.save()
-    
-    # Update user progress
-    from apps.users.models import UserProgress
-    progress, created = UserProgress.objects.get_or_create(user=request.user)
-    progress.total_questions_attempted += total_questions
-    progress.correct_answers += correct_answers
-    progress.save()
+    # Expiry is derived from expires_at, the sweeper persists the status later
+    if quiz_session.is_lapsed:
+        return Response({'error': 'Quiz session has expired'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    items = request.data.get('answers') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'answers must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    max_answers = QUIZ_SETTINGS['max_questions_per_quiz']
+    if len(items) > max_answers:
+        return Response(
+            {'error': f'A batch can contain at most {max_answers} answers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Validate every item, the last answer to a question wins
+    results = [None] * len(items)
+    latest = {}
+    for index, item in enumerate(items):
+        serializer = QuizAnswerSerializer(data=item, context={'quiz_session': quiz_session})
+        if not serializer.is_valid():
+            results[index] = {'errors': serializer.errors}
+            continue
+        
+        question_id = serializer.validated_data['question_id']
+        if question_id in latest:
+            results[latest[question_id][0]] = {
+                'question_id': question_id,
+                'errors': {'question_id': ['Superseded by a later answer in this batch']}
+            }
+        latest[question_id] = (index, serializer.validated_data)
+    
+    saved, unknown_ids = record_quiz_answers(
+        quiz_session,
+        {question_id: data for question_id, (index, data) in latest.items()}
+    )
+    
+    for question_id, (index, data) in latest.items():
+        if question_id in unknown_ids:
+            results[index] = {
+                'question_id': question_id,
+                'errors': {'question_id': ['Question not found']}
+            }
+        else:
+            results[index] = {
+                'question_id': question_id,
+                **QuizAnswerSerializer(saved[question_id]).data
+            }
+    
+    return Response({
+        'results': results,
+        'answered_count': quiz_session.answered_count,
+        'correct_count': quiz_session.correct_count
+    }, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def complete_quiz_session(request, session_id):
+    with transaction.atomic():
+        # One locked read gives the session and its running counters, so a
+        # concurrent answer or a double-submitted completion cannot interleave
+        try:
+            quiz_session = QuizSession.objects.select_for_update().get(
+                id=session_id, 
+                user=request.user,
+                status='in_progress'
+            )
+        except QuizSession.DoesNotExist:
+            return Response({'error': 'Quiz session not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # A lapsed session cannot be completed, persist its expiry while the row is locked
+        if quiz_session.is_lapsed:
+            quiz_session.status = 'expired'
+            quiz_session.save(update_fields=['status', 'updated_at'])
+            return Response({'error': 'Quiz session has expired'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Calculate final score from the running counters
+        correct_answers = quiz_session.correct_count
+        total_questions = quiz_session.answered_count
+        
+        if total_questions > 0:
+            score = (correct_answers / total_questions) * 100
+        else:
+            score = 0
+        
+        # Calculate time spent
+        now = timezone.now()
+        time_spent = int((now - quiz_session.started_at).total_seconds())
+        
+        # Update session
+        quiz_session.status = 'completed'
+        quiz_session.completed_at = now
+        quiz_session.score = score
+        quiz_session.correct_answers = correct_answers
+        quiz_session.total_questions = total_questions
+        quiz_session.time_spent_seconds = time_spent
+        quiz_session.save()
+        
+        # UserProgress gets an O(1) delta from the QuizSession post_save receiver,
+        # see reconcile_user_progress for the full recount
+        StudentStatistics.record_session(quiz_session)
+        StudentRecommendation.invalidate(request.user.id)
     
     serializer = QuizResultSerializer(quiz_session)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -155,12 +286,23 @@ class QuizSessionListView(generics.ListAPIView):
     serializer_class = QuizSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
-    filterset_fields = ['status', 'quiz__module_name']
+    filterset_fields = ['quiz__module_name']
     ordering_fields = ['started_at', 'completed_at', 'score']
     ordering = ['-started_at']
     
     def get_queryset(self):
-        return QuizSession.objects.filter(user=self.request.user).select_related('quiz')
+        queryset = QuizSession.objects.filter(user=self.request.user).select_related('quiz')
+        
+        # Filter on the status with expiry applied, lapsed sessions count as expired
+        session_status = self.request.query_params.get('status')
+        if session_status == 'in_progress':
+            queryset = queryset.open()
+        elif session_status == 'expired':
+            queryset = queryset.expired()
+        elif session_status:
+            queryset = queryset.filter(status=session_status)
+        
+        return queryset.with_effective_status()
 
 # Calendar Views
 class StudentCalendarEventListCreateView(generics.ListCreateAPIView):
@@ -228,22 +370,17 @@ class StudentPreferenceView(generics.RetrieveUpdateAPIView):
 def student_dashboard_stats(request):
     user = request.user
     
-    # Get completed quiz sessions
+    # Totals come from the materialized statistics row
+    stats = StudentStatistics.for_user(user)
     completed_sessions = QuizSession.objects.filter(
         user=user, 
         status='completed'
     ).select_related('quiz')
     
-    # Basic stats
-    total_quizzes_completed = completed_sessions.count()
-    average_score = completed_sessions.aggregate(avg=Avg('score'))['avg'] or 0
-    total_questions_answered = completed_sessions.aggregate(
-        total=Sum('total_questions')
-    )['total'] or 0
-    total_study_hours = completed_sessions.aggregate(
-        total=Sum('time_spent_seconds')
-    )['total'] or 0
-    total_study_hours = round(total_study_hours / 3600, 1)  # Convert to hours
+    total_quizzes_completed = stats.quizzes_completed
+    average_score = stats.average_score
+    total_questions_answered = stats.questions_answered
+    total_study_hours = round(stats.time_spent_seconds / 3600, 1)  # Convert to hours
     
     # Recent quizzes (last 5)
     recent_quizzes = []
@@ -254,7 +391,7 @@ def student_dashboard_stats(request):
             'title': session.quiz.title,
             'score': session.percentage_score,
             'date': session.completed_at.strftime('%d %b %Y'),
-            'module': session.quiz.module_name,
+            'module': module_catalog.names_of(session.quiz)[0],
             'questions_count': session.total_questions
         })
     
@@ -279,20 +416,13 @@ def student_dashboard_stats(request):
             'days_until': days_until
         })
     
-    # Performance trend (last 7 days)
-    performance_trend = []
-    for i in range(6, -1, -1):
-        day = now - timedelta(days=i)
-        day_sessions = completed_sessions.filter(
-            completed_at__date=day.date()
-        )
-        avg_score = day_sessions.aggregate(avg=Avg('score'))['avg'] or 0
-        performance_trend.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'day': day.strftime('%a'),
-            'score': round(avg_score, 1),
-            'count': day_sessions.count()
-        })
+    # Performance trend (last 7 days) from the daily buckets
+    performance_trend = [{
+        'date': day.strftime('%Y-%m-%d'),
+        'day': day.strftime('%a'),
+        'score': round(score_total / count, 1) if count else 0,
+        'count': count
+    } for day, (count, score_total, questions) in rollup_buckets(stats.daily_stats, 'day', 7)]
     
     data = {
         'total_quizzes_completed': total_quizzes_completed,
@@ -318,61 +448,20 @@ class StudentProfileView(generics.RetrieveUpdateAPIView):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def recommended_quizzes(request):
-    user = request.user
-    
-    # Get user's completed quizzes to avoid recommending them again
-    completed_quiz_ids = QuizSession.objects.filter(
-        user=user, 
-        status='completed'
-    ).values_list('quiz_id', flat=True)
-    
-    # Get available quizzes excluding completed ones
-    queryset = Quiz.objects.filter(
-        status='active',
-        is_public=True
-    ).exclude(id__in=completed_quiz_ids)
-    
-    # Filter by user's year if available
-    if hasattr(user, 'year') and user.year:
-        queryset = queryset.filter(year=user.year)
-    
-    # Get user preferences
-    try:
-        preferences = user.student_preferences
-        # Filter by preferred difficulty if set
-        if preferences.difficulty_preference:
-            difficulty_map = {
-                'beginner': 'easy',
-                'intermediate': 'medium',
-                'advanced': 'hard'
-            }
-            preferred_difficulty = difficulty_map.get(preferences.difficulty_preference, 'medium')
-            queryset = queryset.filter(difficulty=preferred_difficulty)
-        
-        # Prioritize favorite modules
-        if preferences.favorite_modules:
-            favorite_quizzes = queryset.filter(module_name__in=preferences.favorite_modules)
-            other_quizzes = queryset.exclude(module_name__in=preferences.favorite_modules)
-            # Combine with favorites first
-            queryset = list(favorite_quizzes[:3]) + list(other_quizzes[:2])
-        else:
-            queryset = queryset[:5]
-    except:
-        queryset = queryset[:5]
-    
-    serializer = QuizListSerializer(queryset, many=True)
+    # Precomputed by generate_quiz_recommendations, ranked on demand only on a miss
+    quizzes = get_student_recommendations(request.user)
+    serializer = QuizListSerializer(quizzes, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 # Statistics
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@cache_response('user_stats', key_params=lambda request: {'user_id': request.user.id})
 def student_statistics(request):
     user = request.user
+    stats = StudentStatistics.for_user(user)
     
-    # Get all completed sessions
-    sessions = QuizSession.objects.filter(user=user, status='completed')
-    
-    if not sessions.exists():
+    if not stats.quizzes_completed:
         return Response({
             'total_sessions': 0,
             'average_score': 0,
@@ -383,67 +472,36 @@ def student_statistics(request):
             'accuracy_by_difficulty': {}
         })
     
-    # Basic statistics
-    total_sessions = sessions.count()
-    average_score = sessions.aggregate(avg=Avg('score'))['avg']
-    best_score = sessions.aggregate(max=model.Max('score'))['max']
-    total_time = sessions.aggregate(total=Sum('time_spent_seconds'))['total']
-    
     # Modules studied with performance
-    modules = sessions.values('quiz__module_name').annotate(
-        count=Count('id'),
-        avg_score=Avg('score'),
-        total_questions=Sum('total_questions')
-    ).order_by('-count')
-    
+    modules = sorted(stats.module_stats.items(), key=lambda item: item[1][0], reverse=True)
     modules_studied = [{
-        'module': module['quiz__module_name'],
-        'quizzes_completed': module['count'],
-        'average_score': round(module['avg_score'], 1),
-        'total_questions': module['total_questions']
-    } for module in modules]
-    
-    # Monthly progress (last 6 months)
-    monthly_progress = []
-    now = timezone.now()
-    
-    for i in range(5, -1, -1):
-        month_start = (now - timedelta(days=30 * i)).replace(day=1)
-        if i == 0:
-            month_end = now
-        else:
-            month_end = (now - timedelta(days=30 * (i-1))).replace(day=1)
-        
-        month_sessions = sessions.filter(
-            completed_at__gte=month_start,
-            completed_at__lt=month_end
-        )
-        
-        monthly_progress.append({
-            'month': month_start.strftime('%b %Y'),
-            'quizzes_completed': month_sessions.count(),
-            'average_score': round(month_sessions.aggregate(avg=Avg('score'))['avg'] or 0, 1),
-            'questions_answered': month_sessions.aggregate(total=Sum('total_questions'))['total'] or 0
-        })
+        'module': module_name,
+        'quizzes_completed': count,
+        'average_score': round(score_total / count, 1),
+        'total_questions': questions
+    } for module_name, (count, score_total, questions) in modules]
+    
+    # Monthly progress (last 6 months) from the daily buckets
+    monthly_progress = [{
+        'month': month.strftime('%b %Y'),
+        'quizzes_completed': count,
+        'average_score': round(score_total / count, 1) if count else 0,
+        'questions_answered': questions
+    } for month, (count, score_total, questions) in rollup_buckets(stats.daily_stats, 'month', 6)]
     
     # Accuracy by difficulty
-    difficulty_stats = sessions.values('quiz__difficulty').annotate(
-        count=Count('id'),
-        avg_score=Avg('score')
-    )
-    
     accuracy_by_difficulty = {
-        stat['quiz__difficulty']: {
-            'average_score': round(stat['avg_score'], 1),
-            'quizzes_completed': stat['count']
-        } for stat in difficulty_stats
+        difficulty: {
+            'average_score': round(score_total / count, 1),
+            'quizzes_completed': count
+        } for difficulty, (count, score_total, questions) in stats.difficulty_stats.items()
     }
     
     return Response({
-        'total_sessions': total_sessions,
-        'average_score': round(average_score, 1),
-        'best_score': round(best_score, 1),
-        'total_time_spent': round(total_time / 3600, 1),  # Convert to hours
+        'total_sessions': stats.quizzes_completed,
+        'average_score': round(stats.average_score, 1),
+        'best_score': round(stats.best_score, 1),
+        'total_time_spent': round(stats.time_spent_seconds / 3600, 1),  # Convert to hours
         'modules_studied': modules_studied,
         'monthly_progress': monthly_progress,
         'accuracy_by_difficulty': accuracy_by_difficulty
@@ -453,69 +511,23 @@ def student_statistics(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def study_streak(request):
-    user = request.user
-    
-    # Get quiz sessions ordered by date
-    sessions = QuizSession.objects.filter(
-        user=user, 
-        status='completed'
-    ).order_by('-completed_at')
+    stats = StudentStatistics.for_user(request.user)
     
-    if not sessions.exists():
+    if not stats.last_study_date:
         return Response({
             'current_streak': 0,
             'longest_streak': 0,
             'last_study_date': None
         })
     
-    # Calculate current streak
-    current_streak = 0
-    longest_streak = 0
-    temp_streak = 0
-    
-    # Get unique study dates
-    study_dates = list(set([
-        session.completed_at.date() 
-        for session in sessions
-    ]))
-    study_dates.sort(reverse=True)
-    
-    # Calculate current streak
-    today = timezone.now().date()
-    yesterday = today - timedelta(days=1)
-    
-    if study_dates and (study_dates[0] == today or study_dates[0] == yesterday):
-        current_date = study_dates[0]
-        current_streak = 1
-        
-        for i in range(1, len(study_dates)):
-            expected_date = current_date - timedelta(days=1)
-            if study_dates[i] == expected_date:
-                current_streak += 1
-                current_date = expected_date
-            else:
-                break
-    
-    # Calculate longest streak
-    if study_dates:
-        temp_streak = 1
-        longest_streak = 1
-        
-        for i in range(1, len(study_dates)):
-            expected_date = study_dates[i-1] - timedelta(days=1)
-            if study_dates[i] == expected_date:
-                temp_streak += 1
-                longest_streak = max(longest_streak, temp_streak)
-            else:
-                temp_streak = 1
-    
     return Response({
-        'current_streak': current_streak,
-        'longest_streak': longest_streak,
-        'last_study_date': study_dates[0].isoformat() if study_dates else None
+        'current_streak': stats.streak_as_of(timezone.localdate()),
+        'longest_streak': stats.longest_streak,
+        'last_study_date': stats.last_study_date.isoformat()
     })
 
 # Quiz Report (for question reporting)
+@track_activity('Question Reported')
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def report_question(request):
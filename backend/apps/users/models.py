@@ -1,4 +1,7 @@
+from datetime import timedelta
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from apps.core.models import TimeStampedModel
 from apps.authentication.models import User
 from apps.questions.models import Question
@@ -9,6 +12,12 @@ class UserActivity(TimeStampedModel):
     details = models.TextField(blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # Keyset pagination order of the activity log
+            models.Index(fields=['created_at', 'id'], name='users_activity_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.email} - {self.action}"
 
@@ -19,6 +28,12 @@ class QuizAttempt(TimeStampedModel):
     is_correct = models.BooleanField()
     time_taken = models.DurationField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # Keyset pagination order of the attempts list
+            models.Index(fields=['created_at', 'id'], name='users_attempt_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.email} - Question {self.question.id}"
 
@@ -34,5 +49,28 @@ class UserProgress(TimeStampedModel):
             return (self.correct_answers / self.total_questions_attempted) * 100
         return 0
     
+    @classmethod
+    def add_session(cls, user, questions, correct_answers, time_spent_seconds):
+        """
+        Add one completed quiz session to a user's totals with a single UPDATE
+        """
+        study_time = timedelta(seconds=time_spent_seconds)
+        updated = cls.objects.filter(user=user).update(
+            total_questions_attempted=F('total_questions_attempted') + questions,
+            correct_answers=F('correct_answers') + correct_answers,
+            total_study_time=Coalesce(
+                F('total_study_time'), Value(timedelta(0), output_field=models.DurationField())
+            ) + study_time
+        )
+        
+        if not updated:
+            progress, created = cls.objects.get_or_create(user=user, defaults={
+                'total_questions_attempted': questions,
+                'correct_answers': correct_answers,
+                'total_study_time': study_time,
+            })
+            if not created:
+                cls.add_session(user, questions, correct_answers, time_spent_seconds)
+    
     def __str__(self):
         return f"{self.user.email} Progress"
\ No newline at end of file
@@ -12,6 +12,8 @@ from .serializers import (
     QuizAttemptSerializer, UserProgressSerializer
 )
 from apps.core.permissions import IsAdminUser  # Import the custom permission
+from apps.core.activity import track_activity
+from apps.core.pagination import KeysetPagination
 
 class UserListView(generics.ListAPIView):
     queryset = User.objects.filter(role='student')
@@ -24,10 +26,12 @@ class UserListView(generics.ListAPIView):
     ordering = ['-created_at']
 
 class UserDetailView(generics.RetrieveUpdateAPIView):
+    activity_action = {'PUT': 'User Updated'}
     queryset = User.objects.filter(role='student')
     serializer_class = UserDetailSerializer
     permission_classes = [IsAdminUser]  # Use the custom permission class
 
+@track_activity('User Activated')
 @api_view(['POST'])
 @permission_classes([IsAdminUser])  # Use the custom permission class
 def activate_user(request, pk):
@@ -39,6 +43,7 @@ def activate_user(request, pk):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@track_activity('User Blocked')
 @api_view(['POST'])
 @permission_classes([IsAdminUser])  # Use the custom permission class
 def block_user(request, pk):
@@ -50,6 +55,7 @@ def block_user(request, pk):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+@track_activity('User Deleted')
 @api_view(['DELETE'])
 @permission_classes([IsAdminUser])  # Use the custom permission class
 def delete_user(request, pk):
@@ -69,6 +75,7 @@ class UserActivityListView(generics.ListAPIView):
     search_fields = ['action', 'details', 'user__email']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
 
 class QuizAttemptListView(generics.ListAPIView):
     queryset = QuizAttempt.objects.select_related('user', 'question')
@@ -78,6 +85,7 @@ class QuizAttemptListView(generics.ListAPIView):
     filterset_fields = ['user', 'question', 'is_correct']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])  # Use the custom permission class
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -35,6 +36,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.APILoggingMiddleware',        # Outermost app middleware so timings cover the rest
+    'apps.core.middleware.QueryInspectionMiddleware',   # Request context for slow query / N+1 logs
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -42,7 +45,6 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'apps.core.middleware.ActivityTrackingMiddleware',  # Add this
-    'apps.core.middleware.APILoggingMiddleware',        # Add this
 ]
 
 # File Upload Settings
@@ -143,15 +145,111 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
 
+# Answer key cache used to grade quiz answers (apps.questions.utils.AnswerKeyCache)
+# Set ANSWER_KEY_CACHE_ALIAS to a shared cache alias (e.g. Redis) to share keys across workers
+ANSWER_KEY_CACHE_ALIAS = config('ANSWER_KEY_CACHE_ALIAS', default=None)
+ANSWER_KEY_CACHE_TIMEOUT = 3600  # Shared backend, seconds
+ANSWER_KEY_CACHE_LOCAL_TIMEOUT = 60  # Per-process copy, seconds
+
+# Quiz question pool index (apps.questions.utils.QuestionPoolIndex), kept current by signals
+# and fully rebuilt by a background thread every this many seconds to pick up changes made by other workers
+QUESTION_POOL_REFRESH_SECONDS = config('QUESTION_POOL_REFRESH_SECONDS', default=300, cast=int)
+QUESTION_POOL_BACKGROUND_REFRESH = config('QUESTION_POOL_BACKGROUND_REFRESH', default=True, cast=bool)  # Off: the index is never built, draws query the table
+
+# Module/Course id lookup behind the module_name/course_name strings (apps.questions.utils.ModuleCatalog)
+MODULE_CATALOG_REFRESH_SECONDS = config('MODULE_CATALOG_REFRESH_SECONDS', default=300, cast=int)
+# Filter questions/quizzes by module on the foreign keys (filled by migrations and on save, backfill_module_fks repairs rows written around save())
+MODULE_FK_FILTERS = config('MODULE_FK_FILTERS', default=True, cast=bool)
+
+# Admin statistics page cache lifetime in seconds (defaults to CACHE_TIMEOUTS['dashboard_stats'])
+STATISTICS_CACHE_TIMEOUT = config('STATISTICS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Cache backend: Redis when REDIS_CACHE_URL is set, process-local memory otherwise (dev/tests)
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'KEY_PREFIX': 'toothquest',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'toothquest',
+        }
+    }
+
+# Per-entry overrides of apps.core.constants.CACHE_TIMEOUTS (apps.core.cache)
+CACHE_TIMEOUT_OVERRIDES = {
+    'dashboard_stats': STATISTICS_CACHE_TIMEOUT,
+}
+
+# Activity tracking writer (apps.core.activity)
+ACTIVITY_TRACKING_ASYNC = config('ACTIVITY_TRACKING_ASYNC', default=True, cast=bool)
+ACTIVITY_QUEUE_SIZE = 10000
+ACTIVITY_BATCH_SIZE = 200
+ACTIVITY_FLUSH_INTERVAL = 2.0  # Seconds between flushes of a partial batch
+ACTIVITY_OVERFLOW = config('ACTIVITY_OVERFLOW', default='drop')  # drop, block or spill
+ACTIVITY_BLOCK_TIMEOUT = 0.5  # Seconds a request may wait for room when overflow is 'block'
+ACTIVITY_SPILL_PATH = config(  # JSON lines file of events that overflowed the queue
+    'ACTIVITY_SPILL_PATH',
+    default=os.path.join(tempfile.gettempdir(), 'toothquest_activity_spill.jsonl')
+)
+
+# API request metrics (apps.core.metrics, served at /api/admin/metrics/)
+API_METRICS_SAMPLE_RATE = config('API_METRICS_SAMPLE_RATE', default=1.0, cast=float)  # Share of requests with query timing
+API_METRICS_JSON_LOG = config('API_METRICS_JSON_LOG', default=False, cast=bool)  # JSON line per sampled request
+
+# Slow query detection (apps.core.querylog), the slow threshold is PERFORMANCE_METRICS['slow_query_threshold']
+QUERY_N_PLUS_ONE_THRESHOLD = config('QUERY_N_PLUS_ONE_THRESHOLD', default=10, cast=int)  # Repeats per request before warning, 0 disables
+
+# Lapsed quiz sessions are expired at read time, the sweeper persists them in batches of this size
+QUIZ_SESSION_EXPIRY_BATCH_SIZE = config('QUIZ_SESSION_EXPIRY_BATCH_SIZE', default=500, cast=int)
+
+# Stored quiz recommendations (apps.students.models.StudentRecommendation), refreshed nightly
+RECOMMENDATION_COUNT = config('RECOMMENDATION_COUNT', default=5, cast=int)
+RECOMMENDATION_CANDIDATES = config('RECOMMENDATION_CANDIDATES', default=200, cast=int)  # Newest quizzes considered per student
+RECOMMENDATION_MAX_AGE_SECONDS = config('RECOMMENDATION_MAX_AGE_SECONDS', default=172800, cast=int)  # Older rows are recomputed on read
+
+# Per-student mastery model (apps.students.models.StudentMastery), recomputed nightly with NumPy when installed
+STUDENT_MASTERY_BATCH_SIZE = config('STUDENT_MASTERY_BATCH_SIZE', default=500, cast=int)
+
+# Item analysis (apps.students.utils.update_item_statistics), thresholds in ITEM_ANALYSIS
+ITEM_STATISTICS_SETTLE_SECONDS = config('ITEM_STATISTICS_SETTLE_SECONDS', default=300, cast=int)  # Newer responses wait for the next run
+ITEM_STATISTICS_MIN_RESPONSES = config('ITEM_STATISTICS_MIN_RESPONSES', default=30, cast=int)  # Fewer responses raise no flags
+
 # Custom User Model
 AUTH_USER_MODEL = 'authentication.User'
 CELERY_BEAT_SCHEDULE = {
     'cleanup-expired-sessions': {
         'task': 'apps.students.tasks.cleanup_expired_quiz_sessions',
-        'schedule': 300.0,  # Every 5 minutes
+        'schedule': 3600.0,  # Every hour, reads derive expiry from expires_at in between
     },
     'send-calendar-reminders': {
         'task': 'apps.students.tasks.send_calendar_reminders',
         'schedule': 3600.0,  # Every hour
     },
+    'reconcile-student-statistics': {
+        'task': 'apps.students.tasks.update_student_statistics',
+        'schedule': 86400.0,  # Once a day, completion keeps progress current in between
+    },
+    'recompute-student-mastery': {
+        'task': 'apps.students.tasks.recompute_student_mastery',
+        'schedule': 86400.0,  # Once a day, answer submission keeps mastery current in between
+    },
+    'generate-quiz-recommendations': {
+        'task': 'apps.students.tasks.generate_quiz_recommendations',
+        'schedule': 86400.0,  # Once a day, misses and stale rows are ranked on demand
+    },
+    'update-item-statistics': {
+        'task': 'apps.students.tasks.update_item_statistics',
+        'schedule': 3600.0,  # Every hour, each run only reads responses since the last one
+    },
+    'reconcile-quick-stats-counters': {
+        'task': 'apps.core.tasks.reconcile_quick_stats_counters',
+        'schedule': 900.0,  # Every 15 minutes, signals keep counters current in between
+    },
 }
\ No newline at end of file